@@ -4,6 +4,38 @@
 // Crea el objeto para el ADS1115. Dirección por defecto 0x48.
 Adafruit_ADS1115 ads; 
 
+// Formato de salida:
+//   0 = ASCII "RAW_A0,RAW_A1\n" cada 100 ms (original)
+//   1 = tramas binarias de 9 bytes a ~100 Hz (ver PID/protocolo_serial.py):
+//       0xA5 0x5A | secuencia uint16 LE | A0 int16 LE | A1 int16 LE | checksum
+//       (los bytes 2..8 suman 0 mod 256). La Raspberry detecta el formato sola.
+#define PROTOCOLO_BINARIO 0
+#define PERIODO_BINARIO_MS 10
+
+uint16_t secuencia = 0;
+
+void enviarTrama(int16_t a0, int16_t a1)
+{
+  uint8_t trama[9];
+  trama[0] = 0xA5;
+  trama[1] = 0x5A;
+  trama[2] = secuencia & 0xFF;
+  trama[3] = secuencia >> 8;
+  trama[4] = a0 & 0xFF;
+  trama[5] = (a0 >> 8) & 0xFF;
+  trama[6] = a1 & 0xFF;
+  trama[7] = (a1 >> 8) & 0xFF;
+
+  uint8_t suma = 0;
+  for (uint8_t i = 2; i < 8; i++) {
+    suma += trama[i];
+  }
+  trama[8] = (uint8_t)(0 - suma);
+
+  Serial.write(trama, sizeof(trama));
+  secuencia++;
+}
+
 void setup(void) 
 {
   // Iniciamos la comunicación serial a 115200 baudios.
@@ -18,6 +50,10 @@ void setup(void)
   // Inicializa el ADS1115 y lo configura para FSR de +/-6.144V
   if (ads.begin()) {
     ads.setGain(GAIN_TWOTHIRDS); // Configura GAIN_TWOTHIRDS (+/-6.144V)
+#if PROTOCOLO_BINARIO
+    // A 860 SPS cada conversión tarda ~1.2 ms: dos canales caben en 10 ms
+    ads.setDataRate(RATE_ADS1115_860SPS);
+#endif
   }
   // Si ads.begin() falla, no hacemos nada y no enviamos nada al serial.
 }
@@ -33,6 +69,11 @@ void loop(void)
   // 2. Lectura del valor RAW del canal A1 (Single-Ended)
   adc1_raw = ads.readADC_SingleEnded(1);
   
+#if PROTOCOLO_BINARIO
+  // 3. Envío binario: una trama con secuencia y checksum por muestra
+  enviarTrama(adc0_raw, adc1_raw);
+  delay(PERIODO_BINARIO_MS);
+#else
   // 3. Envío de datos al Monitor Serial (separados por coma)
   // Formato estricto: RAW_A0,RAW_A1\n
   
@@ -43,4 +84,5 @@ void loop(void)
 
   // Pequeño retardo para controlar la tasa de muestreo
   delay(100); 
+#endif
 }
@@ -0,0 +1,145 @@
+# ===============================================================
+# 🐟 CALIBRACIÓN — tablas precalculadas de OD y pH cada 0.01 °C
+# ===============================================================
+# Con cada calibración se arman una sola vez dos tablas densas sobre el
+# rango de DO_Table (0–40 °C, 4001 puntos):
+#   factor_do[i]   = DO_interp(T) / V_saturacion(T) / 1000   → OD = mV · factor
+#   pendiente[i]   = PH_A25 · (T + 273.15) / 298.15          → pH = pendiente · V + PH_B
+# Convertir es entonces un índice (temperatura redondeada a 0.01 °C) y
+# una multiplicación; voltajes y temperaturas pueden ser arreglos numpy.
+#
+# Los valores se leen de calibracion.json (CAL1_V, CAL1_T, CAL2_V, CAL2_T,
+# PH_A25, PH_B; las claves que falten toman el valor de v25). revisar()
+# mira la fecha de modificación del archivo cada INTERVALO_REVISION
+# segundos y recarga sin reiniciar v25. Una calibración inválida se
+# rechaza y sigue la anterior.
+
+import json
+import os
+
+try:
+    import numpy as np
+except ImportError:                 # sin numpy: solo escalares
+    np = None
+
+PASOS_POR_GRADO = 100               # resolución 0.01 °C
+INTERVALO_REVISION = 2.0            # segundos entre consultas al archivo
+CLAVES = ("CAL1_V", "CAL1_T", "CAL2_V", "CAL2_T", "PH_A25", "PH_B")
+
+class Calibracion:
+    """Conversión voltaje → OD / pH por tabla, recargable en caliente."""
+
+    def __init__(self, valores, DO_Table, ruta=None):
+        self.DO_Table = list(DO_Table)
+        self.t_max = len(self.DO_Table) - 1          # °C (la tabla arranca en 0 °C)
+        self.ruta = ruta
+        self.valores = None
+        self._por_defecto = dict(valores)
+        self._mtime = None
+        self._proxima_revision = 0.0
+        self.aplicar(valores)
+
+    @classmethod
+    def desde_archivo(cls, ruta, por_defecto, DO_Table):
+        """Calibración de `ruta` (si existe) completada con `por_defecto`."""
+        calibracion = cls(por_defecto, DO_Table, ruta)
+        calibracion.revisar(0.0)
+        return calibracion
+
+    # ------------------------------
+    # CONSTRUCCIÓN DE TABLAS
+    # ------------------------------
+    def aplicar(self, valores):
+        """Valida y arma las tablas. Lanza ValueError si la calibración no sirve."""
+        try:
+            v = {clave: float(valores[clave]) for clave in CLAVES}
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"calibración incompleta o no numérica: {e}")
+        if v["CAL1_T"] == v["CAL2_T"]:
+            raise ValueError("CAL1_T y CAL2_T deben ser distintas")
+
+        tabla = self.DO_Table
+        pendiente_v = (v["CAL1_V"] - v["CAL2_V"]) / (v["CAL1_T"] - v["CAL2_T"])
+        factor_do, pendiente_ph = [], []
+        for i in range(self.t_max * PASOS_POR_GRADO + 1):
+            t = i / PASOS_POR_GRADO
+            v_saturacion = (t - v["CAL2_T"]) * pendiente_v + v["CAL2_V"]
+            if v_saturacion <= 0:
+                raise ValueError(f"voltaje de saturación {v_saturacion:.1f} mV a {t:.2f} °C")
+            inferior = int(t)
+            superior = min(inferior + 1, self.t_max)
+            do_interp = tabla[inferior] + (tabla[superior] - tabla[inferior]) * (t - inferior)   # μg/L
+            factor_do.append(do_interp / v_saturacion / 1000.0)
+            pendiente_ph.append(v["PH_A25"] * ((t + 273.15) / 298.15))
+
+        tablas = {"factor_do": factor_do, "pendiente_ph": pendiente_ph}
+        if np is not None:
+            tablas.update({nombre + "_np": np.array(valores_tabla)
+                           for nombre, valores_tabla in list(tablas.items())})
+        tablas["PH_B"] = v["PH_B"]
+        self._tablas = tablas            # una sola asignación: el cambio es atómico
+        self.valores = v
+
+    # ------------------------------
+    # RECARGA EN CALIENTE
+    # ------------------------------
+    def revisar(self, ahora):
+        """Recarga el archivo si cambió (como mucho cada INTERVALO_REVISION). True si recargó."""
+        if self.ruta is None or ahora < self._proxima_revision:
+            return False
+        self._proxima_revision = ahora + INTERVALO_REVISION
+        try:
+            mtime = os.stat(self.ruta).st_mtime_ns
+        except OSError:
+            return False                 # sin archivo: siguen los valores actuales
+        if mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        try:
+            with open(self.ruta) as f:
+                valores = dict(self._por_defecto, **json.load(f))
+            self.aplicar(valores)
+        except (OSError, ValueError) as e:   # json.JSONDecodeError es ValueError
+            print(f"[ERROR] Calibración {self.ruta} rechazada: {e}. Se mantiene la anterior")
+            return False
+        print(f"[OK] Calibración cargada de {self.ruta}: "
+              + ", ".join(f"{clave}={self.valores[clave]:g}" for clave in CLAVES))
+        return True
+
+    # ------------------------------
+    # CONVERSIÓN
+    # ------------------------------
+    def indice(self, temperatura_c):
+        """Posición en las tablas (temperatura limitada a 0–40 °C y redondeada a 0.01)."""
+        if np is not None and isinstance(temperatura_c, np.ndarray):
+            return np.rint(np.clip(temperatura_c, 0, self.t_max) * PASOS_POR_GRADO).astype(np.intp)
+        return int(min(max(temperatura_c, 0), self.t_max) * PASOS_POR_GRADO + 0.5)
+
+    def _buscar(self, nombre, temperatura_c, tablas):
+        if type(temperatura_c) is float or type(temperatura_c) is int:   # camino habitual: un índice
+            return tablas[nombre][int(min(max(temperatura_c, 0), self.t_max) * PASOS_POR_GRADO + 0.5)]
+        i = self.indice(temperatura_c)
+        if isinstance(i, int):
+            return tablas[nombre][i]
+        return tablas[nombre + "_np"][i]
+
+    def factor_do(self, temperatura_c):
+        """mg/L por mV del sensor de oxígeno a esa temperatura."""
+        return self._buscar("factor_do", temperatura_c, self._tablas)
+
+    def pendiente_ph(self, temperatura_c):
+        """Pendiente pH/V del electrodo compensada por temperatura."""
+        return self._buscar("pendiente_ph", temperatura_c, self._tablas)
+
+    @property
+    def ph_b(self):
+        return self._tablas["PH_B"]
+
+    def oxigeno(self, voltaje_mv, temperatura_c):
+        """OD en mg/L (voltaje y/o temperatura pueden ser arreglos numpy)."""
+        return voltaje_mv * self._buscar("factor_do", temperatura_c, self._tablas)
+
+    def ph(self, voltaje, temperatura_c):
+        """pH compensado (voltaje y/o temperatura pueden ser arreglos numpy)."""
+        tablas = self._tablas            # misma calibración para pendiente y ordenada
+        return self._buscar("pendiente_ph", temperatura_c, tablas) * voltaje + tablas["PH_B"]
@@ -0,0 +1,519 @@
+# ===============================================================
+# 🐟 CONCENTRADOR — telemetría de toda la flota de estanques
+# ===============================================================
+# Cada Raspberry Pi (v25 + logger + Flask) guarda su propia monitoreo.db
+# y sirve su propio panel: ver 20 estanques era abrir 20 pestañas.
+#
+# El concentrador recibe por UDP el mismo datagrama de telemetria.py que
+# v25 manda al logger (v25 también lo envía aquí si TILAPIA_CONCENTRADOR
+# = "host:puerto") y:
+#   - guarda la última muestra de cada estanque en memoria (vista en vivo)
+#   - detecta el inicio y el fin de cada código de error (tabla errores)
+#   - cada INTERVALO_MUESTRA escribe, por estanque, el promedio de lo
+#     recibido en una tabla por día (muestras_AAAAMMDD) con clave primaria
+#     (estanque, ts): un rango de un estanque lee solo los días que toca,
+#     y borrar días viejos es un DROP TABLE
+#   - sirve una API JSON de la flota con http.server (como el resto de
+#     PID/, no depende de Flask)
+#
+# Todo el ingreso corre en un solo hilo; la API lee la memoria bajo un
+# lock y la BD con su propia conexión.
+#
+# El número de estanque identifica al estanque en toda la flota: cada
+# nodo configura los suyos con TILAPIA_ESTANQUES (ver v25.py). Si el
+# mismo número llega desde dos nodos a la vez se cuenta como conflicto.
+#
+# API:
+#   GET /api/flota                                   último estado de cada estanque
+#   GET /api/estanques/<n>/historial?desde=&hasta=&limite=   (epoch en s)
+#   GET /api/errores?estanque=&activos=1
+#   GET /api/metricas                                datagramas/s, CPU, escrituras
+#
+# Uso: python3 concentrador.py [--udp 5020] [--http 8090] [--db concentrador.db]
+
+import argparse
+import json
+import os
+import signal
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import telemetria
+
+# ==============================
+# CONFIGURACIÓN
+# ==============================
+UDP_IP = "0.0.0.0"
+UDP_PORT = 5020
+UDP_BUFFER_SO = 4 << 20            # bytes del buffer del socket (ráfagas de la flota)
+HTTP_IP = "0.0.0.0"
+HTTP_PORT = 8090
+DB_FILE = os.environ.get("TILAPIA_CONCENTRADOR_DB", "concentrador.db")
+
+INTERVALO_MUESTRA = 1.0            # s entre filas guardadas por estanque (promedio de lo recibido)
+ESTANQUE_INACTIVO = 10.0           # s sin datagramas → el estanque figura inactivo
+RETENCION_DIAS = 90                # días de muestras que se conservan
+COLA_MAXIMA = 100000               # filas retenidas si la BD está bloqueada
+SALTO_MAXIMO_SECUENCIA = 10000     # salto mayor → el nodo se reinició, no son pérdidas
+HISTORIAL_LIMITE = 3600            # filas por defecto de /historial
+HISTORIAL_LIMITE_MAXIMO = 100000
+
+# ==============================
+# ESQUEMA
+# ==============================
+ESQUEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS particiones (
+        tabla TEXT PRIMARY KEY,
+        desde REAL NOT NULL,            -- epoch de la medianoche local del día
+        hasta REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS errores (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        estanque INTEGER NOT NULL,
+        codigo INTEGER NOT NULL,
+        nodo TEXT,
+        inicio REAL NOT NULL,
+        fin REAL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_errores_estanque_inicio ON errores(estanque, inicio)",
+    "CREATE INDEX IF NOT EXISTS idx_errores_activos ON errores(estanque, codigo) WHERE fin IS NULL",
+)
+
+SQL_PARTICION = """
+    CREATE TABLE IF NOT EXISTS {tabla} (
+        estanque INTEGER NOT NULL,
+        ts REAL NOT NULL,
+        ph REAL, o2 REAL, temp REAL,
+        n INTEGER NOT NULL,             -- datagramas promediados
+        errores INTEGER NOT NULL,       -- máscara de telemetria.py (OR del intervalo)
+        PRIMARY KEY (estanque, ts)
+    ) WITHOUT ROWID
+"""
+
+def nombre_particion(t):
+    return "muestras_" + time.strftime("%Y%m%d", time.localtime(t))
+
+def limites_dia(t):
+    """(desde, hasta) en epoch del día local que contiene t."""
+    dia = datetime.fromtimestamp(t).replace(hour=0, minute=0, second=0, microsecond=0)
+    return dia.timestamp(), (dia + timedelta(days=1)).timestamp()
+
+def conectar(db_file):
+    conn = sqlite3.connect(db_file, timeout=1.0)
+    conn.execute("PRAGMA journal_mode=WAL;").fetchone()
+    conn.execute("PRAGMA synchronous=NORMAL;")
+    return conn
+
+def inicializar_esquema(conn):
+    with conn:
+        for sql in ESQUEMA:
+            conn.execute(sql)
+
+# ==============================
+# ESTADO POR ESTANQUE
+# ==============================
+class EstanqueFlota:
+    """Lo último recibido de un estanque y lo acumulado para la próxima fila."""
+
+    __slots__ = ("numero", "nodo", "muestra", "t_ultima", "secuencia", "recibidos", "perdidos",
+                 "errores", "n", "suma_ph", "suma_o2", "suma_temp", "mascara", "por_segundo")
+
+    def __init__(self, numero):
+        self.numero = numero
+        self.nodo = None                # "ip:puerto" del último datagrama
+        self.muestra = None
+        self.t_ultima = None            # monotonic del concentrador
+        self.secuencia = None
+        self.recibidos = 0
+        self.perdidos = 0               # huecos en la secuencia
+        self.errores = set()            # códigos activos
+        self.por_segundo = 0.0
+        self._reiniciar_intervalo()
+
+    def _reiniciar_intervalo(self):
+        self.n = 0
+        self.suma_ph = self.suma_o2 = self.suma_temp = 0.0
+        self.mascara = 0
+
+# ==============================
+# CONCENTRADOR
+# ==============================
+class Concentrador:
+    """Ingreso de datagramas, escritura por intervalos y consultas de la API."""
+
+    def __init__(self, db_file=DB_FILE, intervalo_muestra=INTERVALO_MUESTRA, retencion_dias=RETENCION_DIAS):
+        self.db_file = db_file
+        self.intervalo_muestra = intervalo_muestra
+        self.retencion_dias = retencion_dias
+        self.conn = conectar(db_file)
+        inicializar_esquema(self.conn)
+
+        self.estanques = {}             # numero → EstanqueFlota
+        self._lock = threading.Lock()   # estanques y contadores (hilo de ingreso / API)
+        self._filas = []                # filas de muestras esperando escritura
+        self._eventos = []              # ("inicio"|"fin", estanque, codigo, nodo, instante)
+        self._particiones = {t for (t,) in self.conn.execute("SELECT tabla FROM particiones")}
+        self.t_volcado = time.monotonic() + intervalo_muestra
+
+        # --- Estadísticas ---
+        self.datagramas = 0
+        self.invalidos = 0
+        self.conflictos = 0
+        self.filas_escritas = 0
+        self.commits = 0
+        self.fallos_bd = 0
+        self.descartadas = 0
+        self.latencia_total = 0.0
+        self.latencia_max = 0.0
+        self.datagramas_s = 0.0
+        self.cpu = 0.0                  # fracción de un núcleo en el último intervalo
+        self._t_ritmo = (time.monotonic(), time.process_time(), 0)
+
+        self._cargar_errores_activos()
+
+    def _cargar_errores_activos(self):
+        """Errores que quedaron abiertos al detenerse: siguen abiertos, no se duplican."""
+        for estanque, codigo, nodo in self.conn.execute(
+                "SELECT estanque, codigo, nodo FROM errores WHERE fin IS NULL"):
+            e = self.estanques.setdefault(estanque, EstanqueFlota(estanque))
+            e.errores.add(codigo)
+            e.nodo = e.nodo or nodo
+
+    # ------------------------------
+    # INGRESO (hilo de ingreso)
+    # ------------------------------
+    def recibir(self, datos, origen, ahora):
+        """Un datagrama de telemetría; origen = (ip, puerto), ahora = monotonic."""
+        try:
+            muestra = telemetria.decodificar(datos)
+        except (ValueError, UnicodeError):
+            self.invalidos += 1
+            return
+        nodo = f"{origen[0]}:{origen[1]}"
+        numero = muestra["estanque"]
+
+        with self._lock:
+            self.datagramas += 1
+            e = self.estanques.get(numero)
+            if e is None:
+                e = self.estanques[numero] = EstanqueFlota(numero)
+
+            if e.nodo != nodo:
+                if e.t_ultima is not None and ahora - e.t_ultima < ESTANQUE_INACTIVO:
+                    if self.conflictos == 0:
+                        print(f"[WARN] Estanque {numero} llega desde {e.nodo} y {nodo}: números repetidos en la flota")
+                    self.conflictos += 1
+                e.nodo = nodo
+
+            secuencia = muestra["secuencia"]
+            if secuencia is not None and e.secuencia is not None:
+                salto = (secuencia - e.secuencia) & 0xFFFFFFFF
+                if 1 < salto <= SALTO_MAXIMO_SECUENCIA:
+                    e.perdidos += salto - 1
+            e.secuencia = secuencia
+
+            e.muestra = muestra
+            e.t_ultima = ahora
+            e.recibidos += 1
+            e.n += 1
+            e.suma_ph += muestra["ph"]
+            e.suma_o2 += muestra["o2"]
+            e.suma_temp += muestra["temp"]
+            mascara = telemetria.errores_a_mascara(muestra["errores"])
+            e.mascara |= mascara
+
+            actual = set(muestra["errores"])
+            if actual != e.errores:
+                instante = time.time()
+                for codigo in actual - e.errores:
+                    self._eventos.append(("inicio", numero, codigo, nodo, instante))
+                for codigo in e.errores - actual:
+                    self._eventos.append(("fin", numero, codigo, nodo, instante))
+                e.errores = actual
+
+    def volcar(self):
+        """Una fila por estanque con datos del intervalo + eventos de error, en una transacción."""
+        ahora = time.monotonic()
+        t = round(time.time(), 3)
+        with self._lock:
+            for e in self.estanques.values():
+                e.por_segundo = e.n / self.intervalo_muestra
+                if e.n:
+                    self._filas.append((e.numero, t, e.suma_ph / e.n, e.suma_o2 / e.n,
+                                        e.suma_temp / e.n, e.n, e.mascara))
+                    e._reiniciar_intervalo()
+            eventos, self._eventos = self._eventos, []
+            datagramas = self.datagramas
+
+        if len(self._filas) > COLA_MAXIMA:
+            self.descartadas += len(self._filas) - COLA_MAXIMA
+            del self._filas[:-COLA_MAXIMA]
+
+        t0 = time.perf_counter()
+        try:
+            with self.conn:
+                for tabla, filas in self._por_particion(self._filas).items():
+                    self.conn.executemany(f"INSERT OR REPLACE INTO {tabla} VALUES (?, ?, ?, ?, ?, ?, ?)", filas)
+                for tipo, estanque, codigo, nodo, instante in eventos:
+                    if tipo == "inicio":
+                        self.conn.execute(
+                            "INSERT INTO errores (estanque, codigo, nodo, inicio) VALUES (?, ?, ?, ?)",
+                            (estanque, codigo, nodo, instante))
+                    else:
+                        self.conn.execute(
+                            "UPDATE errores SET fin = ? WHERE estanque = ? AND codigo = ? AND fin IS NULL",
+                            (instante, estanque, codigo))
+        except sqlite3.Error as ex:
+            self.fallos_bd += 1
+            self._particiones = {t for (t,) in self.conn.execute("SELECT tabla FROM particiones")}
+            with self._lock:
+                self._eventos[:0] = eventos     # se reintentan en el próximo volcado
+            print("[WARN BD] No se pudo escribir:", ex)
+        else:
+            latencia = time.perf_counter() - t0
+            self.filas_escritas += len(self._filas)
+            self.commits += 1
+            self.latencia_total += latencia
+            self.latencia_max = max(self.latencia_max, latencia)
+            self._filas = []
+
+        # Ritmo de ingreso y CPU del proceso desde el volcado anterior
+        t_ant, cpu_ant, datagramas_ant = self._t_ritmo
+        cpu = time.process_time()
+        if ahora > t_ant:
+            self.datagramas_s = (datagramas - datagramas_ant) / (ahora - t_ant)
+            self.cpu = (cpu - cpu_ant) / (ahora - t_ant)
+        self._t_ritmo = (ahora, cpu, datagramas)
+        self.t_volcado = ahora + self.intervalo_muestra
+
+    def _por_particion(self, filas):
+        """{tabla: filas}, creando las tablas de días nuevos."""
+        grupos = {}
+        for fila in filas:
+            tabla = nombre_particion(fila[1])
+            if tabla not in grupos:
+                if tabla not in self._particiones:
+                    self._crear_particion(tabla, fila[1])
+                grupos[tabla] = []
+            grupos[tabla].append(fila)
+        return grupos
+
+    def _crear_particion(self, tabla, t):
+        desde, hasta = limites_dia(t)
+        self.conn.execute(SQL_PARTICION.format(tabla=tabla))
+        self.conn.execute("INSERT OR IGNORE INTO particiones (tabla, desde, hasta) VALUES (?, ?, ?)",
+                          (tabla, desde, hasta))
+        self._particiones.add(tabla)
+
+        # Día nuevo: se borran los vencidos
+        limite = time.time() - self.retencion_dias * 86400
+        for (vieja,) in self.conn.execute("SELECT tabla FROM particiones WHERE hasta <= ?", (limite,)).fetchall():
+            self.conn.execute(f"DROP TABLE IF EXISTS {vieja}")
+            self.conn.execute("DELETE FROM particiones WHERE tabla = ?", (vieja,))
+            self._particiones.discard(vieja)
+
+    def bucle(self, sock):
+        """Recibe hasta que se interrumpa; vuelca cada intervalo_muestra."""
+        sock.settimeout(min(0.2, self.intervalo_muestra))
+        while True:
+            try:
+                datos, origen = sock.recvfrom(2048)
+            except socket.timeout:
+                datos = None
+            ahora = time.monotonic()
+            if datos:
+                self.recibir(datos, origen, ahora)
+            if ahora >= self.t_volcado:
+                self.volcar()
+
+    def cerrar(self):
+        self.volcar()
+        self.conn.close()
+
+    # ------------------------------
+    # CONSULTAS (hilos de la API)
+    # ------------------------------
+    def flota(self):
+        ahora = time.monotonic()
+        resultado = []
+        with self._lock:
+            for numero in sorted(self.estanques):
+                e = self.estanques[numero]
+                m = e.muestra
+                edad = None if e.t_ultima is None else ahora - e.t_ultima
+                resultado.append({
+                    "estanque": numero,
+                    "nodo": e.nodo,
+                    "activo": edad is not None and edad < ESTANQUE_INACTIVO,
+                    "edad_s": None if edad is None else round(edad, 2),
+                    "ph": None if m is None else round(m["ph"], 4),
+                    "o2": None if m is None else round(m["o2"], 4),
+                    "temp": None if m is None else round(m["temp"], 2),
+                    "errores": sorted(e.errores),
+                    "muestras_s": e.por_segundo,
+                    "recibidos": e.recibidos,
+                    "perdidos": e.perdidos,
+                })
+        return resultado
+
+    def historial(self, estanque, desde=None, hasta=None, limite=HISTORIAL_LIMITE):
+        """Filas de [desde, hasta) de un estanque, en orden de ts; solo lee las particiones del rango."""
+        hasta = time.time() if hasta is None else hasta
+        desde = hasta - 3600 if desde is None else desde
+        limite = max(1, min(limite, HISTORIAL_LIMITE_MAXIMO))
+        filas = []
+        conn = sqlite3.connect(self.db_file, timeout=1.0)
+        try:
+            tablas = conn.execute(
+                "SELECT tabla FROM particiones WHERE hasta > ? AND desde < ? ORDER BY desde",
+                (desde, hasta)).fetchall()
+            for (tabla,) in tablas:
+                filas += conn.execute(f"""
+                    SELECT ts, ph, o2, temp, n, errores FROM {tabla}
+                    WHERE estanque = ? AND ts >= ? AND ts < ?
+                    ORDER BY ts LIMIT ?
+                """, (estanque, desde, hasta, limite - len(filas))).fetchall()
+                if len(filas) >= limite:
+                    break
+        finally:
+            conn.close()
+        return [{"ts": ts, "ph": ph, "o2": o2, "temp": temp, "n": n,
+                 "errores": telemetria.mascara_a_errores(mascara)}
+                for ts, ph, o2, temp, n, mascara in filas]
+
+    def errores(self, estanque=None, activos=False, limite=500):
+        q = "SELECT estanque, codigo, nodo, inicio, fin FROM errores"
+        where, params = [], []
+        if estanque is not None:
+            where.append("estanque = ?")
+            params.append(estanque)
+        if activos:
+            where.append("fin IS NULL")
+        if where:
+            q += " WHERE " + " AND ".join(where)
+        q += " ORDER BY inicio DESC LIMIT ?"
+        params.append(limite)
+        conn = sqlite3.connect(self.db_file, timeout=1.0)
+        try:
+            filas = conn.execute(q, params).fetchall()
+        finally:
+            conn.close()
+        return [{"estanque": e, "codigo": c, "nodo": n, "inicio": i, "fin": f} for e, c, n, i, f in filas]
+
+    def metricas(self):
+        with self._lock:
+            activos = sum(1 for e in self.estanques.values()
+                          if e.t_ultima is not None and time.monotonic() - e.t_ultima < ESTANQUE_INACTIVO)
+            perdidos = sum(e.perdidos for e in self.estanques.values())
+            estanques = len(self.estanques)
+        return {
+            "estanques": estanques,
+            "activos": activos,
+            "datagramas": self.datagramas,
+            "datagramas_s": round(self.datagramas_s, 1),
+            "invalidos": self.invalidos,
+            "perdidos": perdidos,
+            "conflictos": self.conflictos,
+            "cpu": round(self.cpu, 3),
+            "filas_escritas": self.filas_escritas,
+            "commits": self.commits,
+            "commit_ms_prom": round(self.latencia_total / self.commits * 1000, 2) if self.commits else None,
+            "commit_ms_max": round(self.latencia_max * 1000, 2),
+            "fallos_bd": self.fallos_bd,
+            "descartadas": self.descartadas,
+        }
+
+# ==============================
+# API HTTP
+# ==============================
+class ManejadorAPI(BaseHTTPRequestHandler):
+    concentrador = None                 # se asigna en servir_api()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        args = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        partes = url.path.strip("/").split("/")
+        c = self.concentrador
+        try:
+            if url.path == "/api/flota":
+                return self._json(c.flota())
+            if url.path == "/api/metricas":
+                return self._json(c.metricas())
+            if url.path == "/api/errores":
+                estanque = int(args["estanque"]) if "estanque" in args else None
+                return self._json(c.errores(estanque, args.get("activos") == "1"))
+            if len(partes) == 4 and partes[:2] == ["api", "estanques"] and partes[3] == "historial":
+                desde = float(args["desde"]) if "desde" in args else None
+                hasta = float(args["hasta"]) if "hasta" in args else None
+                limite = int(args.get("limite", HISTORIAL_LIMITE))
+                return self._json(c.historial(int(partes[2]), desde, hasta, limite))
+        except ValueError:
+            return self._json({"ok": False, "msg": "parámetro inválido"}, 400)
+        except sqlite3.Error as e:
+            return self._json({"ok": False, "msg": str(e)}, 503)
+        self._json({"ok": False, "msg": "no existe"}, 404)
+
+    def _json(self, datos, estado=200):
+        cuerpo = json.dumps(datos).encode()
+        self.send_response(estado)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, formato, *args):
+        pass                            # sin una línea por request
+
+def servir_api(concentrador, ip=HTTP_IP, puerto=HTTP_PORT):
+    """Servidor HTTP en un hilo daemon; devuelve el servidor (server_address tiene el puerto real)."""
+    ManejadorAPI.concentrador = concentrador
+    servidor = ThreadingHTTPServer((ip, puerto), ManejadorAPI)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+def crear_socket_udp(ip=UDP_IP, puerto=UDP_PORT):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, UDP_BUFFER_SO)
+    sock.bind((ip, puerto))
+    return sock
+
+# ==============================
+# PROCESO PRINCIPAL
+# ==============================
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--udp", type=int, default=UDP_PORT)
+    ap.add_argument("--http", type=int, default=HTTP_PORT)
+    ap.add_argument("--db", default=DB_FILE)
+    ap.add_argument("--intervalo", type=float, default=INTERVALO_MUESTRA)
+    args = ap.parse_args()
+
+    concentrador = Concentrador(args.db, args.intervalo)
+    sock = crear_socket_udp(UDP_IP, args.udp)
+    servidor = servir_api(concentrador, HTTP_IP, args.http)
+    print(f"[CONCENTRADOR] UDP {sock.getsockname()[1]}, API http://{HTTP_IP}:{servidor.server_address[1]}/api/flota")
+
+    # SIGTERM → SystemExit, así se escribe lo pendiente antes de salir
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        concentrador.bucle(sock)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.shutdown()
+        concentrador.cerrar()
+        sock.close()
+
+if __name__ == "__main__":
+    main()
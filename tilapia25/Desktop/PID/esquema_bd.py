@@ -0,0 +1,252 @@
+# ===============================================================
+# 🐟 ESQUEMA SQLite — compartido por logger_3.py y app.py (Flask)
+# ===============================================================
+# Crea las tablas si no existen y aplica las migraciones pendientes.
+# Todas las sentencias son idempotentes: se puede llamar en cada arranque.
+#
+# Reconstrucción manual de los agregados:
+#   python3 esquema_bd.py --reconstruir-agregados [ruta/monitoreo.db]
+
+import sqlite3
+import sys
+from datetime import datetime
+
+# ==============================
+# TABLAS
+# ==============================
+TABLAS = [
+    """
+    CREATE TABLE IF NOT EXISTS lecturas (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        fecha TEXT,
+        hora TEXT,
+        ph REAL,
+        o2 REAL,
+        temp REAL,
+        pid_ph_down REAL,
+        pid_ph_up REAL,
+        pid_o2 REAL,
+        codigo_error TEXT,
+        estanque INTEGER DEFAULT 1
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS errores_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        codigo TEXT NOT NULL,
+        descripcion TEXT NOT NULL,
+        hora_inicio TEXT,
+        hora_fin TEXT,
+        resuelto INTEGER DEFAULT 0,
+        notificado_inicio INTEGER DEFAULT 0,
+        notificado_fin INTEGER DEFAULT 0,
+        estanque INTEGER DEFAULT 1
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS notificaciones (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        tipo TEXT NOT NULL,
+        mensaje TEXT NOT NULL,
+        hora TEXT NOT NULL,
+        leida INTEGER DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS acciones_manual (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        fecha TEXT NOT NULL,
+        hora TEXT NOT NULL,
+        accion TEXT NOT NULL,
+        descripcion TEXT NOT NULL,
+        valor TEXT,
+        estanque INTEGER DEFAULT 1
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS spool_posicion (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        segmento INTEGER NOT NULL,      -- próximo registro del spool del logger (ver spool.py)
+        posicion INTEGER NOT NULL
+    )
+    """,
+]
+
+# ==============================
+# AGREGADOS (hora / día / mes)
+# ==============================
+# Cada tabla guarda n, suma, mínimo y máximo de ph/o2/temp por estanque y
+# periodo. La clave es el mismo texto que usaba el agrupador de las gráficas:
+#   hora → 'YYYY-MM-DD HH:00', dia → 'YYYY-MM-DD', mes → 'YYYY-MM'
+# n cuenta lecturas; n_ph/n_o2/n_temp solo las que traen ese valor (SQLite
+# guarda NaN como NULL) y son el divisor de los promedios. Como SUM(),
+# MIN() y MAX(), el UPSERT ignora los NULL: reconstruir da lo mismo.
+AGREGADOS = {
+    "hora": "lecturas_hora",
+    "dia": "lecturas_dia",
+    "mes": "lecturas_mes",
+}
+VARIABLES = ("ph", "o2", "temp")
+
+_DDL_AGREGADOS = {}
+for _tabla in AGREGADOS.values():
+    _DDL_AGREGADOS[_tabla] = f"""
+    CREATE TABLE IF NOT EXISTS {_tabla} (
+        estanque INTEGER NOT NULL DEFAULT 1,
+        clave TEXT NOT NULL,
+        n INTEGER NOT NULL,
+        n_ph INTEGER NOT NULL, n_o2 INTEGER NOT NULL, n_temp INTEGER NOT NULL,
+        sum_ph REAL, sum_o2 REAL, sum_temp REAL,
+        min_ph REAL, max_ph REAL,
+        min_o2 REAL, max_o2 REAL,
+        min_temp REAL, max_temp REAL,
+        PRIMARY KEY (estanque, clave)
+    )
+    """
+TABLAS.extend(_DDL_AGREGADOS.values())
+
+def clave_agregado(nivel, fecha, hora):
+    if nivel == "hora":
+        return f"{fecha} {hora[:2]}:00"
+    if nivel == "dia":
+        return fecha
+    return fecha[:7]
+
+# Expresión SQL equivalente a clave_agregado() sobre columnas fecha/hora
+_CLAVE_SQL = {
+    "hora": "fecha || ' ' || substr(hora, 1, 2) || ':00'",
+    "dia": "fecha",
+    "mes": "substr(fecha, 1, 7)",
+}
+
+_COLUMNAS_AGREGADO = ", ".join(
+    [f"n_{v}" for v in VARIABLES] + [f"sum_{v}, min_{v}, max_{v}" for v in VARIABLES])
+
+def _sql_upsert(tabla):
+    # COALESCE(a OP b, a, b): si un lado es NULL queda el otro, como SUM/MIN/MAX
+    actualizar = ",\n            ".join(
+        f"n_{v} = n_{v} + excluded.n_{v}, "
+        f"sum_{v} = COALESCE(sum_{v} + excluded.sum_{v}, sum_{v}, excluded.sum_{v}), "
+        f"min_{v} = COALESCE(min(min_{v}, excluded.min_{v}), min_{v}, excluded.min_{v}), "
+        f"max_{v} = COALESCE(max(max_{v}, excluded.max_{v}), max_{v}, excluded.max_{v})"
+        for v in VARIABLES
+    )
+    return f"""
+        INSERT INTO {tabla} (estanque, clave, n, {_COLUMNAS_AGREGADO})
+        VALUES (?, ?, 1, ? IS NOT NULL, ? IS NOT NULL, ? IS NOT NULL, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(estanque, clave) DO UPDATE SET
+            n = n + 1,
+            {actualizar}
+    """
+
+_UPSERT = {nivel: _sql_upsert(tabla) for nivel, tabla in AGREGADOS.items()}
+
+def sentencias_agregados(fecha, hora, ph, o2, temp, estanque=1):
+    """
+    Sentencias (sql, params) que suman una lectura a los tres agregados.
+    Se ejecutan en la misma transacción que el INSERT en lecturas.
+    """
+    valores = (ph, o2, temp, ph, ph, ph, o2, o2, o2, temp, temp, temp)
+    return [(_UPSERT[nivel], (estanque, clave_agregado(nivel, fecha, hora)) + valores)
+            for nivel in AGREGADOS]
+
+def reconstruir_agregados(conn):
+    """Recalcula desde cero los agregados a partir de lecturas."""
+    calculos = ", ".join([f"COUNT({v})" for v in VARIABLES] +
+                         [f"SUM({v}), MIN({v}), MAX({v})" for v in VARIABLES])
+    with conn:
+        for nivel, tabla in AGREGADOS.items():
+            conn.execute(f"DELETE FROM {tabla}")
+            conn.execute(f"""
+                INSERT INTO {tabla} (estanque, clave, n, {_COLUMNAS_AGREGADO})
+                SELECT COALESCE(estanque, 1), {_CLAVE_SQL[nivel]}, COUNT(*), {calculos}
+                FROM lecturas
+                GROUP BY 1, 2
+            """)
+
+# ==============================
+# ÍNDICES
+# ==============================
+# Con un índice sobre (ts) SQLite guarda además el rowid (= id), por lo que
+# "ORDER BY ts, id" se resuelve recorriendo el índice sin ordenar.
+INDICES = [
+    "CREATE INDEX IF NOT EXISTS idx_lecturas_ts ON lecturas(ts)",
+    "CREATE INDEX IF NOT EXISTS idx_lecturas_fecha_hora ON lecturas(fecha, hora)",
+    "CREATE INDEX IF NOT EXISTS idx_lecturas_estanque_ts ON lecturas(estanque, ts)",
+    "CREATE INDEX IF NOT EXISTS idx_acciones_fecha_hora ON acciones_manual(fecha, hora)",
+    "CREATE INDEX IF NOT EXISTS idx_notificaciones_hora ON notificaciones(hora)",
+]
+
+# ==============================
+# AUXILIARES
+# ==============================
+def epoch_local(fecha, hora):
+    """
+    'YYYY-MM-DD', 'HH:MM:SS' (hora local) → segundos epoch (int).
+    Equivale a strftime('%s', fecha || ' ' || hora, 'utc') en SQLite.
+    """
+    return int(datetime.strptime(f"{fecha} {hora}", "%Y-%m-%d %H:%M:%S").timestamp())
+
+def _columnas(conn, tabla):
+    return {fila[1] for fila in conn.execute(f"PRAGMA table_info({tabla})")}
+
+# ==============================
+# MIGRACIONES
+# ==============================
+def _migrar_ts_lecturas(conn):
+    """Columna entera ts (epoch) en lecturas, rellenada desde fecha/hora."""
+    if "ts" not in _columnas(conn, "lecturas"):
+        conn.execute("ALTER TABLE lecturas ADD COLUMN ts INTEGER")
+
+    # El modificador 'utc' interpreta fecha/hora como hora local (igual que epoch_local)
+    conn.execute("""
+        UPDATE lecturas
+        SET ts = CAST(strftime('%s', fecha || ' ' || hora, 'utc') AS INTEGER)
+        WHERE ts IS NULL
+    """)
+
+def _migrar_estanque(conn):
+    """
+    Columna estanque en lecturas y errores_log (lo anterior es del estanque 1).
+    Los agregados sin estanque se vuelven a crear con clave (estanque, clave);
+    inicializar_esquema() los recalcula desde lecturas.
+    """
+    for tabla in ("lecturas", "errores_log"):
+        if "estanque" not in _columnas(conn, tabla):
+            conn.execute(f"ALTER TABLE {tabla} ADD COLUMN estanque INTEGER DEFAULT 1")
+
+    for tabla, ddl in _DDL_AGREGADOS.items():
+        if "estanque" not in _columnas(conn, tabla):
+            conn.execute(f"DROP TABLE {tabla}")
+            conn.execute(ddl)
+
+def inicializar_esquema(conn):
+    """Crea tablas, aplica migraciones y asegura los índices."""
+    for ddl in TABLAS:
+        conn.execute(ddl)
+
+    _migrar_ts_lecturas(conn)
+    _migrar_estanque(conn)
+
+    for ddl in INDICES:
+        conn.execute(ddl)
+
+    conn.commit()
+
+    # Primera vez con agregados sobre una BD con historial → calcularlos
+    sin_agregados = conn.execute("SELECT 1 FROM lecturas_mes LIMIT 1").fetchone() is None
+    con_lecturas = conn.execute("SELECT 1 FROM lecturas LIMIT 1").fetchone() is not None
+    if sin_agregados and con_lecturas:
+        reconstruir_agregados(conn)
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "--reconstruir-agregados":
+        ruta = sys.argv[2] if len(sys.argv) > 2 else "monitoreo.db"
+        conn = sqlite3.connect(ruta)
+        inicializar_esquema(conn)
+        reconstruir_agregados(conn)
+        n = conn.execute("SELECT COUNT(*) FROM lecturas_hora").fetchone()[0]
+        print(f"[OK] Agregados reconstruidos en {ruta} ({n} horas)")
+        conn.close()
+    else:
+        print("Uso: python3 esquema_bd.py --reconstruir-agregados [ruta/monitoreo.db]")
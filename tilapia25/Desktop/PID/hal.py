@@ -0,0 +1,292 @@
+# ===============================================================
+# 🐟 HAL — capa de hardware intercambiable para v25.py
+# ===============================================================
+# v25.py no importa RPi.GPIO, serial ni w1thermsensor directamente: pide
+# un objeto "hardware" con
+#   - reloj:                time() / monotonic() / sleep()
+#   - gpio:                 misma interfaz que RPi.GPIO (setmode, setup, output, input...)
+#   - abrir_serial(...):    objeto tipo serial.Serial (in_waiting, readline, ...)
+#   - sensor_temperatura(id): objeto con get_temperature() (DS18B20; id None = el único)
+#
+# Backends (variable de entorno TILAPIA_HAL):
+#   pi   → hardware real de la Raspberry (por defecto)
+#   sim  → todo en proceso, sin dispositivos. Con TILAPIA_RELOJ=virtual
+#          (por defecto en sim) el tiempo solo avanza con sleep(), así el
+#          bucle principal corre más rápido que el tiempo real.
+#          TILAPIA_SERIAL=ascii|binario elige el formato del Arduino simulado.
+
+import os
+import random
+import time
+from protocolo_serial import codificar_trama
+
+BACKEND = os.environ.get("TILAPIA_HAL", "pi").strip().lower()
+RELOJ = os.environ.get("TILAPIA_RELOJ", "virtual").strip().lower()
+
+try:
+    from serial import SerialException
+except ImportError:                 # sin pyserial (solo simulación)
+    class SerialException(OSError):
+        pass
+
+# ==============================
+# RELOJES
+# ==============================
+class RelojReal:
+    def time(self):
+        return time.time()
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def sleep(self, segundos):
+        if segundos > 0:
+            time.sleep(segundos)
+
+class RelojVirtual:
+    """Reloj simulado: no pasa el tiempo salvo en sleep() / avanzar()."""
+
+    def __init__(self, inicio=None):
+        self._inicio = time.time() if inicio is None else inicio
+        self._t = 0.0
+
+    def time(self):
+        return self._inicio + self._t
+
+    def monotonic(self):
+        return self._t
+
+    def sleep(self, segundos):
+        if segundos > 0:
+            self._t += segundos
+
+    avanzar = sleep
+
+# ==============================
+# GPIO SIMULADO
+# ==============================
+class GPIOSimulado:
+    """
+    Subconjunto de RPi.GPIO usado por v25.py.
+    Lleva la cuenta del tiempo en HIGH de cada pin y avisa a los
+    observadores (pin, valor, t) en cada cambio, para que el modelo
+    del estanque sepa qué actuadores están encendidos.
+    """
+    BCM, BOARD = 11, 10
+    OUT, IN = 0, 1
+    LOW, HIGH = 0, 1
+
+    def __init__(self, reloj):
+        self.reloj = reloj
+        self.modo = None
+        self.pines = {}            # pin → nivel actual
+        self.tiempo_alto = {}      # pin → segundos acumulados en HIGH
+        self._alto_desde = {}      # pin → monotonic del último flanco ascendente
+        self.observadores = []
+
+    def setmode(self, modo):
+        self.modo = modo
+
+    def setwarnings(self, activar):
+        pass
+
+    def setup(self, pin, direccion, initial=LOW):
+        self.pines.setdefault(pin, self.LOW)
+        self.tiempo_alto.setdefault(pin, 0.0)
+        if direccion == self.OUT:
+            self.output(pin, initial)
+
+    def output(self, pin, valor):
+        valor = self.HIGH if valor else self.LOW
+        anterior = self.pines.get(pin, self.LOW)
+        self.pines[pin] = valor
+        if valor == anterior:
+            return
+        ahora = self.reloj.monotonic()
+        if valor == self.HIGH:
+            self._alto_desde[pin] = ahora
+        else:
+            desde = self._alto_desde.pop(pin, ahora)
+            self.tiempo_alto[pin] = self.tiempo_alto.get(pin, 0.0) + (ahora - desde)
+        for observador in self.observadores:
+            observador(pin, valor, ahora)
+
+    def input(self, pin):
+        return self.pines.get(pin, self.LOW)
+
+    def encendido(self, pin):
+        return self.pines.get(pin, self.LOW) == self.HIGH
+
+    def segundos_encendido(self, pin):
+        """Tiempo total en HIGH, incluido el tramo en curso."""
+        total = self.tiempo_alto.get(pin, 0.0)
+        if pin in self._alto_desde:
+            total += self.reloj.monotonic() - self._alto_desde[pin]
+        return total
+
+    def cleanup(self):
+        for pin in list(self._alto_desde):
+            self.output(pin, self.LOW)
+
+# ==============================
+# MODELO POR DEFECTO
+# ==============================
+class ModeloEstatico:
+    """
+    Estanque "quieto": pH 7.5, O2 5 mg/L y 25 °C con algo de ruido.
+    Las cuentas del ADS1115 salen de invertir las conversiones de v25
+    a 25 °C (A0: pH = -5.7·V + 21.34, 0.1875 mV/cuenta;
+    A1: O2 = V_mV·8.25/1600, 0.125 mV/cuenta).
+    El ruido evita que verificar_sensores marque valores congelados.
+    """
+    CUENTAS_A0 = 12949
+    CUENTAS_A1 = 7758
+    RUIDO_CUENTAS = 6
+    TEMPERATURA = 25.0
+
+    def __init__(self, semilla=None):
+        self._azar = random.Random(semilla)
+
+    def conectar(self, hardware):
+        pass
+
+    def leer_adc(self, t):
+        r = self.RUIDO_CUENTAS
+        return (self.CUENTAS_A0 + self._azar.randint(-r, r),
+                self.CUENTAS_A1 + self._azar.randint(-r, r))
+
+    def leer_temperatura(self, t):
+        return self.TEMPERATURA + self._azar.uniform(-0.05, 0.05)
+
+# ==============================
+# SERIAL SIMULADO (Arduino + ADS1115)
+# ==============================
+# Mismos formatos y ritmos que sketch_oct09a.ino (ver protocolo_serial.py)
+PROTOCOLO_SERIAL = os.environ.get("TILAPIA_SERIAL", "ascii").strip().lower()
+PERIODO_ARDUINO = {
+    "ascii": 0.1,          # delay(100) entre líneas "A0,A1"
+    "binario": 0.01,       # tramas binarias a ~100 Hz
+}
+MAX_BYTES_BUFFER = 4096    # el buffer de entrada no crece sin límite
+
+class SerialSimulado:
+    """Genera datos del Arduino a ritmo fijo según el reloj del hardware."""
+
+    def __init__(self, reloj, leer_adc, periodo=None, protocolo="ascii"):
+        self.reloj = reloj
+        self.leer_adc = leer_adc
+        self.binario = protocolo == "binario"
+        self.periodo = periodo or PERIODO_ARDUINO["binario" if self.binario else "ascii"]
+        self.is_open = True
+        self._buffer = bytearray()
+        self._secuencia = 0
+        self._ultima = reloj.monotonic()
+
+    def _generar(self):
+        if not self.is_open:
+            raise SerialException("puerto simulado cerrado")
+        ahora = self.reloj.monotonic()
+        n = int((ahora - self._ultima) / self.periodo)
+        if n <= 0:
+            return
+        for k in range(n):
+            a0, a1 = self.leer_adc(self._ultima + (k + 1) * self.periodo)
+            if self.binario:
+                self._buffer += codificar_trama(self._secuencia, a0, a1)
+                self._secuencia = (self._secuencia + 1) & 0xFFFF
+            else:
+                self._buffer += f"{a0},{a1}\r\n".encode()
+        if len(self._buffer) > MAX_BYTES_BUFFER:
+            del self._buffer[:len(self._buffer) - MAX_BYTES_BUFFER]
+        self._ultima += n * self.periodo
+
+    @property
+    def in_waiting(self):
+        self._generar()
+        return len(self._buffer)
+
+    def read(self, n=1):
+        self._generar()
+        datos = bytes(self._buffer[:n])
+        del self._buffer[:n]
+        return datos
+
+    def readline(self):
+        self._generar()
+        fin = self._buffer.find(b"\n")
+        return self.read(fin + 1 if fin >= 0 else len(self._buffer))
+
+    def reset_input_buffer(self):
+        self._buffer.clear()
+
+    def write(self, datos):
+        return len(datos)
+
+    def close(self):
+        self.is_open = False
+
+class SensorTemperaturaSimulado:
+    def __init__(self, reloj, leer_temperatura):
+        self.reloj = reloj
+        self.leer_temperatura = leer_temperatura
+
+    def get_temperature(self):
+        return self.leer_temperatura(self.reloj.monotonic())
+
+# ==============================
+# BACKENDS
+# ==============================
+class HardwarePi:
+    nombre = "pi"
+    tiempo_virtual = False
+
+    def __init__(self):
+        import RPi.GPIO as GPIO
+        self.reloj = RelojReal()
+        self.gpio = GPIO
+
+    def abrir_serial(self, puerto, baudios, timeout):
+        import serial
+        return serial.Serial(puerto, baudios, timeout=timeout)
+
+    def sensor_temperatura(self, sensor_id=None):
+        from w1thermsensor import W1ThermSensor
+        if sensor_id:                   # varios DS18B20 en el bus 1-Wire: uno por estanque
+            return W1ThermSensor(sensor_id=sensor_id)
+        return W1ThermSensor()
+
+class HardwareSimulado:
+    nombre = "sim"
+
+    def __init__(self, modelo=None, reloj=None, protocolo_serial=None, periodo_serial=None, modelos=None):
+        """
+        modelos: {puerto serial o id de sensor: modelo} para simular varios
+        estanques; lo que no esté ahí lee de `modelo`.
+        """
+        self.reloj = reloj or (RelojReal() if RELOJ == "real" else RelojVirtual())
+        self.tiempo_virtual = isinstance(self.reloj, RelojVirtual)   # sin hilos: todo avanza con sleep()
+        self.protocolo_serial = protocolo_serial or PROTOCOLO_SERIAL
+        self.periodo_serial = periodo_serial
+        self.gpio = GPIOSimulado(self.reloj)
+        self.modelo = modelo or ModeloEstatico()
+        self.modelos = dict(modelos or {})
+        for m in {id(m): m for m in [self.modelo, *self.modelos.values()]}.values():
+            m.conectar(self)
+
+    def abrir_serial(self, puerto, baudios, timeout):
+        modelo = self.modelos.get(puerto, self.modelo)
+        return SerialSimulado(self.reloj, modelo.leer_adc,
+                              self.periodo_serial, self.protocolo_serial)
+
+    def sensor_temperatura(self, sensor_id=None):
+        modelo = self.modelos.get(sensor_id, self.modelo)
+        return SensorTemperaturaSimulado(self.reloj, modelo.leer_temperatura)
+
+def crear_hardware(backend=None, **opciones):
+    """Hardware según `backend` o TILAPIA_HAL ('pi' | 'sim')."""
+    backend = (backend or BACKEND)
+    if backend == "sim":
+        return HardwareSimulado(**opciones)
+    if backend == "pi":
+        return HardwarePi()
+    raise ValueError(f"TILAPIA_HAL desconocido: {backend!r} (use 'pi' o 'sim')")
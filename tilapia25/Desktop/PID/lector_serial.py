@@ -0,0 +1,167 @@
+# ===============================================================
+# 🐟 LECTOR SERIAL — adquisición en un hilo dedicado para v25.py
+# ===============================================================
+# El hilo lee del puerto en bloque (ser.read), parsea con ParserSerial,
+# marca cada bloque de muestras (matriz N×2 A0/A1) con la hora de llegada
+# y lo deja en una cola acotada (deque con maxlen: append/popleft son
+# atómicos en CPython, el bucle de control no toma ningún lock). El bucle
+# de control vacía la cola completa en cada iteración con drenar().
+#
+# La reconexión (con espera creciente) también ocurre en el hilo, así el
+# bucle de control sigue atendiendo TCP/UDP y deja los actuadores en
+# estado seguro mientras no hay puerto.
+#
+# Modo síncrono (reloj virtual del simulador): sin hilo, drenar() hace
+# una lectura no bloqueante del puerto antes de vaciar la cola.
+
+import threading
+from collections import deque
+
+from protocolo_serial import ParserSerial
+from procesamiento import a_bloque, concatenar, np
+
+COLA_MAX_BLOQUES = 2000            # lecturas del puerto (≥ 2000 muestras, ~20 s a 100 Hz); se descartan las más viejas
+ESPERA_RECONEXION = (1, 2, 4, 8, 16, 30)   # segundos entre intentos de apertura
+ESPERA_SIN_DATOS = 0.005           # pausa si read() vuelve vacío sin timeout (simulador)
+
+class LectorSerial:
+    """Hilo de lectura serial con cola de muestras acotada."""
+
+    def __init__(self, abrir, reloj, protocolo="auto", max_bloques=COLA_MAX_BLOQUES,
+                 sincronico=False):
+        self.abrir = abrir              # callable → objeto serial (o excepción)
+        self.reloj = reloj
+        self.parser = ParserSerial(protocolo)
+        self.sincronico = sincronico
+        self.ser = None
+        self.error = None               # 14 = no abre, 15 = falla de lectura
+        self.descartadas = 0            # muestras perdidas por cola llena
+        self.reconexiones = 0
+        self._abierto_antes = False
+        self._cola = deque(maxlen=max_bloques)   # (t, bloque) por cada lectura con datos
+        self._intento = 0
+        self._proximo_intento = 0.0
+        self._parar = threading.Event()
+        self._hilo = None
+
+    # ------------------------------
+    # CICLO DE VIDA
+    # ------------------------------
+    def iniciar(self):
+        if self.sincronico:
+            self._paso(bloquear=False)
+            return
+        self._hilo = threading.Thread(target=self._bucle, name="lector-serial", daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._parar.set()
+        if self._hilo:
+            self._hilo.join(timeout=2.0)
+        self._cerrar()
+
+    def conectado(self):
+        return self.ser is not None
+
+    def estadisticas(self):
+        datos = self.parser.estadisticas()
+        datos.update({
+            "en_cola": sum(len(bloque) for _, bloque in list(self._cola)),
+            "descartadas": self.descartadas,
+            "reconexiones": self.reconexiones,
+        })
+        return datos
+
+    # ------------------------------
+    # LADO DEL CONTROL
+    # ------------------------------
+    def drenar(self):
+        """
+        Todas las muestras pendientes en orden de llegada: (tiempos, bloque),
+        con un tiempo por fila del bloque N×2 (ver procesamiento.py).
+        """
+        if self.sincronico:
+            self._paso(bloquear=False)
+        tiempos, bloques = [], []
+        while True:
+            try:
+                t, bloque = self._cola.popleft()
+            except IndexError:
+                return tiempos, concatenar(bloques)
+            tiempos.extend([t] * len(bloque))
+            bloques.append(bloque)
+
+    # ------------------------------
+    # LADO DEL HILO
+    # ------------------------------
+    def _bucle(self):
+        while not self._parar.is_set():
+            espera = self._paso(bloquear=True)
+            if espera:
+                self._parar.wait(espera)
+
+    def _paso(self, bloquear):
+        """Una apertura o una lectura. Devuelve cuánto esperar (s) antes del próximo paso."""
+        if self.ser is None:
+            return self._conectar()
+        try:
+            if bloquear:
+                datos = self.ser.read(self.ser.in_waiting or 1)   # espera hasta el timeout del puerto
+            else:
+                pendientes = self.ser.in_waiting
+                datos = self.ser.read(pendientes) if pendientes else b""
+        except Exception as e:
+            self.error = 15
+            print(f"[ERROR] Puerto serial: {e}. Intentando reconectar...")
+            self._cerrar()
+            return 0
+        if not datos:
+            return ESPERA_SIN_DATOS if bloquear else 0
+
+        ahora = self.reloj.monotonic()
+        perdidas_antes = self.parser.perdidas      # salto de secuencia (incluye las corruptas descartadas)
+        if np is None:
+            bloque = a_bloque(self.parser.alimentar(datos))
+        else:
+            bloque = self.parser.alimentar_bloque(datos)
+        if len(bloque):
+            if len(self._cola) == self._cola.maxlen:
+                try:
+                    self.descartadas += len(self._cola[0][1])
+                except IndexError:           # el control la vació mientras tanto
+                    pass
+            self._cola.append((ahora, bloque))
+        if self.parser.perdidas != perdidas_antes:
+            print(f"[WARN] Serial: {self.parser.perdidas - perdidas_antes} trama(s) perdidas "
+                  f"(total perdidas={self.parser.perdidas}, corruptas={self.parser.corruptas})")
+        return 0
+
+    def _conectar(self):
+        ahora = self.reloj.monotonic()
+        if ahora < self._proximo_intento:
+            return self._proximo_intento - ahora
+        try:
+            self.ser = self.abrir()
+        except Exception as e:
+            self.error = 14
+            espera = ESPERA_RECONEXION[min(self._intento, len(ESPERA_RECONEXION) - 1)]
+            self._intento += 1
+            self._proximo_intento = ahora + espera
+            print(f"[ERROR] No se pudo abrir el puerto serial: {e}. Reintento en {espera} s")
+            return espera
+        if self._abierto_antes:
+            self.reconexiones += 1
+        self._abierto_antes = True
+        self._intento = 0
+        self.error = None
+        self.parser.reiniciar()
+        return 0
+
+    def _cerrar(self):
+        if self.ser is not None:
+            try:
+                self.ser.close()
+            except Exception:
+                pass
+        self.ser = None
+        self.parser.reiniciar()
@@ -0,0 +1,102 @@
+# ===============================================================
+# 🐟 LECTOR DE TEMPERATURA — DS18B20 en un hilo propio para v25.py
+# ===============================================================
+# Una conversión 1-Wire a 12 bits tarda ~750 ms. Antes se hacía dentro
+# del bucle de control cada TEMP_READ_INTERVAL y frenaba el ciclo de
+# 50 ms (y las ventanas de control_por_tiempo). Ahora un hilo lee el
+# sensor con su propio período y publica (valor, instante) de la última
+# lectura válida; el bucle solo consulta ultima(), que no bloquea.
+#
+# Si el sensor falla, el valor publicado no se reemplaza: envejece, y
+# v25 marca el error 17 cuando la edad supera el máximo permitido.
+#
+# Modo síncrono (reloj virtual del simulador): sin hilo, ultima() hace
+# la lectura cuando toca.
+
+import threading
+
+class LectorTemperatura:
+    """Muestreo periódico del DS18B20 con la última lectura y su edad."""
+
+    def __init__(self, sensor, reloj, periodo, sincronico=False):
+        self.sensor = sensor            # objeto con get_temperature()
+        self.reloj = reloj
+        self.periodo = periodo
+        self.sincronico = sincronico
+        self.lecturas = 0
+        self.fallas = 0
+        self.fallas_seguidas = 0
+        self.ultimo_error = None
+        self._ultima = (None, None)     # (°C, monotonic de la lectura); una sola asignación
+        self._inicio = None
+        self._proxima = 0.0
+        self._parar = threading.Event()
+        self._hilo = None
+
+    # ------------------------------
+    # CICLO DE VIDA
+    # ------------------------------
+    def iniciar(self):
+        """Primera lectura en el momento (el arranque sí puede esperar) y hilo de muestreo."""
+        self._inicio = self.reloj.monotonic()
+        self._leer()
+        self._proxima = self._inicio + self.periodo
+        if self.sincronico:
+            return
+        self._hilo = threading.Thread(target=self._bucle, name="lector-temperatura", daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._parar.set()
+        if self._hilo:
+            self._hilo.join(timeout=2.0)
+
+    def estadisticas(self):
+        valor, edad = self.ultima()
+        return {
+            "temperatura": valor,
+            "edad_s": edad,
+            "lecturas": self.lecturas,
+            "fallas": self.fallas,
+            "ultimo_error": self.ultimo_error,
+        }
+
+    # ------------------------------
+    # LADO DEL CONTROL
+    # ------------------------------
+    def ultima(self):
+        """(°C, edad en s) de la última lectura válida; (None, edad desde el arranque) si no hubo."""
+        ahora = self.reloj.monotonic()
+        if self.sincronico and ahora >= self._proxima:
+            self._leer()
+            self._proxima = ahora + self.periodo
+        valor, instante = self._ultima
+        referencia = instante if instante is not None else self._inicio
+        return valor, (ahora - referencia if referencia is not None else None)
+
+    # ------------------------------
+    # LADO DEL HILO
+    # ------------------------------
+    def _bucle(self):
+        while not self._parar.is_set():
+            espera = self._proxima - self.reloj.monotonic()
+            if espera > 0 and self._parar.wait(espera):
+                break
+            self._proxima += self.periodo
+            self._leer()
+            if self.reloj.monotonic() > self._proxima:    # lectura más larga que el período
+                self._proxima = self.reloj.monotonic()
+
+    def _leer(self):
+        try:
+            valor = float(self.sensor.get_temperature())
+        except Exception as e:
+            self.fallas += 1
+            self.fallas_seguidas += 1
+            self.ultimo_error = str(e)
+            if self.fallas_seguidas == 1:          # avisa una vez por racha de fallas
+                print(f"[ERROR] No se pudo leer DS18B20: {e}")
+            return
+        self._ultima = (valor, self.reloj.monotonic())
+        self.lecturas += 1
+        self.fallas_seguidas = 0
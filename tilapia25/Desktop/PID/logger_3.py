@@ -1,29 +1,58 @@
 # ===============================================================
 # 🐟 LOGGER v3 — Ultra estable con SQLite WAL + detección inicio/fin de errores
 # ===============================================================
+# Lo que va a la BD pasa primero por un spool en disco (spool.py): el
+# bucle de registro agrega los datos (lecturas, inicio/fin de errores) y
+# un hilo drenador arma las sentencias y las lleva a SQLite, guardando
+# hasta dónde leyó en la misma transacción.
 
 import socket
 import time
 import csv
 import os
+import sys
+import signal
 import sqlite3
+import json
+import threading
+from collections import deque
 from datetime import datetime
 
+from esquema_bd import inicializar_esquema, epoch_local, sentencias_agregados
+import telemetria
+from spool import Spool
+
 # ==============================
 # CONFIGURACIÓN
 # ==============================
 UDP_IP = "127.0.0.1"
 UDP_PORT = 5006
 BUFFER_SIZE = 1024
+UDP_TIMEOUT = 2.0
 INTERVALO_REGISTRO = 5.0
 DIRECTORIO = "registros_csv"
 os.makedirs(DIRECTORIO, exist_ok=True)
 
 ARCHIVO_FIJO = os.path.join(DIRECTORIO, "datos_actual.csv")
-MAX_LINEAS_FIJO = 600
+MAX_FILAS_FIJO = 600                # filas de datos (sin encabezado) que conserva el CSV fijo
 
 DB_FILE = "monitoreo.db"
 
+# --- Escritura por lotes en SQLite ---
+BD_LOTE_MAX_FILAS = 12              # filas en cola que fuerzan un commit
+BD_LOTE_MAX_EDAD = 30.0             # segundos máximos que una fila espera en cola
+BD_COLA_MAXIMA = 5000               # límite de filas retenidas si la BD está bloqueada
+BD_INTERVALO_ESTADISTICAS = 300.0   # cada cuánto se informan filas/s y latencia de commit
+
+# --- Spool en disco (ver spool.py) ---
+DIRECTORIO_SPOOL = "spool"
+DRENADOR_LOTE = 200                 # registros del spool leídos por vez (al ponerse al día)
+DRENADOR_ESPERA = 1.0               # s entre reintentos si la BD no acepta el lote
+ARCHIVO_DESCARTADOS = "descartados.jsonl"   # en DIRECTORIO_SPOOL: registros que la BD rechazó
+
+# Errores de SQLite que se resuelven solos reintentando; cualquier otro es del dato
+ERRORES_TRANSITORIOS = ("locked", "busy", "disk i/o", "disk is full", "unable to open")
+
 # ==============================
 # DICCIONARIO DE ERRORES
 # ==============================
@@ -53,39 +82,95 @@ ERROR_DESCRIPCIONES = {
 # ==============================
 # FUNCIONES AUXILIARES
 # ==============================
-def crear_nombre_archivo():
+def _sufijo(estanque):
+    """El estanque 1 conserva los nombres de siempre; los demás llevan _e{n}."""
+    return "" if estanque == telemetria.ESTANQUE_POR_DEFECTO else f"_e{estanque}"
+
+def crear_nombre_archivo(estanque=telemetria.ESTANQUE_POR_DEFECTO):
     fecha = datetime.now().strftime("%Y-%m-%d")
-    return os.path.join(DIRECTORIO, f"datos_{fecha}.csv")
+    return os.path.join(DIRECTORIO, f"datos{_sufijo(estanque)}_{fecha}.csv")
+
+def nombre_archivo_fijo(estanque=telemetria.ESTANQUE_POR_DEFECTO):
+    if estanque == telemetria.ESTANQUE_POR_DEFECTO:
+        return ARCHIVO_FIJO
+    return os.path.join(DIRECTORIO, f"datos_actual{_sufijo(estanque)}.csv")
+
+ENCABEZADOS = [
+    "fecha", "hora",
+    "a0", "pH", "a1", "OD",
+    "PID_pH_DOWN", "PID_pH_UP", "PID_O2",
+    "P_DOWN", "I_DOWN", "D_DOWN",
+    "P_UP", "I_UP", "D_UP",
+    "P_O2", "I_O2", "D_O2",
+    "T", "t_on_down", "t_on_up", "t_on_o2",
+    "codigo_error"
+]
 
 def inicializar_archivo(nombre_archivo):
-    encabezados = [
-        "fecha", "hora",
-        "a0", "pH", "a1", "OD",
-        "PID_pH_DOWN", "PID_pH_UP", "PID_O2",
-        "P_DOWN", "I_DOWN", "D_DOWN",
-        "P_UP", "I_UP", "D_UP",
-        "P_O2", "I_O2", "D_O2",
-        "T", "t_on_down", "t_on_up", "t_on_o2",
-        "codigo_error"
-    ]
-
     if not os.path.exists(nombre_archivo):
         with open(nombre_archivo, "w", newline="") as f:
-            csv.writer(f).writerow(encabezados)
+            csv.writer(f).writerow(ENCABEZADOS)
 
-def contar_lineas(nombre_archivo):
-    try:
-        with open(nombre_archivo, "r") as f:
-            return sum(1 for _ in f)
-    except FileNotFoundError:
-        return 0
+# ==============================
+# CSV FIJO ROTATIVO (últimas N filas)
+# ==============================
+class ArchivoRotativo:
+    """
+    Ventana con las últimas N filas: un deque en memoria reflejado en disco.
+    Agregar una fila es O(1) en memoria; el archivo se reescribe completo en
+    un temporal y se renombra encima del definitivo (os.replace es atómico),
+    así quien lo lea ve siempre un CSV entero con las N filas más nuevas.
+    """
+
+    def __init__(self, nombre_archivo, max_filas):
+        self.nombre_archivo = nombre_archivo
+        self.filas = deque(maxlen=max_filas)
+        self._cargar()
+
+    def _cargar(self):
+        """Recupera las filas existentes para no perder la ventana al reiniciar."""
+        try:
+            with open(self.nombre_archivo, "r", newline="") as f:
+                lector = csv.reader(f)
+                next(lector, None)                  # encabezado
+                for fila in lector:
+                    if fila:
+                        self.filas.append(fila)     # el deque retiene solo las últimas N
+        except FileNotFoundError:
+            pass
+        self._volcar()
+
+    def agregar(self, fila):
+        self.filas.append(fila)
+        self._volcar()
+
+    def _volcar(self):
+        temporal = self.nombre_archivo + ".tmp"
+        with open(temporal, "w", newline="") as f:
+            escritor = csv.writer(f)
+            escritor.writerow(ENCABEZADOS)
+            escritor.writerows(self.filas)
+        os.replace(temporal, self.nombre_archivo)
 
 def crear_socket_udp():
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    sock.settimeout(2.0)
+    sock.settimeout(UDP_TIMEOUT)
     sock.bind((UDP_IP, UDP_PORT))
     return sock
 
+def leer_pendientes(sock):
+    """Datagramas ya encolados en el socket, sin esperar más."""
+    datagramas = []
+    sock.setblocking(False)
+    try:
+        while True:
+            datagramas.append(sock.recvfrom(BUFFER_SIZE)[0])
+    except BlockingIOError:
+        pass
+    finally:
+        sock.settimeout(UDP_TIMEOUT)
+    return datagramas
+
 # ==============================
 # BASE DE DATOS
 # ==============================
@@ -94,125 +179,478 @@ def inicializar_bd():
     cur = conn.cursor()
 
     # Modo WAL para escritura concurrente
-    cur.execute("PRAGMA journal_mode=WAL;")
-
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS lecturas (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        fecha TEXT,
-        hora TEXT,
-        ph REAL,
-        o2 REAL,
-        temp REAL,
-        pid_ph_down REAL,
-        pid_ph_up REAL,
-        pid_o2 REAL,
-        codigo_error TEXT
-    )
-    """)
-
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS errores_log (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        codigo TEXT NOT NULL,
-        descripcion TEXT NOT NULL,
-        hora_inicio TEXT,
-        hora_fin TEXT,
-        resuelto INTEGER DEFAULT 0,
-        notificado_inicio INTEGER DEFAULT 0,
-        notificado_fin INTEGER DEFAULT 0
-    )
-    """)
-
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS notificaciones (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        tipo TEXT NOT NULL,
-        mensaje TEXT NOT NULL,
-        hora TEXT NOT NULL,
-        leida INTEGER DEFAULT 0
-    )
-    """)
-
-    conn.commit()
+    cur.execute("PRAGMA journal_mode=WAL;").fetchone()   # sin leerlo queda una sentencia abierta y falla el commit
+
+    # Tablas, columna ts e índices (compartido con app.py)
+    inicializar_esquema(conn)
     conn.close()
 
-def insertar_lectura(fila):
-    try:
-        conn = sqlite3.connect(DB_FILE, timeout=0.5)
-        cur = conn.cursor()
-
-        fecha, hora = fila[0], fila[1]
-        ph = float(fila[3])
-        o2 = float(fila[5])
-        pid_ph_down = float(fila[6])
-        pid_ph_up = float(fila[7])
-        pid_o2 = float(fila[8])
-        temp = float(fila[18])
-        codigo_error = str(fila[-1])
-
-        cur.execute("""
-            INSERT INTO lecturas (fecha, hora, ph, o2, temp, pid_ph_down, pid_ph_up, pid_o2, codigo_error)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (fecha, hora, ph, o2, temp, pid_ph_down, pid_ph_up, pid_o2, codigo_error))
-
-        conn.commit()
-        conn.close()
+# ==============================
+# ESCRITOR PERSISTENTE POR LOTES
+# ==============================
+class EscritorBD:
+    """
+    Mantiene una única conexión SQLite durante toda la vida del proceso y
+    acumula las escrituras (lecturas y errores_log) en una cola. La cola se
+    escribe en UNA sola transacción cuando alcanza max_filas grupos o cuando
+    el más antiguo supera max_edad segundos (debe_vaciar).
+
+    La cola es de grupos de sentencias que van juntas (un registro del
+    spool). Si la BD está ocupada se reintenta todo; si un grupo falla por
+    otra causa (columna inexistente, IntegrityError) se descarta ese grupo
+    avisando y el resto se escribe igual.
+    """
+
+    def __init__(self, db_file, max_filas=BD_LOTE_MAX_FILAS, max_edad=BD_LOTE_MAX_EDAD):
+        self.db_file = db_file
+        self.max_filas = max_filas
+        self.max_edad = max_edad
+        self.conn = None
+        self.pendientes = []            # lista de (sentencias, origen) en orden de llegada
+        self.t_primera = None           # instante en que entró la fila más antigua
+        self.descartados = []           # (origen, error) que la BD rechazó en el último vaciado
+
+        # --- Estadísticas ---
+        self.filas_escritas = 0
+        self.commits = 0
+        self.latencia_total = 0.0       # segundos acumulados dentro de commits
+        self.latencia_max = 0.0
+        self.grupos_descartados = 0
+        self.t_estadisticas = time.time()
+        self.filas_estadisticas = 0
+
+    def _conectar(self):
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.db_file, timeout=0.5)
+            # En WAL, NORMAL solo sincroniza en los checkpoints → menos fsync en la SD
+            self.conn.execute("PRAGMA synchronous=NORMAL;")
+        return self.conn
+
+    def _cerrar_conexion(self):
+        if self.conn is not None:
+            try: self.conn.close()
+            except: pass
+            self.conn = None
+
+    def encolar(self, sql, params=()):
+        """Agrega una sentencia a la cola sin tocar la BD."""
+        self.encolar_grupo([(sql, params)])
+
+    def encolar_grupo(self, sentencias, origen=None):
+        """Sentencias que se escriben o se descartan juntas; origen identifica el grupo al descartarlo."""
+        if not self.pendientes:
+            self.t_primera = time.time()
+        self.pendientes.append((sentencias, origen))
+
+        # Si la BD lleva mucho tiempo bloqueada, descartar lo más antiguo
+        exceso = len(self.pendientes) - BD_COLA_MAXIMA
+        if exceso > 0:
+            del self.pendientes[:exceso]
+            print(f"[WARN BD] Cola llena, se descartan {exceso} filas antiguas")
+
+    def debe_vaciar(self):
+        """True si la cola llegó al tamaño o a la edad configurados."""
+        return bool(self.pendientes) and (len(self.pendientes) >= self.max_filas or
+                                          time.time() - self.t_primera >= self.max_edad)
+
+    def vaciar(self):
+        """Escribe toda la cola en una única transacción. Devuelve True si quedó vacía."""
+        if not self.pendientes:
+            return True
+
+        t0 = time.perf_counter()
+        self.descartados = []
+        try:
+            conn = self._conectar()
+            try:
+                with conn:              # BEGIN ... COMMIT (o ROLLBACK si algo falla)
+                    for sentencias, _ in self.pendientes:
+                        for sql, params in sentencias:
+                            conn.execute(sql, params)
+            except Exception as e:
+                if error_transitorio(e):
+                    raise
+                # Algún grupo no entra: se repite grupo por grupo para aislarlo
+                self._vaciar_por_grupos(conn)
+        except Exception as e:
+            # La cola se conserva y se reintenta en la próxima llamada
+            print("[WARN BD] BD no disponible, el lote se reintentará:", e)
+            self._cerrar_conexion()
+            return False
+
+        latencia = time.perf_counter() - t0
+        filas = sum(len(sentencias) for sentencias, _ in self.pendientes)
+        self.commits += 1
+        self.latencia_total += latencia
+        self.latencia_max = max(self.latencia_max, latencia)
+        self.filas_escritas += filas
+        self.filas_estadisticas += filas
+        self.pendientes = []
+        self.t_primera = None
+        return True
+
+    def _vaciar_por_grupos(self, conn):
+        """
+        Toda la cola en una transacción con un SAVEPOINT por grupo: el grupo
+        que falla se deshace y se anota en descartados. Un error transitorio
+        se propaga y deshace todo.
+        """
+        descartados = []
+        try:
+            conn.execute("BEGIN")
+            for sentencias, origen in self.pendientes:
+                conn.execute("SAVEPOINT grupo")
+                try:
+                    for sql, params in sentencias:
+                        conn.execute(sql, params)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO grupo")
+                    conn.execute("RELEASE grupo")
+                    if error_transitorio(e):
+                        raise
+                    descartados.append((origen if origen is not None else sentencias, str(e)))
+                    continue
+                conn.execute("RELEASE grupo")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        for origen, error in descartados:
+            print(f"[WARN BD] Registro rechazado por la BD, se descarta ({error}):", origen)
+        self.grupos_descartados += len(descartados)
+        self.descartados = descartados
+
+    def estadisticas(self):
+        """Filas/s desde el último informe y latencia de commit (ms)."""
+        transcurrido = max(time.time() - self.t_estadisticas, 1e-6)
+        return {
+            "filas_s": self.filas_estadisticas / transcurrido,
+            "filas_escritas": self.filas_escritas,
+            "commits": self.commits,
+            "commit_ms_medio": (self.latencia_total / self.commits * 1000.0) if self.commits else 0.0,
+            "commit_ms_max": self.latencia_max * 1000.0,
+            "pendientes": len(self.pendientes),
+            "descartados": self.grupos_descartados,
+        }
+
+    def imprimir_estadisticas_si_corresponde(self):
+        if time.time() - self.t_estadisticas < BD_INTERVALO_ESTADISTICAS:
+            return
+        e = self.estadisticas()
+        print(f"[BD] {e['filas_s']:.2f} filas/s, {e['commits']} commits, "
+              f"commit medio {e['commit_ms_medio']:.1f} ms (máx {e['commit_ms_max']:.1f} ms), "
+              f"{e['pendientes']} en cola, {e['descartados']} descartados")
+        self.t_estadisticas = time.time()
+        self.filas_estadisticas = 0
+
+    def cerrar(self):
+        """Vaciado síncrono de la cola y cierre de la conexión (apagado)."""
+        self.vaciar()
+        self._cerrar_conexion()
+
+def error_transitorio(e):
+    """True si el error de SQLite se resuelve reintentando (BD ocupada, disco)."""
+    return isinstance(e, sqlite3.OperationalError) and \
+        any(t in str(e).lower() for t in ERRORES_TRANSITORIOS)
 
+# ==============================
+# SPOOL → BD
+# ==============================
+class EscritorSpool:
+    """
+    Junta los eventos de un ciclo de registro (ver sentencias_evento) y
+    confirmar() los guarda en el spool como un registro JSON. Se guardan
+    datos, no SQL: el drenador arma las sentencias con el esquema vigente,
+    así lo que quedó en el spool sobrevive a una migración.
+    """
+
+    def __init__(self, spool):
+        self.spool = spool
+        self.eventos = []
+
+    def agregar(self, evento):
+        self.eventos.append(evento)
+
+    def confirmar(self):
+        if self.eventos:
+            self.spool.agregar(json.dumps(self.eventos, separators=(",", ":")).encode())
+            self.eventos = []
+
+    def descartar(self):
+        self.eventos = []
+
+SQL_POSICION_SPOOL = """
+    INSERT INTO spool_posicion (id, segmento, posicion) VALUES (1, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET segmento = excluded.segmento, posicion = excluded.posicion
+"""
+
+class DrenadorSpool:
+    """
+    Hilo que pasa los registros del spool a SQLite con un EscritorBD. Los
+    registros se acumulan en el escritor hasta que debe_vaciar() (o al
+    detener) y el lote se escribe en UNA transacción junto con la posición
+    siguiente del spool (tabla spool_posicion): si la BD está bloqueada no
+    avanza, y al reiniciar continúa justo después de lo último confirmado,
+    sin perder ni repetir registros.
+    """
+
+    def __init__(self, spool, escritor, lote=DRENADOR_LOTE):
+        self.spool = spool
+        self.escritor = escritor
+        self.lote = lote
+        self.posicion = None            # (segmento, posición) confirmada en la BD
+        self._siguiente = None          # posición después de lo ya pasado al escritor
+        self._n_pendientes = 0          # registros del spool en el lote en curso
+        self._lote_cerrado = False      # lote con su posición encolada, esperando commit
+        self._detener = threading.Event()
+        self.hilo = threading.Thread(target=self._bucle, daemon=True)
+
+        # --- Estadísticas ---
+        self.registros = 0
+        self.lotes = 0
+
+    def iniciar(self):
+        self.hilo.start()
+
+    def detener(self):
+        """Pasa lo que ya esté sincronizado (si la BD lo acepta) y termina el hilo."""
+        self._detener.set()
+        self.hilo.join()
+
+    def _leer_posicion(self):
+        fila = self.escritor._conectar().execute(
+            "SELECT segmento, posicion FROM spool_posicion WHERE id = 1").fetchone()
+        inicio = self.spool.inicio()
+        if fila is None:
+            return inicio
+        posicion = tuple(fila)
+        if posicion[0] > self.spool.segmento:
+            # El spool es más nuevo que la BD (directorio borrado o reemplazado)
+            print(f"[WARN SPOOL] Posición {posicion} posterior al spool, se lee desde {inicio}")
+            return inicio
+        return max(posicion, inicio)
+
+    def drenar(self, forzar=False):
+        """
+        Lee lo nuevo del spool y, si el lote debe escribirse (o forzar), lo
+        confirma: None si no se escribió nada, True si sí, False si la BD no
+        lo aceptó (el mismo lote se reintenta en la próxima llamada).
+        """
+        if not self._lote_cerrado:
+            self._leer()
+            if not self._n_pendientes or not (forzar or self.escritor.debe_vaciar()):
+                return None
+            # La posición va al final: el commit cubre exactamente lo leído
+            self.escritor.encolar(SQL_POSICION_SPOOL, self._siguiente)
+            self._lote_cerrado = True
+
+        if not self.escritor.vaciar():
+            return False
+        self._lote_cerrado = False
+        self.posicion = self._siguiente
+        self.registros += self._n_pendientes
+        self._n_pendientes = 0
+        self.lotes += 1
+        self.guardar_descartados(self.escritor.descartados)
+        self.spool.purgar(self.posicion)
+        return True
+
+    def _leer(self):
+        """Pasa al escritor los registros sincronizados desde _siguiente."""
+        if self._siguiente is None:
+            self._siguiente = self.posicion
+        registros, self._siguiente = self.spool.leer(self._siguiente, self.lote)
+        for datos in registros:
+            texto = datos.decode("utf-8", "replace")
+            try:
+                sentencias = [sentencia for evento in json.loads(texto)
+                              for sentencia in sentencias_evento(evento)]
+            except (ValueError, KeyError, TypeError) as e:
+                print("[WARN SPOOL] Registro ilegible, se omite:", e)
+                self.guardar_descartados([(texto, f"ilegible: {e}")])
+                continue
+            self.escritor.encolar_grupo(sentencias, texto)
+        self._n_pendientes += len(registros)
+
+    def guardar_descartados(self, descartados):
+        """Los registros ilegibles o que la BD rechazó quedan en ARCHIVO_DESCARTADOS para revisarlos a mano."""
+        if not descartados:
+            return
+        ruta = os.path.join(self.spool.directorio, ARCHIVO_DESCARTADOS)
+        ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        try:
+            with open(ruta, "a") as f:
+                for registro, error in descartados:
+                    f.write(json.dumps({"ts": ts, "error": error, "registro": registro}) + "\n")
+        except OSError as e:
+            print("[WARN SPOOL] No se pudieron guardar los registros descartados:", e)
+
+    def _bucle(self):
+        while self.posicion is None:
+            try:
+                self.posicion = self._leer_posicion()
+            except sqlite3.Error as e:
+                print("[WARN SPOOL] No se pudo leer la posición del spool:", e)
+                self.escritor._cerrar_conexion()
+                if self._detener.wait(DRENADOR_ESPERA):
+                    return
+
+        while True:
+            detener = self._detener.is_set()
+            resultado = self.drenar(forzar=detener)
+            self.imprimir_estadisticas_si_corresponde()
+            if resultado is None:
+                if detener:
+                    break
+                self.spool.esperar(self._siguiente, 0.5)
+            elif resultado is False:
+                if self._detener.wait(DRENADOR_ESPERA):
+                    break               # lo que falta queda en el spool para el próximo arranque
+        self.escritor._cerrar_conexion()
+
+    def imprimir_estadisticas_si_corresponde(self):
+        """Solo desde el hilo drenador: es el único que toca los contadores del EscritorBD."""
+        if time.time() - self.escritor.t_estadisticas < BD_INTERVALO_ESTADISTICAS:
+            return
+        if self.posicion is not None:
+            print(f"[SPOOL] {self.registros} registros drenados, "
+                  f"{self.spool.pendientes(self.posicion)} bytes por drenar")
+        self.escritor.imprimir_estadisticas_si_corresponde()
+
+def insertar_lectura(escritor, fecha, hora, muestra):
+    try:
+        muestra = telemetria.redondear(muestra)      # sin el ruido de float32
+        escritor.agregar({
+            "tipo": "lectura",
+            "fecha": fecha,
+            "hora": hora,
+            "estanque": muestra["estanque"],
+            "ph": muestra["ph"],
+            "o2": muestra["o2"],
+            "temp": muestra["temp"],
+            "pid_ph_down": muestra["control_ph_down"],
+            "pid_ph_up": muestra["control_ph_up"],
+            "pid_o2": muestra["control_o2"],
+            "codigo_error": telemetria.errores_a_texto(muestra["errores"]),
+        })
     except Exception as e:
         print("[WARN BD] Error al insertar lectura:", e)
 
-def registrar_cambios_de_error(nuevos, resueltos, ahora):
+def registrar_cambios_de_error(escritor, nuevos, resueltos, ahora, estanque=telemetria.ESTANQUE_POR_DEFECTO):
     ts = ahora.strftime("%Y-%m-%d %H:%M:%S")
+    for c in nuevos:
+        escritor.agregar({"tipo": "error_inicio", "codigo": c, "ts": ts, "estanque": estanque})
+    for c in resueltos:
+        escritor.agregar({"tipo": "error_fin", "codigo": c, "ts": ts, "estanque": estanque})
+
+def sentencias_evento(evento):
+    """Sentencias (sql, params) de un evento del spool, con el esquema actual."""
+    tipo = evento["tipo"]
+    estanque = evento.get("estanque", telemetria.ESTANQUE_POR_DEFECTO)
+
+    if tipo == "lectura":
+        fecha, hora = evento["fecha"], evento["hora"]
+        ph, o2, temp = evento["ph"], evento["o2"], evento["temp"]
+        sentencias = [("""
+            INSERT INTO lecturas (fecha, hora, ts, ph, o2, temp, pid_ph_down, pid_ph_up, pid_o2, codigo_error, estanque)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (fecha, hora, epoch_local(fecha, hora), ph, o2, temp, evento["pid_ph_down"],
+              evento["pid_ph_up"], evento["pid_o2"], evento["codigo_error"], estanque))]
+        # Agregados hora/día/mes en la misma transacción
+        return sentencias + sentencias_agregados(fecha, hora, ph, o2, temp, estanque)
+
+    if tipo == "error_inicio":
+        c = evento["codigo"]
+        desc = ERROR_DESCRIPCIONES.get(c, f"Error desconocido ({c})")
+        return [("""
+            INSERT INTO errores_log (codigo, descripcion, hora_inicio, estanque)
+            VALUES (?, ?, ?, ?)
+        """, (str(c), desc, evento["ts"], estanque))]
+
+    if tipo == "error_fin":
+        return [("""
+            UPDATE errores_log
+            SET hora_fin = ?
+            WHERE codigo = ? AND estanque = ? AND hora_fin IS NULL
+        """, (evento["ts"], str(evento["codigo"]), estanque))]
+
+    raise ValueError(f"tipo de evento desconocido: {tipo}")
 
-    try:
-        conn = sqlite3.connect(DB_FILE, timeout=0.5)
-        cur = conn.cursor()
-
-        # Nuevos errores
-        for c in nuevos:
-            desc = ERROR_DESCRIPCIONES.get(c, f"Error desconocido ({c})")
-            cur.execute("""
-                INSERT INTO errores_log (codigo, descripcion, hora_inicio)
-                VALUES (?, ?, ?)
-            """, (str(c), desc, ts))
-
-        # Errores resueltos
-        for c in resueltos:
-            cur.execute("""
-                UPDATE errores_log
-                SET hora_fin = ?
-                WHERE codigo = ? AND hora_fin IS NULL
-            """, (ts, str(c)))
-
-        conn.commit()
-        conn.close()
+# ==============================
+# ESTADO POR ESTANQUE
+# ==============================
+class RegistroEstanque:
+    """Última muestra, errores vigentes y archivos CSV de un estanque."""
 
-    except Exception as e:
-        print("[WARN BD] Error registrando cambios de error:", e)
+    def __init__(self, estanque):
+        self.estanque = estanque
+        self.muestra = None
+        self.ultimo_error = set()
+        self.nombre_actual = crear_nombre_archivo(estanque)
+        inicializar_archivo(self.nombre_actual)
+        self.archivo_fijo = ArchivoRotativo(nombre_archivo_fijo(estanque), MAX_FILAS_FIJO)
+
+    def rotar_si_corresponde(self):
+        """Rotación diaria del CSV."""
+        nombre_nuevo = crear_nombre_archivo(self.estanque)
+        if nombre_nuevo != self.nombre_actual:
+            self.nombre_actual = nombre_nuevo
+            inicializar_archivo(self.nombre_actual)
+
+    def registrar(self, escritor, ahora):
+        fecha = ahora.strftime("%Y-%m-%d")
+        hora = ahora.strftime("%H:%M:%S")
+
+        fila = [fecha, hora] + telemetria.fila_csv(self.muestra)
+
+        # CSV diario
+        with open(self.nombre_actual, "a", newline="") as f:
+            csv.writer(f).writerow(fila)
+
+        # CSV fijo rotativo
+        self.archivo_fijo.agregar(fila)
+
+        # =========================
+        # MANEJO DE ERRORES
+        # =========================
+        actual = set(self.muestra["errores"])
+
+        nuevos = actual - self.ultimo_error
+        resueltos = self.ultimo_error - actual
+
+        if nuevos or resueltos:
+            registrar_cambios_de_error(escritor, nuevos, resueltos, ahora, self.estanque)
+
+        self.ultimo_error = actual
+
+        insertar_lectura(escritor, fecha, hora, self.muestra)
 
 # ==============================
 # PROCESO PRINCIPAL
 # ==============================
 def registrar_datos():
     inicializar_bd()
+    spool = Spool(DIRECTORIO_SPOOL)
+    drenador = DrenadorSpool(spool, EscritorBD(DB_FILE))
+    drenador.iniciar()
 
-    nombre_actual = crear_nombre_archivo()
-    inicializar_archivo(nombre_actual)
-    inicializar_archivo(ARCHIVO_FIJO)
-
-    ultimo_error = set()
+    try:
+        _bucle_registro(EscritorSpool(spool))
+    finally:
+        # Apagado: lo agregado queda sincronizado en el spool y el
+        # drenador pasa a la BD lo que pueda antes de salir
+        spool.cerrar()
+        drenador.detener()
+
+def _bucle_registro(escritor):
+    estanques = {telemetria.ESTANQUE_POR_DEFECTO: RegistroEstanque(telemetria.ESTANQUE_POR_DEFECTO)}
     ultimo_registro = 0
-    datos_ultima_muestra = None
     sock = None
 
     while True:
 
-        # Rotación diaria
-        nombre_nuevo = crear_nombre_archivo()
-        if nombre_nuevo != nombre_actual:
-            nombre_actual = nombre_nuevo
-            inicializar_archivo(nombre_actual)
+        for registro in estanques.values():
+            registro.rotar_si_corresponde()
 
         if sock is None:
             try:
@@ -223,10 +661,19 @@ def registrar_datos():
 
         try:
             data, _ = sock.recvfrom(BUFFER_SIZE)
-            partes = data.decode().strip().split(",")
-
-            if len(partes) == 21:
-                datos_ultima_muestra = partes
+            # Con varios estanques llegan N×20 datagramas/s: se vacía lo
+            # encolado para quedarse con la última muestra de cada uno
+            datagramas = [data] + leer_pendientes(sock)
+
+            for data in datagramas:
+                try:
+                    muestra = telemetria.decodificar(data)
+                except ValueError:
+                    continue            # datagrama mal formado o de otra versión
+                estanque = muestra["estanque"]
+                if estanque not in estanques:
+                    estanques[estanque] = RegistroEstanque(estanque)
+                estanques[estanque].muestra = muestra
 
         except socket.timeout:
             pass
@@ -237,51 +684,26 @@ def registrar_datos():
             sock = None
             continue
 
-        if time.time() - ultimo_registro >= INTERVALO_REGISTRO and datos_ultima_muestra:
+        if time.time() - ultimo_registro >= INTERVALO_REGISTRO:
 
             ahora = datetime.now()
-            fecha = ahora.strftime("%Y-%m-%d")
-            hora = ahora.strftime("%H:%M:%S")
-
-            fila = [fecha, hora] + datos_ultima_muestra
-
-            try:
-                # CSV diario
-                with open(nombre_actual, "a", newline="") as f:
-                    csv.writer(f).writerow(fila)
-
-                # CSV fijo rotativo
-                if contar_lineas(ARCHIVO_FIJO) >= MAX_LINEAS_FIJO:
-                    inicializar_archivo(ARCHIVO_FIJO)
-
-                with open(ARCHIVO_FIJO, "a", newline="") as f:
-                    csv.writer(f).writerow(fila)
-
-                # =========================
-                # MANEJO DE ERRORES
-                # =========================
-                codigo_error = fila[-1]
-                actual = set()
-
-                if codigo_error != "0":
-                    actual = {int(x) for x in codigo_error.split("|") if x.isdigit()}
-
-                nuevos = actual - ultimo_error
-                resueltos = ultimo_error - actual
-
-                if nuevos or resueltos:
-                    registrar_cambios_de_error(nuevos, resueltos, ahora)
-
-                ultimo_error = actual
-
-                insertar_lectura(fila)
-
-            except Exception as e:
-                print("[WARN] Registro fallido:", e)
+            for registro in estanques.values():
+                if not registro.muestra:
+                    continue
+                try:
+                    registro.registrar(escritor, ahora)
+                    escritor.confirmar()
+                except Exception as e:
+                    escritor.descartar()
+                    print(f"[WARN] Registro fallido (estanque {registro.estanque}):", e)
 
             ultimo_registro = time.time()
 
+        escritor.spool.sincronizar_si_corresponde()
+
         time.sleep(0.1)
 
 if __name__ == "__main__":
+    # SIGTERM (p. ej. al detener v25) → SystemExit, así se ejecuta el vaciado final
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     registrar_datos()
@@ -0,0 +1,129 @@
+# ===============================================================
+# 🐟 NOTIFICADOR — avisos de v25.py a Flask sin bloquear el control
+# ===============================================================
+# notificar_flask() antes hacía requests.post(timeout=0.5) dentro del
+# bucle: con Flask lento o caído el control se frenaba hasta 500 ms por
+# aviso. Ahora enviar() solo encola (cola acotada: si se llena se
+# descarta el aviso más viejo) y un hilo los manda por lotes a
+# /api/notificacion_sistema, con reintentos y espera creciente si Flask
+# no responde. Cada aviso lleva la hora en que ocurrió, no la de envío.
+
+import itertools
+import threading
+from collections import deque
+from datetime import datetime
+
+import requests
+
+MAX_PENDIENTES = 200               # avisos en espera como máximo
+TAMANO_LOTE = 20                   # avisos por POST
+TIMEOUT_HTTP = 2.0                 # s; solo espera el hilo, nunca el bucle de control
+ESPERA_REINTENTO = (0.5, 1, 2, 4, 8, 16, 30)   # segundos entre reintentos fallidos
+
+class NotificadorFlask:
+    """Cola acotada de avisos con un hilo que los envía por lotes."""
+
+    def __init__(self, url, reloj, max_pendientes=MAX_PENDIENTES, tamano_lote=TAMANO_LOTE):
+        self.url = url
+        self.reloj = reloj
+        self.max_pendientes = max_pendientes
+        self.tamano_lote = tamano_lote
+        self.enviadas = 0
+        self.descartadas = 0            # por cola llena
+        self.fallos = 0                 # POST fallidos (se reintentan)
+        self._cola = deque()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()   # solo operaciones de cola: nunca se tiene durante el POST
+        self._hay_datos = threading.Event()
+        self._parar = threading.Event()
+        self._hilo = None
+        self._sesion = requests.Session()   # reutiliza la conexión HTTP
+
+    # ------------------------------
+    # CICLO DE VIDA
+    # ------------------------------
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._bucle, name="notificador-flask", daemon=True)
+        self._hilo.start()
+
+    def detener(self, espera=1.0):
+        """Intenta vaciar lo pendiente durante `espera` segundos y termina el hilo."""
+        self._parar.set()
+        self._hay_datos.set()
+        if self._hilo:
+            self._hilo.join(timeout=espera)
+
+    def pendientes(self):
+        return len(self._cola)
+
+    def estadisticas(self):
+        return {
+            "pendientes": len(self._cola),
+            "enviadas": self.enviadas,
+            "descartadas": self.descartadas,
+            "fallos": self.fallos,
+        }
+
+    # ------------------------------
+    # LADO DEL CONTROL
+    # ------------------------------
+    def enviar(self, tipo, mensaje):
+        """Encola un aviso y vuelve enseguida."""
+        aviso = {
+            "id": next(self._ids),
+            "tipo": tipo,
+            "mensaje": mensaje,
+            "hora": datetime.fromtimestamp(self.reloj.time()).strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        with self._lock:
+            if len(self._cola) >= self.max_pendientes:
+                self._cola.popleft()
+                self.descartadas += 1
+            self._cola.append(aviso)
+        self._hay_datos.set()
+
+    # ------------------------------
+    # LADO DEL HILO
+    # ------------------------------
+    def _bucle(self):
+        intento = 0
+        while True:
+            self._hay_datos.wait()
+            with self._lock:
+                lote = list(itertools.islice(self._cola, self.tamano_lote))
+                if not lote:
+                    self._hay_datos.clear()
+            if not lote:
+                if self._parar.is_set():
+                    return
+                continue
+
+            if self._publicar(lote):
+                intento = 0
+                with self._lock:
+                    # Saca lo enviado (lo que se descartó por cola llena ya no está)
+                    while self._cola and self._cola[0]["id"] <= lote[-1]["id"]:
+                        self._cola.popleft()
+                self.enviadas += len(lote)
+                continue
+
+            if self._parar.is_set():
+                return                   # saliendo y Flask no responde: no se insiste
+            espera = ESPERA_REINTENTO[min(intento, len(ESPERA_REINTENTO) - 1)]
+            intento += 1
+            self._parar.wait(espera)
+
+    def _publicar(self, lote):
+        try:
+            r = self._sesion.post(
+                self.url,
+                json={"notificaciones": [{k: a[k] for k in ("tipo", "mensaje", "hora")} for a in lote]},
+                timeout=TIMEOUT_HTTP,
+            )
+            r.raise_for_status()
+            return True
+        except Exception as e:
+            self.fallos += 1
+            if self.fallos == 1 or self.fallos % 50 == 0:   # sin inundar la consola si Flask está caído
+                print(f"[WARN] No se pudo notificar a Flask ({len(self._cola)} pendientes):", e)
+            return False
@@ -0,0 +1,95 @@
+# ===============================================================
+# 🐟 PROCESAMIENTO EN BLOQUE de muestras del ADS1115
+# ===============================================================
+# Equivalente vectorizado de procesar_lectura + promedio_acumulador +
+# voltaje_acumulador + suavizado_exponencial de v25.py:
+#   - entra un bloque N×2 (A0, A1) de cuentas crudas
+#   - se forman grupos de n_muestras (el resto espera al próximo bloque)
+#   - promedio y conversión a voltios de todos los grupos a la vez
+#   - suavizado exponencial grupo a grupo (recurrencia: no se vectoriza
+#     para no cambiar el redondeo)
+# Los resultados son idénticos bit a bit a la ruta escalar: las sumas son
+# enteras (exactas) y cada operación en coma flotante es la misma y en el
+# mismo orden.
+#
+# NumPy es opcional: sin él se usan bucles de Python con el mismo resultado.
+
+try:
+    import numpy as np
+except ImportError:                 # sin numpy: misma API con listas
+    np = None
+
+def a_bloque(muestras):
+    """Lista de (a0, a1) → bloque N×2 (int16 con numpy, lista sin él)."""
+    if np is None:
+        return list(muestras)
+    if not muestras:
+        return np.empty((0, 2), dtype=np.int16)
+    return np.array(muestras, dtype=np.int16)
+
+def concatenar(bloques):
+    """Une varios bloques N×2 en uno."""
+    if np is None:
+        return [m for b in bloques for m in b]
+    if not bloques:
+        return np.empty((0, 2), dtype=np.int16)
+    return np.concatenate(bloques) if len(bloques) > 1 else bloques[0]
+
+class ProcesadorADC:
+    """Promedia, convierte a voltios y suaviza bloques de muestras A0/A1."""
+
+    def __init__(self, n_muestras, factores, alpha):
+        self.n_muestras = n_muestras
+        self.factores = tuple(factores)     # V/cuenta de A0 y A1
+        self.alpha = alpha
+        self.suavizado = None               # (V_A0, V_A1) de la última salida
+        self._resto = a_bloque([])          # muestras que aún no completan un grupo
+
+    def reiniciar(self):
+        """Descarta el grupo incompleto (p. ej. al reconectar el puerto)."""
+        self._resto = a_bloque([])
+
+    def procesar(self, bloque):
+        """
+        Devuelve los voltajes suavizados [(V_A0, V_A1), ...] de cada grupo
+        completado con este bloque (lista vacía si ninguno se completó).
+        """
+        return self.suavizar(self.voltajes(bloque))
+
+    def voltajes(self, bloque):
+        """Voltaje promedio de cada grupo completo, sin suavizar."""
+        n = self.n_muestras
+        if np is None:
+            datos = self._resto + list(bloque)
+            grupos = len(datos) // n
+            self._resto = datos[grupos * n:]
+            salida = []
+            for g in range(grupos):
+                suma0 = suma1 = 0
+                for a0, a1 in datos[g * n:(g + 1) * n]:
+                    suma0 += a0
+                    suma1 += a1
+                salida.append((suma0 / n * self.factores[0], suma1 / n * self.factores[1]))
+            return salida
+
+        datos = np.concatenate((self._resto, bloque)) if len(self._resto) else np.asarray(bloque)
+        grupos = len(datos) // n
+        self._resto = datos[grupos * n:]
+        if not grupos:
+            return []
+        sumas = datos[:grupos * n].reshape(grupos, n, 2).sum(axis=1, dtype=np.int64)
+        return (sumas / n * np.array(self.factores)).tolist()
+
+    def suavizar(self, voltajes):
+        """Suavizado exponencial en orden, igual que suavizado_exponencial()."""
+        alpha = self.alpha
+        salida = []
+        anterior = self.suavizado
+        for v0, v1 in voltajes:
+            if anterior is not None:
+                v0 = alpha * v0 + (1 - alpha) * anterior[0]
+                v1 = alpha * v1 + (1 - alpha) * anterior[1]
+            anterior = (v0, v1)
+            salida.append(anterior)
+        self.suavizado = anterior
+        return salida
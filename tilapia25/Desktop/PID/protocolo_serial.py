@@ -0,0 +1,197 @@
+# ===============================================================
+# 🐟 PROTOCOLO SERIAL Arduino → Raspberry (ADS1115 A0/A1)
+# ===============================================================
+# Dos formatos, según cómo se compile sketch_oct09a.ino:
+#
+#   ASCII (original):  b"RAW_A0,RAW_A1\n" cada 100 ms
+#   Binario:           tramas de 9 bytes a ~100 Hz
+#       0-1  sincronismo  0xA5 0x5A
+#       2-3  secuencia    uint16 little-endian (da la vuelta en 65535)
+#       4-5  A0           int16 little-endian
+#       6-7  A1           int16 little-endian
+#       8    checksum     bytes 2..8 suman 0 (mod 256)
+#
+# ParserSerial recibe bloques crudos (ser.read(ser.in_waiting)), guarda
+# lo incompleto para el próximo bloque y devuelve TODAS las muestras.
+# En modo binario detecta tramas perdidas (salto de secuencia) y
+# corruptas (checksum); en "auto" decide el formato con los primeros datos.
+#
+# alimentar_bloque() devuelve lo mismo como matriz N×2 int16 de numpy
+# (ver procesamiento.py); en binario decodifica todas las tramas de una
+# vez y solo recurre al recorrido trama a trama si hay basura o corrupción.
+
+import struct
+
+try:
+    import numpy as np
+except ImportError:                 # sin numpy solo se usa alimentar()
+    np = None
+
+SYNC = b"\xa5\x5a"
+_TRAMA = struct.Struct("<2sHhhB")
+LARGO_TRAMA = _TRAMA.size           # 9 bytes
+_TRAMA_NP = None if np is None else np.dtype(
+    [("sync", "u1", 2), ("secuencia", "<u2"), ("a0", "<i2"), ("a1", "<i2"), ("chk", "u1")])
+MAX_BUFFER = 4096                   # bytes sin procesar que se conservan como máximo
+MIN_TRAMAS_NUMPY = 32               # con menos tramas el recorrido con struct es más rápido
+
+def checksum(cuerpo):
+    """Byte que hace que cuerpo + checksum sume 0 (mod 256)."""
+    return (-sum(cuerpo)) & 0xFF
+
+def codificar_trama(secuencia, a0, a1):
+    """Trama binaria (la misma que arma el sketch). Usado por el simulador."""
+    cuerpo = struct.pack("<Hhh", secuencia & 0xFFFF, a0, a1)
+    return SYNC + cuerpo + bytes((checksum(cuerpo),))
+
+class ParserSerial:
+    """Convierte el flujo serial en muestras (a0, a1) sin perder ninguna."""
+
+    def __init__(self, modo="auto"):
+        self.modo = modo                # "ascii" | "binario" | "auto"
+        self._buffer = bytearray()
+        self._secuencia = None          # próxima secuencia esperada
+        self.muestras = 0
+        self.perdidas = 0               # tramas faltantes según la secuencia
+        self.corruptas = 0              # checksum inválido
+        self.invalidas = 0              # líneas ASCII mal formadas
+
+    def reiniciar(self):
+        """Tras reabrir o vaciar el puerto: descarta lo pendiente."""
+        self._buffer.clear()
+        self._secuencia = None
+
+    def estadisticas(self):
+        return {
+            "modo": self.modo,
+            "muestras": self.muestras,
+            "perdidas": self.perdidas,
+            "corruptas": self.corruptas,
+            "invalidas": self.invalidas,
+        }
+
+    # ------------------------------
+    # ENTRADA
+    # ------------------------------
+    def alimentar(self, datos):
+        """Agrega un bloque leído del puerto y devuelve [(a0, a1), ...]."""
+        self._buffer += datos
+        if self.modo == "auto":
+            self._detectar_modo()
+        if self.modo == "binario":
+            muestras = self._tramas()
+        elif self.modo == "ascii":
+            muestras = self._lineas()
+        else:
+            muestras = []
+        self._recortar()
+        self.muestras += len(muestras)
+        return muestras
+
+    def alimentar_bloque(self, datos):
+        """Como alimentar(), pero devuelve una matriz N×2 int16 (columnas A0, A1)."""
+        self._buffer += datos
+        if self.modo == "auto":
+            self._detectar_modo()
+        bloque = self._tramas_bloque() if self.modo == "binario" else None
+        if bloque is None:
+            if self.modo == "binario":
+                muestras = self._tramas()
+            elif self.modo == "ascii":
+                muestras = self._lineas()
+            else:
+                muestras = []
+            bloque = np.array(muestras, dtype=np.int16).reshape(-1, 2)
+        self._recortar()
+        self.muestras += len(bloque)
+        return bloque
+
+    def _recortar(self):
+        if len(self._buffer) > MAX_BUFFER:       # basura sin sincronismo ni fin de línea
+            del self._buffer[:-LARGO_TRAMA]
+
+    def _detectar_modo(self):
+        # 0xA5 nunca aparece en el formato ASCII (solo dígitos, '-', ',' y fin de línea)
+        if SYNC in self._buffer:
+            self.modo = "binario"
+        elif b"\n" in self._buffer:
+            self.modo = "ascii"
+
+    # ------------------------------
+    # FORMATOS
+    # ------------------------------
+    def _tramas(self):
+        buf = self._buffer
+        muestras = []
+        pos = 0
+        while True:
+            if buf[pos:pos + 2] != SYNC:
+                pos = buf.find(SYNC, pos)
+                if pos < 0:
+                    pos = max(len(buf) - 1, 0)   # el último byte puede ser medio sincronismo
+                    break
+            # Tramas alineadas desde pos: se desempaquetan de una vez
+            alineado = (len(buf) - pos) // LARGO_TRAMA * LARGO_TRAMA
+            if not alineado:
+                break
+            for sync, secuencia, a0, a1, chk in _TRAMA.iter_unpack(bytes(buf[pos:pos + alineado])):
+                if sync != SYNC:
+                    break                        # desalineado: volver a buscar sincronismo
+                # Suma de los bytes 2..8 (mod 256) a partir de los valores ya desempaquetados
+                if (secuencia + (secuencia >> 8) + a0 + (a0 >> 8) + a1 + (a1 >> 8) + chk) & 0xFF:
+                    self.corruptas += 1
+                    pos += 1                     # resincronizar desde el byte siguiente
+                    break
+                if self._secuencia is not None and secuencia != self._secuencia:
+                    self.perdidas += (secuencia - self._secuencia) & 0xFFFF
+                self._secuencia = (secuencia + 1) & 0xFFFF
+                muestras.append((a0, a1))
+                pos += LARGO_TRAMA
+            else:
+                break                            # quedan menos de LARGO_TRAMA bytes
+        del buf[:pos]
+        return muestras
+
+    def _tramas_bloque(self):
+        """
+        Camino rápido de _tramas(): todas las tramas alineadas desde el
+        inicio del buffer, validadas y decodificadas con numpy. Devuelve
+        None (sin consumir nada) si alguna no tiene sincronismo o checksum,
+        o si son tan pocas que no compensa.
+        """
+        buf = self._buffer
+        alineado = len(buf) // LARGO_TRAMA * LARGO_TRAMA
+        if buf[:2] != SYNC or alineado < MIN_TRAMAS_NUMPY * LARGO_TRAMA:
+            return None
+        tramas = np.frombuffer(bytes(buf[:alineado]), dtype=_TRAMA_NP)
+        crudo = tramas.view(np.uint8).reshape(-1, LARGO_TRAMA)
+        if (crudo[:, 0] != 0xA5).any() or (crudo[:, 1] != 0x5A).any() \
+                or crudo[:, 2:].sum(axis=1, dtype=np.uint8).any():
+            return None
+        secuencia = tramas["secuencia"]
+        esperada = np.empty(len(tramas), dtype=np.uint16)
+        esperada[0] = secuencia[0] if self._secuencia is None else self._secuencia
+        esperada[1:] = secuencia[:-1] + np.uint16(1)     # uint16: da la vuelta en 65535
+        self.perdidas += int((secuencia - esperada).sum(dtype=np.int64))
+        self._secuencia = (int(secuencia[-1]) + 1) & 0xFFFF
+        del buf[:alineado]
+        return np.column_stack((tramas["a0"], tramas["a1"]))
+
+    def _lineas(self):
+        corte = self._buffer.rfind(b"\n")
+        if corte < 0:
+            return []
+        completas = bytes(self._buffer[:corte])
+        del self._buffer[:corte + 1]
+        muestras = []
+        for linea in completas.split(b"\n"):
+            partes = linea.split(b",")
+            if len(partes) != 2:
+                if linea.strip():
+                    self.invalidas += 1
+                continue
+            try:
+                muestras.append((int(partes[0]), int(partes[1])))   # int() ignora '\r' y espacios
+            except ValueError:
+                self.invalidas += 1
+        return muestras
@@ -0,0 +1,88 @@
+# ===============================================================
+# 🐟 PUBLICADOR DE ESTADO — v25.py → Flask (UDP 6000) solo con cambios
+# ===============================================================
+# Antes el bucle armaba el estado completo (con toda la lista de tareas
+# manuales), hacía json.dumps y lo mandaba en CADA iteración aunque nada
+# hubiera cambiado: ~20 datagramas/s iguales.
+#
+# Ahora publicar(estado) compara con lo último enviado y manda:
+#   - un delta con los campos que cambiaron ("cambios" y "borrados")
+#   - el estado completo como latido cada LATIDO segundos (y al arrancar)
+# con un número de secuencia en cada mensaje. Los cambios que llegan antes
+# de INTERVALO_MINIMO desde el último envío se juntan en el siguiente.
+# Flask aplica los deltas sobre su copia; si falta una secuencia sabe que
+# su copia puede estar desactualizada hasta el próximo latido.
+# Cada estanque tiene su publicador (y su secuencia); "estanque" va en
+# todos los mensajes para que Flask sepa a qué copia aplicarlos.
+#
+# Mensaje (JSON):
+#   {"seq": n, "estanque": e, "completo": true,  "timestamp": t, "estado":  {...}}
+#   {"seq": n, "estanque": e, "completo": false, "timestamp": t, "cambios": {...}, "borrados": [...]}
+
+import copy
+import json
+
+INTERVALO_MINIMO = 0.2             # s entre deltas (ráfagas de cambios → un solo mensaje)
+LATIDO = 2.0                       # s entre estados completos
+
+class PublicadorEstado:
+    """Envía el estado a Flask solo cuando cambia, más un latido completo."""
+
+    def __init__(self, enviar, reloj, intervalo_minimo=INTERVALO_MINIMO, latido=LATIDO, estanque=1):
+        self.enviar = enviar            # enviar(texto_json)
+        self.reloj = reloj
+        self.estanque = estanque
+        self.intervalo_minimo = intervalo_minimo
+        self.latido = latido
+        self.seq = 0
+        self.completos = 0
+        self.deltas = 0
+        self.bytes = 0
+        self._enviado = {}              # copia de lo que Flask ya tiene
+        self._t_envio = None            # monotonic del último envío
+        self._t_latido = None           # monotonic del último estado completo
+
+    def estadisticas(self):
+        return {
+            "seq": self.seq,
+            "completos": self.completos,
+            "deltas": self.deltas,
+            "bytes": self.bytes,
+        }
+
+    def publicar(self, estado):
+        """Llamar en cada iteración con el estado actual. True si se envió algo."""
+        ahora = self.reloj.monotonic()
+        if self._t_latido is None or ahora - self._t_latido >= self.latido:
+            self._enviado = copy.deepcopy(estado)
+            self._t_latido = ahora
+            self.completos += 1
+            return self._enviar(ahora, {"completo": True, "estado": estado})
+
+        if ahora - self._t_envio < self.intervalo_minimo:
+            return False                 # lo que cambió sale en el próximo envío
+
+        cambios = {k: v for k, v in estado.items() if k not in self._enviado or self._enviado[k] != v}
+        borrados = [k for k in self._enviado if k not in estado]
+        if not cambios and not borrados:
+            return False
+
+        for k in borrados:
+            del self._enviado[k]
+        self._enviado.update(copy.deepcopy(cambios))   # las listas/dicts de v25 se modifican en el lugar
+        self.deltas += 1
+        mensaje = {"completo": False, "cambios": cambios}
+        if borrados:
+            mensaje["borrados"] = borrados
+        return self._enviar(ahora, mensaje)
+
+    def _enviar(self, ahora, mensaje):
+        self.seq += 1
+        mensaje["seq"] = self.seq
+        mensaje["estanque"] = self.estanque
+        mensaje["timestamp"] = self.reloj.time()
+        texto = json.dumps(mensaje)
+        self._t_envio = ahora
+        self.bytes += len(texto)
+        self.enviar(texto)
+        return True
@@ -0,0 +1,265 @@
+# ===============================================================
+# 🐟 SERVIDOR DE COMANDOS TCP para v25.py (selectors, hilo propio)
+# ===============================================================
+# Antes el bucle de control aceptaba UNA conexión por iteración
+# (listen(1)) y hacía recv() bloqueante de hasta 1 s: una ráfaga de
+# comandos del dashboard se rechazaba o demoraba, y un cliente lento
+# frenaba el control.
+#
+# Ahora un hilo con selectors atiende muchas conexiones a la vez:
+#   - cada línea recibida es un comando ("8 1\n", o "2:8 1\n" para el
+#     estanque 2); un cliente viejo que manda el comando sin fin de
+#     línea y cierra también se atiende
+#   - la sintaxis se valida en el hilo (interpretar) y los comandos
+#     válidos pasan al bucle de control por una cola
+#   - el bucle los ejecuta con atender(ejecutar) y el resultado vuelve
+#     al cliente como una línea JSON {"ok", "comando", "motivo"}
+# Las respuestas de una conexión salen en el mismo orden que sus
+# comandos (aunque unos se rechacen al instante y otros esperen al bucle).
+
+import json
+import queue
+import selectors
+import socket
+import threading
+from collections import deque
+
+MAX_CONEXIONES = 64
+MAX_PENDIENTES = 100               # comandos esperando al bucle de control
+MAX_LINEA = 256                    # bytes por comando
+
+class _Conexion:
+    def __init__(self, sock):
+        self.sock = sock
+        self.entrada = bytearray()
+        self.salida = bytearray()
+        self.respuestas = deque()      # un casillero [respuesta|None] por comando, en orden
+        self.cerrar_al_vaciar = False  # el cliente terminó de enviar
+        self.registrado = False
+        self.cerrada = False
+
+class ServidorComandos:
+    """Recibe comandos por TCP en un hilo y los entrega al bucle de control."""
+
+    def __init__(self, host, puerto, interpretar, max_pendientes=MAX_PENDIENTES):
+        self.interpretar = interpretar  # texto → tupla de argumentos para ejecutar; ValueError(motivo) si no vale
+        self.recibidos = 0
+        self.rechazados = 0
+        self._cola = queue.Queue(maxsize=max_pendientes)   # (conexion, casillero, texto, argumentos)
+        self._resultados = queue.Queue()                    # (conexion, casillero, respuesta) desde el bucle
+        self._conexiones = set()
+        self._selector = selectors.DefaultSelector()
+        self._parar = threading.Event()
+        self._hilo = None
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, puerto))
+        self.sock.listen(MAX_CONEXIONES)
+        self.sock.setblocking(False)
+        self.puerto = self.sock.getsockname()[1]
+        self._selector.register(self.sock, selectors.EVENT_READ, "aceptar")
+
+        # El bucle de control "despierta" al hilo escribiendo un byte aquí
+        self._despertar_r, self._despertar_w = socket.socketpair()
+        self._despertar_r.setblocking(False)
+        self._despertar_w.setblocking(False)
+        self._selector.register(self._despertar_r, selectors.EVENT_READ, "despertar")
+
+    # ------------------------------
+    # CICLO DE VIDA
+    # ------------------------------
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._bucle, name="servidor-comandos", daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._parar.set()
+        self._avisar()
+        if self._hilo:
+            self._hilo.join(timeout=2.0)
+        for conexion in list(self._conexiones):
+            self._cerrar(conexion)
+        for s in (self.sock, self._despertar_r, self._despertar_w):
+            try:
+                s.close()
+            except OSError:
+                pass
+        self._selector.close()
+
+    # ------------------------------
+    # LADO DEL CONTROL
+    # ------------------------------
+    def atender(self, ejecutar):
+        """
+        Ejecuta los comandos pendientes en el hilo del bucle de control.
+        ejecutar(*argumentos) → (ok, motivo), con los argumentos que devolvió
+        interpretar(). No bloquea si no hay comandos.
+        """
+        atendidos = 0
+        while True:
+            try:
+                conexion, casillero, texto, argumentos = self._cola.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                ok, motivo = ejecutar(*argumentos)
+            except Exception as e:
+                ok, motivo = False, f"error interno: {e}"
+            self._resultados.put((conexion, casillero, {"ok": bool(ok), "comando": texto, "motivo": motivo}))
+            atendidos += 1
+        if atendidos:
+            self._avisar()
+        return atendidos
+
+    def _avisar(self):
+        try:
+            self._despertar_w.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass                         # ya hay un aviso pendiente o se está cerrando
+
+    # ------------------------------
+    # LADO DEL HILO
+    # ------------------------------
+    def _bucle(self):
+        while not self._parar.is_set():
+            for clave, eventos in self._selector.select(timeout=1.0):
+                if clave.data == "aceptar":
+                    self._aceptar()
+                elif clave.data == "despertar":
+                    try:
+                        while self._despertar_r.recv(512):
+                            pass
+                    except (BlockingIOError, OSError):
+                        pass
+                    self._entregar_resultados()
+                else:
+                    conexion = clave.data
+                    if eventos & selectors.EVENT_READ:
+                        self._leer(conexion)
+                    if eventos & selectors.EVENT_WRITE and not conexion.cerrada:
+                        self._escribir(conexion)
+
+    def _aceptar(self):
+        while True:
+            try:
+                sock, _ = self.sock.accept()
+            except (BlockingIOError, OSError):
+                return
+            if len(self._conexiones) >= MAX_CONEXIONES:
+                sock.close()
+                continue
+            sock.setblocking(False)
+            conexion = _Conexion(sock)
+            self._conexiones.add(conexion)
+            self._actualizar_eventos(conexion)
+
+    def _leer(self, conexion):
+        try:
+            datos = conexion.sock.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            self._cerrar(conexion)
+            return
+        if datos:
+            conexion.entrada += datos
+            while True:
+                fin = conexion.entrada.find(b"\n")
+                if fin < 0:
+                    break
+                linea = bytes(conexion.entrada[:fin])
+                del conexion.entrada[:fin + 1]
+                self._recibir(conexion, linea)
+            if len(conexion.entrada) > MAX_LINEA:
+                conexion.entrada.clear()
+                self._responder_ya(conexion, "", "comando demasiado largo")
+        else:
+            # Fin de datos del cliente: lo que quedó sin '\n' es el último comando
+            if conexion.entrada.strip():
+                self._recibir(conexion, bytes(conexion.entrada))
+                conexion.entrada.clear()
+            conexion.cerrar_al_vaciar = True
+            self._actualizar_eventos(conexion)
+
+    def _recibir(self, conexion, linea):
+        texto = linea.decode(errors="replace").strip()
+        if not texto:
+            return
+        self.recibidos += 1
+        try:
+            argumentos = self.interpretar(texto)
+        except ValueError as e:
+            self._responder_ya(conexion, texto, str(e))
+            return
+        casillero = [None]
+        try:
+            self._cola.put_nowait((conexion, casillero, texto, argumentos))
+        except queue.Full:
+            self._responder_ya(conexion, texto, "demasiados comandos pendientes")
+            return
+        conexion.respuestas.append(casillero)
+
+    def _responder_ya(self, conexion, texto, motivo):
+        self.rechazados += 1
+        conexion.respuestas.append([{"ok": False, "comando": texto, "motivo": motivo}])
+        self._vaciar_respuestas(conexion)
+
+    def _entregar_resultados(self):
+        while True:
+            try:
+                conexion, casillero, respuesta = self._resultados.get_nowait()
+            except queue.Empty:
+                return
+            casillero[0] = respuesta
+            if not conexion.cerrada:     # si el cliente ya se fue, la respuesta se pierde
+                self._vaciar_respuestas(conexion)
+
+    def _vaciar_respuestas(self, conexion):
+        # Solo salen las respuestas listas al frente, para respetar el orden
+        while conexion.respuestas and conexion.respuestas[0][0] is not None:
+            respuesta = conexion.respuestas.popleft()[0]
+            conexion.salida += (json.dumps(respuesta, ensure_ascii=False) + "\n").encode()
+        self._escribir(conexion)
+
+    def _escribir(self, conexion):
+        if conexion.salida:
+            try:
+                enviados = conexion.sock.send(conexion.salida)
+                del conexion.salida[:enviados]
+            except BlockingIOError:
+                pass
+            except OSError:
+                self._cerrar(conexion)   # el cliente cerró sin esperar respuesta
+                return
+        self._actualizar_eventos(conexion)
+
+    def _actualizar_eventos(self, conexion):
+        if conexion.cerrar_al_vaciar and not conexion.salida and not conexion.respuestas:
+            self._cerrar(conexion)       # todo respondido
+            return
+        eventos = 0 if conexion.cerrar_al_vaciar else selectors.EVENT_READ
+        if conexion.salida:
+            eventos |= selectors.EVENT_WRITE
+        if not eventos:                  # esperando al bucle de control: nada que vigilar
+            if conexion.registrado:
+                self._selector.unregister(conexion.sock)
+                conexion.registrado = False
+        elif conexion.registrado:
+            self._selector.modify(conexion.sock, eventos, conexion)
+        else:
+            self._selector.register(conexion.sock, eventos, conexion)
+            conexion.registrado = True
+
+    def _cerrar(self, conexion):
+        if conexion.cerrada:
+            return
+        conexion.cerrada = True
+        if conexion.registrado:
+            self._selector.unregister(conexion.sock)
+            conexion.registrado = False
+        self._conexiones.discard(conexion)
+        try:
+            conexion.sock.close()
+        except OSError:
+            pass
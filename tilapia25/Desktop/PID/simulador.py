@@ -0,0 +1,282 @@
+# ===============================================================
+# 🐟 SIMULADOR DE ESTANQUE — planta en lazo cerrado para v25.py
+# ===============================================================
+# ModeloEstanque se enchufa en hal.HardwareSimulado: recibe los cambios
+# de los relés (GPIO simulado) y entrega las cuentas del ADS1115 y la
+# temperatura del DS18B20. simular() corre el bucle real de v25
+# (actualizar_pid, control_por_tiempo, monitorear_seguridad_ph, ...)
+# durante días simulados en segundos y resume el comportamiento.
+#
+# Modelo (paso de Euler de hasta 1 s):
+#   pH:  deriva de primer orden hacia PH_EQUILIBRIO (respiración/nitrificación)
+#        + cal (pH↑) / ácido (pH↓) bombeados a CAUDAL_BOMBA_ML_MIN, que se
+#        mezclan en el estanque con constante TAU_MEZCLA_S
+#   O2:  dC/dt = kLa·(Csat(T) − C) − consumo, con kLa natural + aireador
+#        y Csat(T) interpolada de DO_Table (la misma que usa v25)
+#   T:   ciclo diario senoidal
+#
+# Uso: python3 simulador.py [--dias 3] [--ph 6.8] [--o2 2.0] [--semilla 0]
+#                           [--protocolo ascii|binario]
+# (una simulación por proceso: v25 guarda estado en variables globales)
+
+import argparse
+import contextlib
+import math
+import os
+import random
+import time
+from datetime import datetime
+
+import hal
+import v25
+
+# ==============================
+# PARÁMETROS DEL ESTANQUE
+# ==============================
+VOLUMEN_M3 = 10.0
+PH_EQUILIBRIO = 6.8             # pH al que tiende el agua sin dosificar
+TAU_DERIVA_S = 48 * 3600.0      # constante de tiempo de la deriva de pH
+EFECTO_PH_ML_M3 = 0.002         # ΔpH por mL de cal/ácido en 1 m³
+TAU_MEZCLA_S = 120.0            # mezcla del producto dosificado
+
+CONSUMO_O2_MG_L_H = 0.6         # respiración de peces + bacterias
+KLA_NATURAL_H = 0.05            # reaireación superficial (1/h)
+KLA_AIREADOR_H = 3.0            # aporte con el aireador encendido (1/h)
+
+TEMP_MEDIA = 25.0               # °C
+TEMP_AMPLITUD = 2.0             # °C, máximo a las 15 h
+RUIDO_PH = 0.003                # desviación estándar del sensor
+RUIDO_O2 = 0.02                 # mg/L
+RUIDO_TEMP = 0.02               # °C
+
+PASO_MAX_S = 1.0                # paso máximo de integración
+INTERVALO_REGISTRO_S = 60.0     # muestreo del estado real para el resumen
+
+def saturacion_o2(temp_c):
+    """Csat (mg/L) interpolada de DO_Table, igual que voltaje_a_DO."""
+    temp_c = min(max(temp_c, 0.0), 40.0)
+    i = int(temp_c)
+    j = min(i + 1, 40)
+    frac = temp_c - i
+    return (v25.DO_Table[i] + (v25.DO_Table[j] - v25.DO_Table[i]) * frac) / 1000.0
+
+# ==============================
+# MODELO
+# ==============================
+class ModeloEstanque:
+    """Estado físico del estanque y conversión a señales de los sensores."""
+
+    def __init__(self, ph=7.5, o2=5.0, semilla=0, pines=None):
+        # Relés (pH↑, pH↓, O2) de este estanque; por defecto los del estanque 1 de v25
+        self.pin_ph_up, self.pin_ph_down, self.pin_o2 = pines or (
+            v25.RELAY_PIN_PH_UP, v25.RELAY_PIN_PH_DOWN, v25.RELAY_PIN_O2)
+        self.ph = ph
+        self.o2 = o2
+        self.ml_cal = 0.0               # mL bombeados (pH↑)
+        self.ml_acido = 0.0             # mL bombeados (pH↓)
+        self.registro = []              # (t, pH, O2, T) cada INTERVALO_REGISTRO_S
+        self._cal_sin_mezclar = 0.0
+        self._acido_sin_mezclar = 0.0
+        self._encendidos = set()
+        self._azar = random.Random(semilla)
+        self._t = 0.0
+        self._proximo_registro = 0.0
+
+    def conectar(self, hardware):
+        self.reloj = hardware.reloj
+        # Segundos desde la medianoche local en t = 0 (para el ciclo diario)
+        epoch0 = self.reloj.time() - self.reloj.monotonic()
+        local = datetime.fromtimestamp(epoch0)
+        self._segundo_dia0 = local.hour * 3600 + local.minute * 60 + local.second + epoch0 % 1
+        self._t = self._proximo_registro = self.reloj.monotonic()
+        hardware.gpio.observadores.append(self._al_cambiar_pin)
+
+    def _al_cambiar_pin(self, pin, valor, t):
+        self._avanzar(t)                # integrar con el estado anterior del relé
+        if valor:
+            self._encendidos.add(pin)
+        else:
+            self._encendidos.discard(pin)
+
+    # ------------------------------
+    # DINÁMICA
+    # ------------------------------
+    def temperatura(self, t):
+        h = ((self._segundo_dia0 + t) % 86400.0) / 3600.0
+        return TEMP_MEDIA + TEMP_AMPLITUD * math.sin(2 * math.pi * (h - 9.0) / 24.0)
+
+    def _avanzar(self, t):
+        caudal_ml_s = v25.CAUDAL_BOMBA_ML_MIN / 60.0
+        while self._t < t:
+            h = min(PASO_MAX_S, t - self._t)
+            temp = self.temperatura(self._t)
+
+            # --- Dosificación y mezcla ---
+            if self.pin_ph_up in self._encendidos:
+                self._cal_sin_mezclar += caudal_ml_s * h
+                self.ml_cal += caudal_ml_s * h
+            if self.pin_ph_down in self._encendidos:
+                self._acido_sin_mezclar += caudal_ml_s * h
+                self.ml_acido += caudal_ml_s * h
+            fraccion = min(1.0, h / TAU_MEZCLA_S)
+            cal = self._cal_sin_mezclar * fraccion
+            acido = self._acido_sin_mezclar * fraccion
+            self._cal_sin_mezclar -= cal
+            self._acido_sin_mezclar -= acido
+
+            # --- pH ---
+            self.ph += (PH_EQUILIBRIO - self.ph) * h / TAU_DERIVA_S
+            self.ph += (cal - acido) * EFECTO_PH_ML_M3 / VOLUMEN_M3
+
+            # --- O2 ---
+            kla = KLA_NATURAL_H + (KLA_AIREADOR_H if self.pin_o2 in self._encendidos else 0.0)
+            csat = saturacion_o2(temp)
+            self.o2 += (kla * (csat - self.o2) - CONSUMO_O2_MG_L_H) * h / 3600.0
+            self.o2 = max(self.o2, 0.0)
+
+            self._t += h
+            if self._t >= self._proximo_registro:
+                self.registro.append((self._t, self.ph, self.o2, temp))
+                self._proximo_registro += INTERVALO_REGISTRO_S
+
+    # ------------------------------
+    # SENSORES
+    # ------------------------------
+    def leer_adc(self, t):
+        """Cuentas (A0, A1) que produciría el ADS1115 para el estado actual."""
+        self._avanzar(t)
+        temp = self.temperatura(t)
+        ph = self.ph + self._azar.gauss(0.0, RUIDO_PH)
+        o2 = max(self.o2 + self._azar.gauss(0.0, RUIDO_O2), 0.0)
+
+        # A0 y A1: inversas de las tablas de calibración que usa v25
+        calibracion = v25.calibracion
+        v_ph = (ph - calibracion.ph_b) / calibracion.pendiente_ph(temp)
+        v_o2_mv = o2 / calibracion.factor_do(temp)
+
+        return (round(v_ph / v25.CONVERSION_FACTOR['A0']),
+                round(v_o2_mv / 1000.0 / v25.CONVERSION_FACTOR['A1']))
+
+    def leer_temperatura(self, t):
+        self._avanzar(t)
+        return self.temperatura(t) + self._azar.gauss(0.0, RUIDO_TEMP)
+
+# ==============================
+# MÉTRICAS
+# ==============================
+def tiempo_establecimiento(registro, indice, setpoint, banda, permanencia=3600.0):
+    """
+    Primer instante (s desde el inicio) a partir del cual la variable
+    queda dentro de setpoint ± banda durante `permanencia` segundos.
+    None si nunca se establece.
+    """
+    if not registro:
+        return None
+    t_inicio = registro[0][0]
+    dentro_desde = None
+    for fila in registro:
+        t, valor = fila[0], fila[indice]
+        if abs(valor - setpoint) <= banda:
+            if dentro_desde is None:
+                dentro_desde = t
+            if t - dentro_desde >= permanencia:
+                return dentro_desde - t_inicio
+        else:
+            dentro_desde = None
+    return None
+
+# ==============================
+# ARNÉS
+# ==============================
+def simular(dias=1.0, ph=6.8, o2=2.0, semilla=0, bloque=5000, protocolo="ascii"):
+    """
+    Corre inicializar() + bucle_principal() de v25 sobre ModeloEstanque
+    con reloj virtual hasta completar `dias`. Devuelve un dict de métricas.
+    """
+    modelo = ModeloEstanque(ph=ph, o2=o2, semilla=semilla)
+    hardware = hal.HardwareSimulado(modelo=modelo, reloj=hal.RelojVirtual(),
+                                    protocolo_serial=protocolo)
+
+    notificaciones = []
+    v25.TCP_PORT = 0                    # no choca con una instancia real
+    v25.notificar_flask = lambda tipo, mensaje: notificaciones.append(
+        (hardware.reloj.monotonic(), tipo, mensaje))
+
+    duracion = dias * 86400.0
+    iteraciones = 0
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        v25.inicializar(hardware, lanzar_logger=False)
+        inicio = hardware.reloj.monotonic()
+        t0 = time.perf_counter()
+        while hardware.reloj.monotonic() - inicio < duracion:
+            v25.bucle_principal(max_iteraciones=bloque)
+            iteraciones += bloque
+        real = time.perf_counter() - t0
+        hardware.gpio.cleanup()
+        v25.liberar_recursos()
+
+    simulado = hardware.reloj.monotonic() - inicio
+    gpio = hardware.gpio
+    controlador = v25.controladores[v25.ESTANQUE_POR_DEFECTO]
+    ultimo_dia = [f for f in modelo.registro if f[0] >= inicio + simulado - 86400.0]
+    return {
+        "dias": simulado / 86400.0,
+        "iteraciones": iteraciones,
+        "segundos_reales": real,
+        "iteraciones_s": iteraciones / real,
+        "factor_tiempo_real": simulado / real,
+        "establecimiento_ph_s": tiempo_establecimiento(
+            modelo.registro, 1, controlador.setpoint_ph, v25.DEADBAND_PH + 0.05),
+        "establecimiento_o2_s": tiempo_establecimiento(
+            modelo.registro, 2, controlador.setpoint_o2, v25.DEADBAND_O2 + 0.1),
+        "encendido_s_dia": {
+            "ph_up": gpio.segundos_encendido(modelo.pin_ph_up) / (simulado / 86400.0),
+            "ph_down": gpio.segundos_encendido(modelo.pin_ph_down) / (simulado / 86400.0),
+            "o2": gpio.segundos_encendido(modelo.pin_o2) / (simulado / 86400.0),
+        },
+        "ml_dia": {
+            "cal": modelo.ml_cal / (simulado / 86400.0),
+            "acido": modelo.ml_acido / (simulado / 86400.0),
+        },
+        "ultimo_dia": {
+            "ph": (min(f[1] for f in ultimo_dia), max(f[1] for f in ultimo_dia)),
+            "o2": (min(f[2] for f in ultimo_dia), max(f[2] for f in ultimo_dia)),
+        } if ultimo_dia else None,
+        "serial": controlador.lector_serial.estadisticas(),
+        "bloqueos_ph": sum(1 for _, _, m in notificaciones if "bloqueado" in m),
+        "errores_finales": sorted(controlador.errores_activos),
+    }
+
+def _formatear_tiempo(segundos):
+    if segundos is None:
+        return "no se estableció"
+    return f"{segundos / 60:.0f} min"
+
+def imprimir_resumen(r):
+    print(f"Simulados {r['dias']:.2f} días en {r['segundos_reales']:.1f} s "
+          f"(x{r['factor_tiempo_real']:.0f} tiempo real)")
+    print(f"  bucle:            {r['iteraciones']} iteraciones, {r['iteraciones_s']:.0f} iteraciones/s")
+    print(f"  establecimiento:  pH {_formatear_tiempo(r['establecimiento_ph_s'])}, "
+          f"O2 {_formatear_tiempo(r['establecimiento_o2_s'])}")
+    e = r["encendido_s_dia"]
+    print(f"  encendido/día:    pH↑ {e['ph_up']:.0f} s, pH↓ {e['ph_down']:.0f} s, O2 {e['o2'] / 3600:.1f} h")
+    print(f"  dosificado/día:   cal {r['ml_dia']['cal']:.0f} mL, ácido {r['ml_dia']['acido']:.0f} mL")
+    if r["ultimo_dia"]:
+        (ph_min, ph_max), (o2_min, o2_max) = r["ultimo_dia"]["ph"], r["ultimo_dia"]["o2"]
+        print(f"  último día:       pH {ph_min:.2f}–{ph_max:.2f}, O2 {o2_min:.2f}–{o2_max:.2f} mg/L")
+    s = r["serial"]
+    print(f"  serial:           {s['modo']}, {s['muestras']} muestras, "
+          f"{s['perdidas']} perdidas, {s['corruptas']} corruptas")
+    print(f"  bloqueos pH:      {r['bloqueos_ph']}")
+    print(f"  errores finales:  {r['errores_finales']}")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--dias", type=float, default=3.0)
+    ap.add_argument("--ph", type=float, default=6.8, help="pH inicial")
+    ap.add_argument("--o2", type=float, default=2.0, help="O2 inicial (mg/L)")
+    ap.add_argument("--semilla", type=int, default=0)
+    ap.add_argument("--protocolo", choices=("ascii", "binario"), default="ascii",
+                    help="formato del Arduino simulado")
+    args = ap.parse_args()
+    imprimir_resumen(simular(args.dias, args.ph, args.o2, args.semilla, protocolo=args.protocolo))
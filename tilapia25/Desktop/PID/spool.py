@@ -0,0 +1,261 @@
+# ===============================================================
+# 🐟 SPOOL — registro local de solo-agregado para el logger
+# ===============================================================
+# Antes el logger tenía las escrituras pendientes solo en memoria
+# (EscritorBD): si SQLite seguía bloqueada y el proceso se caía, o la
+# cola llegaba a BD_COLA_MAXIMA, esas lecturas se perdían.
+#
+# Ahora cada registro se agrega primero a este spool en disco y un hilo
+# drenador lo pasa a SQLite. El spool es una serie de archivos
+# (segmentos) numerados en DIRECTORIO:
+#   000000000001.seg, 000000000002.seg, ...
+#   cabecera  4 bytes  b"SPL1"
+#   registros largo uint32 | crc32 uint32 | datos (largo bytes)
+# Un segmento se cierra al pasar TAMANO_SEGMENTO y se borra cuando el
+# drenador ya lo pasó entero a la BD.
+#
+# agregar() escribe el registro al sistema operativo (sobrevive a una
+# caída del proceso); sincronizar() hace fsync por lotes (cada
+# FSYNC_REGISTROS registros o FSYNC_INTERVALO segundos), que es lo que
+# sobrevive a un corte de luz. El drenador solo lee hasta lo sincronizado,
+# así la BD nunca tiene algo que el spool pueda perder.
+#
+# La posición de lectura es (segmento, posición) del próximo registro.
+# Al abrir, el último segmento se recorre y se trunca en el primer
+# registro incompleto o con crc inválido (escritura cortada).
+
+import os
+import struct
+import threading
+import time
+import zlib
+
+TAMANO_SEGMENTO = 4 << 20          # bytes por segmento antes de abrir el siguiente
+FSYNC_REGISTROS = 64               # registros sin fsync que fuerzan uno
+FSYNC_INTERVALO = 1.0              # s máximos que un registro espera su fsync
+
+CABECERA_SEGMENTO = b"SPL1"
+_REGISTRO = struct.Struct("<II")   # largo, crc32
+LARGO_MAXIMO = 1 << 20             # un largo mayor es basura, no un registro
+
+def nombre_segmento(numero):
+    return f"{numero:012d}.seg"
+
+class Spool:
+    """Escritor (hilo del logger) y lector (hilo drenador) del registro en disco."""
+
+    def __init__(self, directorio, tamano_segmento=TAMANO_SEGMENTO,
+                 fsync_registros=FSYNC_REGISTROS, fsync_intervalo=FSYNC_INTERVALO):
+        self.directorio = directorio
+        self.tamano_segmento = tamano_segmento
+        self.fsync_registros = fsync_registros
+        self.fsync_intervalo = fsync_intervalo
+        os.makedirs(directorio, exist_ok=True)
+
+        self._cond = threading.Condition()  # protege _sincronizado; despierta al drenador
+        self.archivo = None
+        self.segmento = None            # número del segmento que se escribe
+        self.posicion = None            # bytes escritos en él
+        self.sin_sincronizar = 0
+        self.t_primero = None           # instante del registro más antiguo sin fsync
+
+        # --- Estadísticas ---
+        self.registros = 0
+        self.fsyncs = 0
+        self.truncados = 0              # bytes descartados al recuperar
+
+        self._recuperar()
+        self._sincronizado = (self.segmento, self.posicion)
+
+    # ------------------------------
+    # SEGMENTOS
+    # ------------------------------
+    def segmentos(self):
+        """Números de segmento existentes, en orden."""
+        return sorted(int(n[:-4]) for n in os.listdir(self.directorio)
+                      if n.endswith(".seg") and n[:-4].isdigit())
+
+    def _ruta(self, numero):
+        return os.path.join(self.directorio, nombre_segmento(numero))
+
+    def _sincronizar_directorio(self):
+        """fsync del directorio: que el archivo nuevo (o borrado) también sea durable."""
+        fd = os.open(self.directorio, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _abrir_nuevo(self, numero):
+        self.archivo = open(self._ruta(numero), "wb")
+        self.archivo.write(CABECERA_SEGMENTO)
+        self.archivo.flush()
+        os.fsync(self.archivo.fileno())
+        self._sincronizar_directorio()
+        self.segmento = numero
+        self.posicion = len(CABECERA_SEGMENTO)
+
+    def _recuperar(self):
+        """Abre el último segmento para agregar, truncando una cola cortada."""
+        existentes = self.segmentos()
+        if not existentes:
+            self._abrir_nuevo(1)
+            return
+        ultimo = existentes[-1]
+        ruta = self._ruta(ultimo)
+        with open(ruta, "rb") as f:
+            datos = f.read()
+        if datos[:len(CABECERA_SEGMENTO)] != CABECERA_SEGMENTO:
+            valido = 0                   # ni la cabecera llegó al disco
+        else:
+            valido = len(CABECERA_SEGMENTO)
+            for _, fin in _recorrer(datos, valido):
+                valido = fin
+        if valido < len(datos):
+            self.truncados += len(datos) - valido
+            print(f"[WARN SPOOL] {nombre_segmento(ultimo)}: se descartan {len(datos) - valido} bytes "
+                  f"de un registro incompleto")
+        if valido == 0:
+            os.remove(ruta)
+            self._abrir_nuevo(ultimo)
+            return
+        self.archivo = open(ruta, "r+b")
+        self.archivo.truncate(valido)
+        self.archivo.seek(valido)
+        os.fsync(self.archivo.fileno())
+        self.segmento = ultimo
+        self.posicion = valido
+
+    def _rotar(self):
+        self.sincronizar()
+        self.archivo.close()
+        self._abrir_nuevo(self.segmento + 1)
+        with self._cond:
+            self._sincronizado = (self.segmento, self.posicion)
+
+    # ------------------------------
+    # ESCRITURA (hilo del logger)
+    # ------------------------------
+    def agregar(self, datos):
+        """Agrega un registro (bytes). Queda en el SO; el fsync lo hace sincronizar()."""
+        if self.posicion + _REGISTRO.size + len(datos) > self.tamano_segmento \
+                and self.posicion > len(CABECERA_SEGMENTO):
+            self._rotar()
+        self.archivo.write(_REGISTRO.pack(len(datos), zlib.crc32(datos)) + datos)
+        self.archivo.flush()
+        self.posicion += _REGISTRO.size + len(datos)
+        self.registros += 1
+        if not self.sin_sincronizar:
+            self.t_primero = time.monotonic()
+        self.sin_sincronizar += 1
+
+    def sincronizar(self):
+        """fsync de lo agregado y aviso al drenador."""
+        if not self.sin_sincronizar:
+            return
+        os.fsync(self.archivo.fileno())
+        self.fsyncs += 1
+        self.sin_sincronizar = 0
+        with self._cond:
+            self._sincronizado = (self.segmento, self.posicion)
+            self._cond.notify_all()
+
+    def sincronizar_si_corresponde(self):
+        if self.sin_sincronizar and (self.sin_sincronizar >= self.fsync_registros or
+                                     time.monotonic() - self.t_primero >= self.fsync_intervalo):
+            self.sincronizar()
+
+    def cerrar(self):
+        self.sincronizar()
+        self.archivo.close()
+
+    # ------------------------------
+    # LECTURA (hilo drenador)
+    # ------------------------------
+    def inicio(self):
+        """Posición del primer registro que hay en disco."""
+        return (self.segmentos()[0], len(CABECERA_SEGMENTO))
+
+    def esperar(self, posicion, timeout):
+        """Espera a que haya datos sincronizados después de posicion. True si los hay."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._sincronizado > posicion, timeout)
+
+    def leer(self, posicion, max_registros):
+        """
+        Registros sincronizados desde posicion → (lista de bytes, posición siguiente).
+        Lo dañado se salta avisando: el resto del segmento si es uno viejo, hasta
+        lo sincronizado si es el actual.
+        """
+        with self._cond:
+            hasta = self._sincronizado
+        registros = []
+        segmento, pos = posicion
+        while len(registros) < max_registros and (segmento, pos) < hasta:
+            try:
+                with open(self._ruta(segmento), "rb") as f:
+                    fin = hasta[1] if segmento == hasta[0] else os.fstat(f.fileno()).st_size
+                    f.seek(pos)
+                    pos = _leer_registros(f, pos, fin, registros, max_registros)
+            except FileNotFoundError:
+                fin = pos
+            if len(registros) >= max_registros:
+                break
+            if pos < fin:
+                print(f"[WARN SPOOL] {nombre_segmento(segmento)}: registro dañado en {pos}, "
+                      f"se saltan {fin - pos} bytes")
+                pos = fin
+            if segmento == hasta[0]:
+                break
+            siguientes = [n for n in self.segmentos() if n > segmento]
+            if not siguientes:
+                break
+            segmento, pos = siguientes[0], len(CABECERA_SEGMENTO)
+        return registros, (segmento, pos)
+
+    def purgar(self, posicion):
+        """Borra los segmentos anteriores a posicion (ya pasados a la BD)."""
+        borrados = 0
+        for numero in self.segmentos():
+            if numero >= posicion[0] or numero == self.segmento:
+                break
+            os.remove(self._ruta(numero))
+            borrados += 1
+        return borrados
+
+    def pendientes(self, posicion):
+        """Bytes en disco que el drenador todavía no leyó."""
+        total = 0
+        for numero in self.segmentos():
+            if numero < posicion[0]:
+                continue
+            tamano = self.posicion if numero == self.segmento else os.path.getsize(self._ruta(numero))
+            total += tamano - (posicion[1] if numero == posicion[0] else len(CABECERA_SEGMENTO))
+        return total
+
+def _recorrer(datos, inicio):
+    """(registro, fin) de cada registro válido desde inicio; para en el primero cortado o dañado."""
+    pos = inicio
+    while pos + _REGISTRO.size <= len(datos):
+        largo, crc = _REGISTRO.unpack_from(datos, pos)
+        fin = pos + _REGISTRO.size + largo
+        if largo > LARGO_MAXIMO or fin > len(datos):
+            return
+        registro = datos[pos + _REGISTRO.size:fin]
+        if zlib.crc32(registro) != crc:
+            return
+        yield registro, fin
+        pos = fin
+
+def _leer_registros(f, pos, fin, registros, max_registros):
+    """Lee de f (ya en pos) registros válidos hasta fin; devuelve la posición alcanzada."""
+    while len(registros) < max_registros and pos + _REGISTRO.size <= fin:
+        largo, crc = _REGISTRO.unpack(f.read(_REGISTRO.size))
+        if largo > LARGO_MAXIMO or pos + _REGISTRO.size + largo > fin:
+            break
+        datos = f.read(largo)
+        if len(datos) != largo or zlib.crc32(datos) != crc:
+            break
+        registros.append(datos)
+        pos += _REGISTRO.size + largo
+    return pos
@@ -0,0 +1,147 @@
+# ===============================================================
+# 🐟 TELEMETRÍA — datagrama binario de v25 para GUI / logger / Flask
+# ===============================================================
+# Antes v25 armaba en cada iteración un CSV de 21 campos con f-strings y
+# cada receptor lo volvía a partir con split(",") y float() campo a
+# campo, con posiciones fijas (partes[3], fila[18], len == 21): agregar
+# un campo rompía a todos.
+#
+# Ahora el datagrama es de formato fijo (struct, little-endian):
+#   cabecera  16 bytes
+#       0-1   magia        b"TL"
+#       2     versión      uint8
+#       3     estanque     uint8 (versión 2; en la 1 era un byte reservado en 0)
+#       4-7   secuencia    uint32 (da la vuelta en 2**32)
+#       8-15  instante     float64, reloj monotónico de v25 (s)
+#   cuerpo (versiones 1 y 2)
+#       CAMPOS             float32 cada uno, en el orden de CAMPOS
+#       errores            uint32, bit n = código de error n (1..31)
+#
+# decodificar() devuelve un diccionario por nombre de campo, así los
+# receptores no dependen de posiciones. Cada versión tiene su propio
+# formato en FORMATOS; una versión nueva agrega campos al final y los
+# receptores viejos la rechazan con ValueError en lugar de leer mal.
+# decodificar() también acepta el CSV de 21 campos de versiones
+# anteriores de v25 (sin secuencia ni instante). Lo que no trae número de
+# estanque (versión 1 y CSV) se toma como ESTANQUE_POR_DEFECTO.
+
+import struct
+
+MAGIA = b"TL"
+VERSION = 2
+ESTANQUE_POR_DEFECTO = 1
+
+_CABECERA = struct.Struct("<2sBBId")
+LARGO_CABECERA = _CABECERA.size     # 16 bytes
+
+# Mismo orden que el CSV original (ver ENCABEZADOS de logger_3.py)
+CAMPOS = (
+    "a0", "ph", "a1", "o2",
+    "control_ph_down", "control_ph_up", "control_o2",
+    "p_down", "i_down", "d_down",
+    "p_up", "i_up", "d_up",
+    "p_o2", "i_o2", "d_o2",
+    "temp", "t_on_down", "t_on_up", "t_on_o2",
+)
+
+# Decimales de cada campo en el CSV original; float32 trae más cifras de las reales
+DECIMALES = (4, 4, 4, 4, 2, 2, 2, 4, 4, 4, 4, 4, 4, 4, 4, 4, 2, 3, 3, 3)
+
+FORMATOS = {
+    1: struct.Struct("<2sBBId" + "f" * len(CAMPOS) + "I"),
+    2: struct.Struct("<2sBBId" + "f" * len(CAMPOS) + "I"),   # mismo cuerpo; byte 3 = estanque
+}
+_DATAGRAMA = FORMATOS[VERSION]
+LARGO = _DATAGRAMA.size             # 100 bytes (el CSV ocupa ~150)
+
+# ------------------------------
+# ERRORES
+# ------------------------------
+def errores_a_mascara(errores):
+    """{3, 17} → bits 3 y 17. El código 0 (sin errores) no ocupa bit."""
+    mascara = 0
+    for codigo in errores:
+        if 0 < codigo < 32:
+            mascara |= 1 << codigo
+    return mascara
+
+def mascara_a_errores(mascara):
+    """Bits → lista ordenada de códigos ([] si no hay errores)."""
+    errores = []
+    while mascara:                      # solo recorre los bits encendidos
+        bajo = mascara & -mascara
+        errores.append(bajo.bit_length() - 1)
+        mascara ^= bajo
+    return errores
+
+def errores_a_texto(errores):
+    """[3, 17] → "3|17"; sin errores → "0" (formato del CSV y de errores_log)."""
+    return "|".join(str(c) for c in sorted(errores) if c) or "0"
+
+# ------------------------------
+# CODIFICACIÓN
+# ------------------------------
+def codificar(secuencia, instante, valores, errores, estanque=ESTANQUE_POR_DEFECTO):
+    """
+    Datagrama binario de la versión actual.
+    valores: secuencia de floats en el orden de CAMPOS; errores: códigos activos;
+    estanque: número del estanque (1..255).
+    """
+    return _DATAGRAMA.pack(MAGIA, VERSION, estanque, secuencia & 0xFFFFFFFF, instante,
+                           *valores, errores_a_mascara(errores))
+
+def codificar_csv(valores, errores):
+    """El CSV de 21 campos original (para receptores que aún no leen binario)."""
+    return (",".join(f"{v:.{d}f}" for v, d in zip(valores, DECIMALES))
+            + "," + errores_a_texto(errores)).encode("utf-8")
+
+# ------------------------------
+# DECODIFICACIÓN
+# ------------------------------
+def decodificar(datos):
+    """
+    Datagrama (binario o CSV viejo) → dict con CAMPOS, "errores" (lista),
+    "version", "estanque", "secuencia" e "instante" (None en CSV).
+    ValueError si no sirve.
+    """
+    if datos[:2] == MAGIA:
+        return _decodificar_binario(datos)
+    return _decodificar_csv(datos)
+
+def _decodificar_binario(datos):
+    if len(datos) < LARGO_CABECERA:
+        raise ValueError(f"datagrama corto ({len(datos)} bytes)")
+    version = datos[2]
+    formato = FORMATOS.get(version)
+    if formato is None:
+        raise ValueError(f"versión de telemetría desconocida: {version}")
+    if len(datos) != formato.size:
+        raise ValueError(f"largo {len(datos)} ≠ {formato.size} para la versión {version}")
+    _, _, estanque, secuencia, instante, *valores, mascara = formato.unpack(datos)
+    if version < 2:
+        estanque = ESTANQUE_POR_DEFECTO
+    muestra = dict(zip(CAMPOS, valores))
+    muestra.update(version=version, estanque=estanque, secuencia=secuencia, instante=instante,
+                   errores=mascara_a_errores(mascara))
+    return muestra
+
+def _decodificar_csv(datos):
+    partes = datos.decode("utf-8", errors="replace").strip().split(",")
+    if len(partes) != len(CAMPOS) + 1:
+        raise ValueError(f"CSV con {len(partes)} campos")
+    muestra = dict(zip(CAMPOS, map(float, partes[:-1])))   # float() lanza ValueError
+    muestra.update(version=0, estanque=ESTANQUE_POR_DEFECTO, secuencia=None, instante=None,
+                   errores=[int(c) for c in partes[-1].split("|") if c.isdigit() and int(c)])
+    return muestra
+
+def redondear(muestra):
+    """Copia de la muestra con cada campo en los decimales del CSV (para guardar o mostrar)."""
+    redondeada = dict(muestra)
+    for campo, decimales in zip(CAMPOS, DECIMALES):
+        redondeada[campo] = round(muestra[campo], decimales)
+    return redondeada
+
+def fila_csv(muestra):
+    """Valores de la muestra como textos en el orden de CAMPOS + código de error (archivos CSV)."""
+    return ([f"{muestra[c]:.{d}f}" for c, d in zip(CAMPOS, DECIMALES)]
+            + [errores_a_texto(muestra["errores"])])
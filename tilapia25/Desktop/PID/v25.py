@@ -3,29 +3,36 @@
 # ===============================================
 # CAMBIOS Y MEJORAS v25
 # ===============================================
-# 
+#
 # ===============================================
 
-import serial
-import time
 from simple_pid import PID
-import RPi.GPIO as GPIO 
-from w1thermsensor import W1ThermSensor
 import socket
 import statistics
 import subprocess
 import os
 import sys
-import json 
+import json
 from datetime import datetime
-import requests
-
-errores_activos = set()     # conjunto de códigos de error activos
-codigo_error_actual = 0     # último código de error enviado o registrado
-
-# --- NUEVO: Estados de pausa manual de PIDs ---
-pid_paused_ph = False       # True = PID pH detenido hasta confirmacion externa
-pid_paused_o2 = False       # True = PID O2 detenido hasta confirmacion externa
+from ventanas import VentanaMovil
+from lector_serial import LectorSerial
+from procesamiento import ProcesadorADC, np     # np es None si no hay numpy
+from calibracion import Calibracion
+from lector_temperatura import LectorTemperatura
+from notificador import NotificadorFlask
+from servidor_comandos import ServidorComandos
+from publicador_estado import PublicadorEstado
+import telemetria
+import hal
+
+# --- Hardware (RPi real o simulador, ver hal.py); se asigna en inicializar() ---
+hw = None
+reloj = hal.RelojReal()     # time()/monotonic()/sleep() del hardware activo
+GPIO = None                 # RPi.GPIO o GPIOSimulado
+
+# Errores del proceso (no de un estanque), p. ej. 13 si no arrancó el logger;
+# cada estanque empieza con ellos en sus errores activos
+errores_sistema = set()
 
 # --- PRIORIDAD DE ERRORES ---
 PRIORIDAD_ERRORES = {       # entre más bajo el número, mayor prioridad (error ,prioridad)
@@ -38,7 +45,7 @@ PRIORIDAD_ERRORES = {       # entre más bajo el número, mayor prioridad (error
     18: 4,                  # UDP
     19: 5,                  # GPIO
     20: 6,                  # bucle principal
-    1: 10, 2: 10, 3: 10, 
+    1: 10, 2: 10, 3: 10,
     4: 11, 5: 11, 6: 11,
     7: 12, 8: 12, 9: 12,
     10: 13, 11: 14, 12: 14
@@ -57,36 +64,39 @@ def iniciar_logger_csv():
             stderr=subprocess.DEVNULL   # suprime mensajes de error
         )
     except Exception as e:
-        errores_activos.add(13)
+        errores_sistema.add(13)
         pass                            # Si falla el lanzamiento, el sistema principal continúa
 
-iniciar_logger_csv()                    # Ejecutar el logger automáticamente al iniciar el sistema principal
-time.sleep(1.0)                         # breve espera para que el logger se inicialice
-
 # ==============================
-sensor_ds18b20 = W1ThermSensor()        # Inicializa sensor de temperatura DS18B20
+notificador = None                      # Cola + hilo de avisos a Flask (se crea en inicializar())
+controladores = {}                      # número de estanque → ControladorEstanque (se crean en inicializar())
 # ==============================
 # CONFIGURACION SERIAL
 # ==============================
 
-SERIAL_PORT = '/dev/ttyACM0'
-BAUD_RATE = 115200 
+SERIAL_PORT = '/dev/ttyACM0'            # Arduino del estanque 1 (ver CONFIGURACIÓN DE ESTANQUES)
+BAUD_RATE = 115200
+
+# Formato del Arduino: "ascii" (RAW_A0,RAW_A1 cada 100 ms), "binario"
+# (tramas con secuencia y checksum a ~100 Hz) o "auto" (según lo que llegue)
+PROTOCOLO_SERIAL = os.environ.get("TILAPIA_SERIAL", "auto")
 
-N_MUESTRAS = 5             # Número de muestras para promedio
+N_MUESTRAS = 5             # Número de muestras para promedio (ASCII, 10 Hz → 0.5 s)
+N_MUESTRAS_BINARIO = 50    # Mismo intervalo de 0.5 s con tramas binarias a 100 Hz
 CONVERSION_FACTOR = {
     'A0': 0.0001875,       # ±6.144 V (sensor 0–5 V)
     'A1': 0.000125         # ±4.096 V (sensor 0–3 V)
 }
 CANALES = ['A0', 'A1']
 ALPHA_SUAVIZADO = 0.8      # Factor de suavizado exponencial
+PH_A25 = -5.7              # Pendiente pH/V del electrodo a 25 °C (por defecto, ver calibracion.json)
+PH_B = 21.34               # Ordenada al origen pH (por defecto, ver calibracion.json)
 DELAY_MUESTREO = 0.05      # segundos entre iteraciones del bucle
 
-# Lee temperatura cada X segundos (para no bloquear el bucle en cada iteración)
+# El DS18B20 se lee en un hilo aparte cada X segundos (la conversión tarda ~750 ms)
 TEMP_READ_INTERVAL = 5.0   # segundos
-
-# --- Estado interno de cache de temperatura ---
-_last_temp_read = 0.0 
-_temp_cache = 25.0 
+TEMP_MAX_EDAD = 3 * TEMP_READ_INTERVAL   # lectura más vieja que esto → error 17
+TEMP_POR_DEFECTO = 25.0    # °C mientras no haya ninguna lectura válida
 
 # ==============================
 # CONFIGURACION PID
@@ -95,129 +105,82 @@ Kp_o2, Ki_o2, Kd_o2 = 2.0, 0.5, 0.1                     # Ganancias O2
 Kp_ph_up, Ki_ph_up, Kd_ph_up = 1.5, 0.5, 0.7            # Ganancias pH Up
 Kp_ph_down, Ki_ph_down, Kd_ph_down = -2.0, -0.5, -0.7   # Ganancias pH Down
 
-# --- Setpoints ---
+# --- Setpoints (por defecto; cada estanque puede tener los suyos) ---
 setpoint_o2 = 5.0  # mg/L
-SETPOINT_pH = 7.5 
+SETPOINT_pH = 7.5
 setpoint_ph_up = SETPOINT_pH
-setpoint_ph_down = SETPOINT_pH 
+setpoint_ph_down = SETPOINT_pH
 
 # --- Banda muerta ---
 DEADBAND_O2 = 0.5  # mg/L
 DEADBAND_PH = 0.4  # pH
 
-# --- Objetos PID ---
-pid_o2 = PID(Kp_o2, Ki_o2, Kd_o2, setpoint=setpoint_o2)
-pid_ph_up = PID(Kp_ph_up, Ki_ph_up, Kd_ph_up, setpoint=setpoint_ph_up)
-pid_ph_down = PID(Kp_ph_down, Ki_ph_down, Kd_ph_down, setpoint=setpoint_ph_down)
+# --- Objetos PID (un trío por estanque) ---
+def crear_pids(setpoint_ph=SETPOINT_pH, setpoint_oxigeno=setpoint_o2):
+    """PIDs de O2, pH↑ y pH↓ con sus límites de salida."""
+    pid_o2 = PID(Kp_o2, Ki_o2, Kd_o2, setpoint=setpoint_oxigeno)
+    pid_ph_up = PID(Kp_ph_up, Ki_ph_up, Kd_ph_up, setpoint=setpoint_ph)
+    pid_ph_down = PID(Kp_ph_down, Ki_ph_down, Kd_ph_down, setpoint=setpoint_ph)
 
-# --- Límites de salida ---
-pid_o2.output_limits = (0, 100)
-pid_ph_up.output_limits = (0, 100)
-pid_ph_down.output_limits = (0, 100)
+    # --- Límites de salida ---
+    pid_o2.output_limits = (0, 100)
+    pid_ph_up.output_limits = (0, 100)
+    pid_ph_down.output_limits = (0, 100)
+    return pid_o2, pid_ph_up, pid_ph_down
 
-# ============================== 
+# ==============================
 # CONFIGURACIÓN UDP/TCP
 # ==============================
 UDP_IP = "127.0.0.1"            # localhost
 UDP_PORT_GUI = 5005             # Puerto destino GUI
 UDP_PORT_LOGGER = 5006          # Puerto destino logger.py
+UDP_PORT_FLASK_DATOS = 5007     # Puerto destino app.py flask (telemetría en vivo)
 UDP_PORT_FLASK = 6000 			# Puerto destino app.py flask
+UDP_FORMATO_GUI = "csv"         # la GUI aún lee el CSV de 21 campos; "binario" cuando lea telemetria.py
 TCP_PORT = 5010                 # Puerto para recepción de comandos (TCP)
+URL_NOTIFICACIONES_FLASK = "http://127.0.0.1:5000/api/notificacion_sistema"
+
+# --- Concentrador de la flota (concentrador.py): "host:puerto", sin valor no se envía ---
+CONCENTRADOR = os.environ.get("TILAPIA_CONCENTRADOR")
+if CONCENTRADOR:
+    _host, _, _puerto = CONCENTRADOR.rpartition(":")
+    try:
+        _host = socket.gethostbyname(_host)    # una vez, no en cada sendto
+    except OSError:
+        pass
+    CONCENTRADOR = (_host, int(_puerto))
+
 udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 udp_socket.setblocking(False)   # No bloquear si no hay cliente
 
-# --- Socket TCP para recepción de comandos desde el sitio web ---
-tcp_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-tcp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-tcp_socket.bind((UDP_IP, TCP_PORT))
-tcp_socket.listen(1)
-tcp_socket.setblocking(False)
+# --- Servidor TCP para recepción de comandos desde el sitio web ---
+servidor_comandos = None        # hilo de comandos TCP (se crea en inicializar())
 
 # ==============================
 # CALIBRACION SENSOR OXIGENO (dos puntos)
 # ==============================
 # --- Voltajes medidos durante calibracion (mV) y temperaturas (°C) ---
-CAL1_V, CAL1_T = 1600, 25 
+# (valores por defecto; calibracion.json los reemplaza y se recarga en caliente)
+CAL1_V, CAL1_T = 1600, 25
 CAL2_V, CAL2_T = 1300, 15
 
 # --- Tabla de oxígeno saturado según temperatura (μg/L) ---
-DO_Table = [ 
+DO_Table = [
     14460, 14220, 13820, 13440, 13090, 12740, 12420, 12110, 11810, 11530,
     11260, 11010, 10770, 10530, 10300, 10080, 9860, 9660, 9460, 9270,
     9080, 8900, 8730, 8570, 8410, 8250, 8110, 7960, 7820, 7690,
     7560, 7430, 7300, 7180, 7070, 6950, 6840, 6730, 6630, 6530, 6410
 ]
 
-# ==============================
-# FUNCIONES SERIAL
-# ==============================
-def conectar_serial():
-    try:
-        ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=0.1)
-        time.sleep(3)
-        print(f"[OK] Puerto serial abierto: {SERIAL_PORT} a {BAUD_RATE} bps")
-        return ser
-    except Exception as e:
-        errores_activos.add(14)
-        print(f"[ERROR] No se pudo abrir el puerto serial: {e}")
-        return None
-
-ser = None
-while ser is None:
-    ser = conectar_serial()
-    if ser is None:
-        print("[WARN] No hay dispositivo conectado. Reintentando en 5 segundos...")
-        time.sleep(5)
-
-def leer_linea_ultima():
-    """
-    Drena el buffer serial y devuelve SOLO la última línea válida disponible.
-    Si no hay datos, retorna None sin bloquear el bucle.
-    """
-    global ser
-    try:
-        if ser.in_waiting == 0:
-            return None  # nada que leer ahora
-
-        last_line = None
-        max_reads = 200
-        reads = 0
-
-        while ser.in_waiting > 0 and reads < max_reads:
-            raw = ser.readline()
-            if not raw:
-                break
-            linea = raw.decode('utf-8', errors='ignore').strip()
-            if linea:
-                last_line = linea
-            reads += 1
-
-        if not last_line:
-            return None
-
-        partes = last_line.split(',')
-        if len(partes) != len(CANALES):
-            return None
-
-        valores = {canal: int(val) for canal, val in zip(CANALES, partes)}
-        return valores
-
-    except (serial.SerialException, OSError) as e:
-        errores_activos.add(15)
-        print(f"[ERROR] Puerto serial: {e}. Intentando reconectar...")
-        try:
-            ser.close()
-        except:
-            pass
-        ser = None
-        while ser is None:
-            time.sleep(2)
-            ser = conectar_serial()
-        return None
-    except Exception as e:
-        errores_activos.add(16)
-        print(f"[ERROR] leer_linea_ultima: {e}")
-        return None
+# --- Tablas de conversión precalculadas cada 0.01 °C (ver calibracion.py) ---
+RUTA_CALIBRACION = os.environ.get(
+    "TILAPIA_CALIBRACION",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "calibracion.json"))
+calibracion = Calibracion.desde_archivo(
+    RUTA_CALIBRACION,
+    {"CAL1_V": CAL1_V, "CAL1_T": CAL1_T, "CAL2_V": CAL2_V, "CAL2_T": CAL2_T,
+     "PH_A25": PH_A25, "PH_B": PH_B},
+    DO_Table)
 
 # ==============================
 # FUNCIONES DE PROCESAMIENTO
@@ -233,206 +196,24 @@ def suavizado_exponencial(valor_actual, valor_anterior, alpha=ALPHA_SUAVIZADO):
         return valor_actual
     return alpha * valor_actual + (1 - alpha) * valor_anterior
 
-# ==============================
-# FUNCIONES DE TEMPERATURA 
-# ==============================
-def leer_temperatura():
-    """Lee la temperatura actual del DS18B20 en °C como float."""
-    try:
-        temperatura = sensor_ds18b20.get_temperature()
-        return temperatura
-    except Exception as e:
-        errores_activos.add(17)
-        print(f"[ERROR] No se pudo leer DS18B20: {e}")
-        return 25.0
-
-def temperatura_a_entero(temp):
-    """Convierte la temperatura float a un entero entre 0 y 40 para indexar DO_Table."""
-    temp_entero = int(round(temp))
-    if temp_entero < 0:
-        temp_entero = 0
-    elif temp_entero > 40:
-        temp_entero = 40
-    return temp_entero
-
-def leer_temperatura_cached():
-    """Cache de temperatura para evitar bloqueos por lectura frecuente."""
-    global _last_temp_read, _temp_cache
-    ahora = time.time()
-    if (ahora - _last_temp_read) >= TEMP_READ_INTERVAL:
-        t = leer_temperatura()
-        _temp_cache = t
-        _last_temp_read = ahora
-    return _temp_cache
-
 # ==============================
 # CONVERSION VOLTAJE → OXIGENO DISUELTO (mg/L)
 # ==============================
 def voltaje_a_DO(voltaje_mv, temperatura_c):
-    # --- Limitar temperatura al rango de la tabla ---
-    if temperatura_c < 0:
-        temperatura_c = 0
-    elif temperatura_c > 40:
-        temperatura_c = 40
-
-    # --- Voltaje de saturación interpolado según la temperatura ---
-    V_saturacion = ((temperatura_c - CAL2_T) * (CAL1_V - CAL2_V) / (CAL1_T - CAL2_T)) + CAL2_V
-
-    # --- Interpolación lineal de DO_Table usando temperatura decimal ---
-    lower_index = int(temperatura_c)
-    upper_index = min(lower_index + 1, 40)
-    fraction = temperatura_c - lower_index
-
-    DO_lower = DO_Table[lower_index]
-    DO_upper = DO_Table[upper_index]
-    DO_interp = DO_lower + (DO_upper - DO_lower) * fraction  # μg/L
-
-    # --- Ajustar según voltaje ---
-    DO_ug_L = voltaje_mv * DO_interp / V_saturacion
-    DO_mg_L = DO_ug_L / 1000.0
-    return DO_mg_L
+    # Saturación de dos puntos (CAL1/CAL2) e interpolación de DO_Table ya
+    # resueltas en la tabla de la calibración: un índice y una multiplicación
+    return calibracion.oxigeno(voltaje_mv, temperatura_c)
 
 # ==============================
-# ACTUALIZAR PID (PID Y CONTROL)
-# ==============================
-def actualizar_pid(pH_compensado, OD_compensado):
-    global pid_paused_ph, pid_paused_o2
-
-    # --- pH subida ---
-    error_up = setpoint_ph_up - pH_compensado
-    if pid_paused_ph:
-        pid_ph_up.auto_mode = False
-        control_ph_up = 0
-    else:
-        if abs(error_up) <= DEADBAND_PH:
-            pid_ph_up.auto_mode = False
-            control_ph_up = 0
-        elif error_up > 0:
-            pid_ph_up.auto_mode = True
-            pid_ph_down.auto_mode = False
-            control_ph_up = pid_ph_up(pH_compensado)
-        else:
-            pid_ph_up.auto_mode = False
-            control_ph_up = 0
-
-    # --- pH bajada ---
-    error_down = pH_compensado - setpoint_ph_down
-    if pid_paused_ph:
-        pid_ph_down.auto_mode = False
-        control_ph_down = 0
-    else:
-        if abs(error_down) <= DEADBAND_PH:
-            pid_ph_down.auto_mode = False
-            control_ph_down = 0
-        elif error_down > 0:
-            pid_ph_down.auto_mode = True
-            pid_ph_up.auto_mode = False
-            control_ph_down = pid_ph_down(pH_compensado)
-        else:
-            pid_ph_down.auto_mode = False
-            control_ph_down = 0
-
-    # --- O2 ---
-    if pid_paused_o2:
-        pid_o2.auto_mode = False
-        control_o2 = 0
-    else:
-        if abs(OD_compensado - setpoint_o2) <= DEADBAND_O2:
-            pid_o2.auto_mode = False
-            control_o2 = 0
-        else:
-            pid_o2.auto_mode = True
-            control_o2 = pid_o2(OD_compensado)
-
-    return control_ph_down, control_ph_up, control_o2
-
-# ==============================
-# CONFIGURACION PINS RELES
+# CONFIGURACION PINS RELES (estanque 1)
 # ==============================
 RELAY_PIN_PH_UP = 17    # GPIO para subir ph
 RELAY_PIN_PH_DOWN = 27  # GPIO para bajar ph
 RELAY_PIN_O2 = 25       # GPIO para controlar O2
-# --- Pines para controlar el temporizador 555 
+# --- Pines para controlar el temporizador 555
 GPIO_TRIGGER = 23 # Para disparar el temporizador 555
 GPIO_RESET   = 24 # Para resetear el temporizador 555
 
-GPIO.setmode(GPIO.BCM)
-GPIO.setup(RELAY_PIN_PH_UP, GPIO.OUT)
-GPIO.setup(RELAY_PIN_PH_DOWN, GPIO.OUT) 
-GPIO.setup(RELAY_PIN_O2, GPIO.OUT)
-
-GPIO.setup(GPIO_TRIGGER, GPIO.OUT)
-GPIO.setup(GPIO_RESET, GPIO.OUT)
-
-# Estado inicial seguro (todo apagado / sin disparar)
-GPIO.output(RELAY_PIN_PH_UP, GPIO.LOW)
-GPIO.output(RELAY_PIN_PH_DOWN, GPIO.LOW)
-GPIO.output(RELAY_PIN_O2, GPIO.LOW)
-
-# El 555 está en reposo con TRIGGER y RESET en HIGH
-GPIO.output(GPIO_TRIGGER, GPIO.HIGH)
-GPIO.output(GPIO_RESET, GPIO.HIGH)
-
-
-# ==============================
-# LÓGICA 555 – FLANCOS PARA TRIGGER Y RESET
-# ==============================
-
-# Estados previos para detectar flancos (inicialmente LOW)
-prev_ph_up  = False     # False = LOW, True = HIGH
-prev_ph_down = False    # igual
-
-# ===============================
-# Funciones para enviar pulsos a TRIGGER y RESET
-# ===============================
-def pulso_trigger():
-    """Envía un pulso corto al TRIGGER (flanco descendente)."""
-    GPIO.output(GPIO_TRIGGER, GPIO.LOW)
-    time.sleep(0.03)
-    GPIO.output(GPIO_TRIGGER, GPIO.HIGH)
-
-
-def pulso_reset():
-    """Envía un pulso corto al RESET (flanco descendente)."""
-    GPIO.output(GPIO_RESET, GPIO.LOW)
-    time.sleep(0.03)
-    GPIO.output(GPIO_RESET, GPIO.HIGH)
-pulso_reset() # Resetea al iniciar
-
-def logica_temporizador_555(ph_up_on, ph_down_on):
-    """
-    Detecta flancos ascendentes y descendentes en pH Up y pH Down.
-    Maneja TRIGGER y RESET del 555 según la lógica real del circuito.
-    """
-    global prev_ph_up, prev_ph_down
-
-    # --- Señales actuales ---
-    current_up = ph_up_on     # True o False
-    current_down = ph_down_on
-
-    # ========================================
-    #   1) FLANCO ASCENDENTE → RESET
-    # ========================================
-    if current_up and not prev_ph_up:
-        pulso_reset()
-
-    if current_down and not prev_ph_down:
-        pulso_reset()
-
-    # ========================================
-    #   2) FLANCO DESCENDENTE → TRIGGER
-    # ========================================
-    if prev_ph_up and not current_up:
-        pulso_trigger()
-
-    if prev_ph_down and not current_down:
-        pulso_trigger()
-
-    # Actualizar estados previos
-    prev_ph_up = current_up
-    prev_ph_down = current_down
-
-
 # ==============================
 # CONFIGURACIÓN DEL CONTROL MANUAL Y SEGURIDAD DE pH
 # ==============================
@@ -447,14 +228,6 @@ COOLDOWN_PH_SEG = 3600                      # Tiempo mínimo entre dosificacione
 DELTA_PH_MAX_HORA = 0.10                    # Máximo cambio permitido por hora
 DELTA_PH_MAX_DIA = 0.50                     # Máximo cambio permitido por día
 
-# --- Variables de estado ---
-tareas_manual = []                          # Lista de acciones manuales pendientes o en curso
-ultimo_ph_up = 0.0                          # Hora (timestamp) de la última dosificación pH↑
-ultimo_ph_down = 0.0                        # Hora (timestamp) de la última dosificación pH↓
-bloqueo_seguridad_ph = False                # True = Bloqueo por exceso de variación de pH
-bloqueo_ph_hasta = 0                        # timestamp futuro para desbloquear 
-bloqueo_ph_tipo = ""                        # puede tomar valores como hora o dia 
-
 # ==============================
 # CICLOS Y UMBRALES DE ACTUACION (en segundos)
 # ==============================
@@ -466,50 +239,69 @@ MIN_ACTUACION_PH_UP = 0.2
 MIN_ACTUACION_PH_DOWN = 0.2
 MIN_ACTUACION_O2 = 0.2
 
-inicio_ciclo_ph_up = time.time()
-inicio_ciclo_ph_down = time.time()
-inicio_ciclo_o2 = time.time()
-
-def pin_en_tarea_manual(pin):
-    """
-    Devuelve True si el pin está siendo usado por alguna tarea manual
-    (pH↑, pH↓ u O2).
-    """
-    return any(t["pin"] == pin for t in tareas_manual)
-
-
-def control_por_tiempo(salida_pid, inicio_ciclo, ciclo, pin, min_actuacion=0.0):
+# ==============================
+# CONFIGURACIÓN DE ESTANQUES
+# ==============================
+# Un proceso controla N estanques, cada uno con su Arduino, su DS18B20 y
+# sus relés. Sin archivo hay un solo estanque con SERIAL_PORT y los pines
+# de arriba. TILAPIA_ESTANQUES apunta a un JSON con la lista, p. ej.
+#   [{"numero": 1},
+#    {"numero": 2, "serial": "/dev/ttyACM1", "pin_ph_up": 5, "pin_ph_down": 6,
+#     "pin_o2": 13, "pin_trigger": 19, "pin_reset": 26,
+#     "sensor_temperatura": "3c01d607c3ab", "setpoint_ph": 7.2}]
+# El primero completa lo que falte con los valores del estanque 1.
+ESTANQUE_POR_DEFECTO = 1               # estanque de los comandos / datos sin número
+RUTA_ESTANQUES = os.environ.get("TILAPIA_ESTANQUES")
+CLAVES_ESTANQUE = ("numero", "serial", "pin_ph_up", "pin_ph_down", "pin_o2", "pin_trigger", "pin_reset")
+
+def cargar_estanques(ruta=None):
     """
-    Controla el relé por tiempo proporcional a la salida PID.
-    Devuelve el nuevo inicio de ciclo y el tiempo de activación (s).
+    Lista de configuraciones de estanque (dicts). Lanza ValueError si falta
+    una clave o si dos estanques comparten número, puerto serial o pin.
     """
-    try:
-        tiempo_on = (salida_pid / 100.0) * ciclo
-        if tiempo_on < min_actuacion:
-            tiempo_on = 0
-        tiempo_transcurrido = time.time() - inicio_ciclo
-        if tiempo_transcurrido >= ciclo:
-            inicio_ciclo += ciclo
-            tiempo_transcurrido -= ciclo
-        if tiempo_transcurrido < tiempo_on:
-            GPIO.output(pin, GPIO.HIGH)
-        else:
-            GPIO.output(pin, GPIO.LOW)
-        return inicio_ciclo, tiempo_on
-    except Exception as e:
-        errores_activos.add(19)
-        print(f"[ERROR GPIO] {e}")
-        return inicio_ciclo, 0
+    opcionales = {"sensor_temperatura": None, "setpoint_ph": SETPOINT_pH, "setpoint_o2": setpoint_o2}
+    estanque_1 = dict(opcionales, numero=ESTANQUE_POR_DEFECTO, serial=SERIAL_PORT,
+                      pin_ph_up=RELAY_PIN_PH_UP, pin_ph_down=RELAY_PIN_PH_DOWN, pin_o2=RELAY_PIN_O2,
+                      pin_trigger=GPIO_TRIGGER, pin_reset=GPIO_RESET)
+    if ruta is None:
+        return [estanque_1]
+
+    with open(ruta, "r") as f:
+        lista = json.load(f)
+    if not isinstance(lista, list) or not lista:
+        raise ValueError(f"{ruta}: se esperaba una lista de estanques")
+
+    estanques = []
+    numeros, puertos, pines = set(), set(), set()
+    for i, valores in enumerate(lista):
+        config = dict(estanque_1 if i == 0 else opcionales, **valores)
+        faltan = [clave for clave in CLAVES_ESTANQUE if clave not in config]
+        if faltan:
+            raise ValueError(f"estanque {config.get('numero', i + 1)}: falta {', '.join(faltan)}")
+        if not 1 <= config["numero"] <= 255:         # viaja en un byte de la telemetría
+            raise ValueError(f"número de estanque fuera de rango: {config['numero']}")
+        if config["numero"] in numeros:
+            raise ValueError(f"estanque {config['numero']} repetido")
+        if config["serial"] in puertos:
+            raise ValueError(f"estanque {config['numero']}: puerto {config['serial']} ya usado")
+        propios = {config[c] for c in CLAVES_ESTANQUE if c.startswith("pin_")}
+        if len(propios) < 5 or propios & pines:
+            raise ValueError(f"estanque {config['numero']}: pines repetidos")
+        numeros.add(config["numero"])
+        puertos.add(config["serial"])
+        pines |= propios
+        estanques.append(config)
+    return estanques
 
 # ==============================
 # PROCESAR LECTURAS
 # ==============================
-def procesar_lectura(lectura, acumulador, contador):
+def procesar_lectura(lectura, acumulador, contador, n_muestras=N_MUESTRAS):
     for canal in CANALES:
         acumulador[canal] += lectura[canal]
     contador += 1
-    if contador >= N_MUESTRAS:
-        promedio = promedio_acumulador(acumulador, N_MUESTRAS)
+    if contador >= n_muestras:
+        promedio = promedio_acumulador(acumulador, n_muestras)
         acumulador = {canal: 0 for canal in CANALES}
         contador = 0
         return promedio, True, acumulador, contador
@@ -518,7 +310,7 @@ def procesar_lectura(lectura, acumulador, contador):
 # ==============================
 # CONVERTIR Y COMPENSAR LECTURAS
 # ==============================
-def convertir_y_compensar(promedio, voltaje_suavizado):
+def convertir_y_compensar(promedio, voltaje_suavizado, temperatura_float):
     voltaje = voltaje_acumulador(promedio)
     for canal in CANALES:
         voltaje_suavizado[canal] = suavizado_exponencial(
@@ -527,22 +319,34 @@ def convertir_y_compensar(promedio, voltaje_suavizado):
         )
     voltaje_a0 = voltaje_suavizado['A0']
     voltaje_a1 = voltaje_suavizado['A1']
-    temperatura_float = leer_temperatura_cached()
-    temperatura_actual = temperatura_a_entero(temperatura_float)
-    OD_compensado = voltaje_a_DO(voltaje_a1 * 1000, temperatura_float)
-    T_kelvin = temperatura_actual + 273.15
-    a25 = -5.7
-    b = 21.34
-    aT = a25 * (T_kelvin / 298.15)
-    pH_compensado = aT * voltaje_a0 + b
+    pH_compensado, OD_compensado = compensar(voltaje_a0, voltaje_a1, temperatura_float)
     return voltaje_a0, voltaje_a1, pH_compensado, OD_compensado, temperatura_float, voltaje_suavizado
 
+def compensar(voltaje_a0, voltaje_a1, temperatura_float):
+    """pH y OD compensados por temperatura. Acepta escalares o arreglos numpy de voltajes."""
+    OD_compensado = voltaje_a_DO(voltaje_a1 * 1000, temperatura_float)
+    pH_compensado = calibracion.ph(voltaje_a0, temperatura_float)   # pendiente Nernst a 0.01 °C
+    return pH_compensado, OD_compensado
+
+def compensar_bloque(voltajes, temperatura_float):
+    """
+    Versión en bloque de compensar(): voltajes = [(V_A0, V_A1), ...] de
+    ProcesadorADC. Devuelve las listas de pH y OD (una temperatura por bloque).
+    """
+    if np is None:
+        resultados = [compensar(v0, v1, temperatura_float) for v0, v1 in voltajes]
+        return [r[0] for r in resultados], [r[1] for r in resultados]
+    v = np.array(voltajes)
+    pH_compensado, OD_compensado = compensar(v[:, 0], v[:, 1], temperatura_float)
+    return pH_compensado.tolist(), OD_compensado.tolist()
+
 # ==============================
 # MOSTRAR DATOS EN CONSOLA
 # ==============================
 def mostrar_datos_consola(voltaje_a0, voltaje_a1, pH_compensado, OD_compensado,
                           control_ph_down, control_ph_up, control_o2,
-                          pid_ph_up, pid_ph_down, pid_o2, temperatura_float, ser, errores_udp_str):
+                          pid_ph_up, pid_ph_down, pid_o2, temperatura_float, ser, errores_udp_str,
+                          estanque=None):
     p_up, i_up, d_up = pid_ph_up.components
     p_down, i_down, d_down = pid_ph_down.components
     p_o2, i_o2, d_o2 = pid_o2.components
@@ -556,42 +360,14 @@ def mostrar_datos_consola(voltaje_a0, voltaje_a1, pH_compensado, OD_compensado,
     )'''
     #print(f"[DEBUG] in_waiting={ser.in_waiting}")
 
+    prefijo = f"[E{estanque}] " if estanque is not None else ""   # solo con más de un estanque
     print(
-            f"a0:{voltaje_a0:.2f},pH:{pH_compensado:.2f},a1:{voltaje_a1:.2f},O2:{OD_compensado:.2f},"
+            f"{prefijo}a0:{voltaje_a0:.2f},pH:{pH_compensado:.2f},a1:{voltaje_a1:.2f},O2:{OD_compensado:.2f},"
             f"o_pH_down:{control_ph_down:.2f},o_pH_up:{control_ph_up:.2f},o_O2:{control_o2:.2f},"
             f"T:{temperatura_float:.1f}°C,Error:{errores_udp_str},"
         )
 
 # ==============================
-# ENVIAR DATOS VIA UDP
-# ==============================
-def enviar_datos_udp(voltaje_a0, voltaje_a1, pH_compensado, OD_compensado,
-                     control_ph_down, control_ph_up, control_o2,
-                     pid_ph_up, pid_ph_down, pid_o2, temperatura_float,
-                     tiempo_on_up, tiempo_on_down, tiempo_on_o2, errores_udp_str):
-    """Envía los datos en formato CSV mediante UDP, incluyendo tiempos de activación."""
-    p_up, i_up, d_up = pid_ph_up.components
-    p_down, i_down, d_down = pid_ph_down.components
-    p_o2, i_o2, d_o2 = pid_o2.components
-
-    mensaje = (
-        f"{voltaje_a0:.4f},{pH_compensado:.4f},{voltaje_a1:.4f},{OD_compensado:.4f},"
-        f"{control_ph_down:.2f},{control_ph_up:.2f},{control_o2:.2f},"
-        f"{p_down:.4f},{i_down:.4f},{d_down:.4f},"
-        f"{p_up:.4f},{i_up:.4f},{d_up:.4f},"
-        f"{p_o2:.4f},{i_o2:.4f},{d_o2:.4f},"
-        f"{temperatura_float:.2f},"
-        f"{tiempo_on_down:.3f},{tiempo_on_up:.3f},{tiempo_on_o2:.3f},"
-        f"{errores_udp_str}"
-    ).encode("utf-8")
-
-    try:
-        udp_socket.sendto(mensaje, (UDP_IP, UDP_PORT_GUI))      # Enviar a GUI
-        udp_socket.sendto(mensaje, (UDP_IP, UDP_PORT_LOGGER))   # Enviar al registrador
-    except Exception as e:
-        errores_activos.add(18)
-        print(f"[WARN UDP] No se pudo enviar el paquete: {e}")
-# ==============================
 # ENVIAR DATOS VIA UDP A FLASK
 # ==============================
 def enviar_estado_udp_flask(estado_json):
@@ -602,357 +378,68 @@ def enviar_estado_udp_flask(estado_json):
 
 def notificar_flask(tipo, mensaje):
     """
-    Envía una notificación al servidor Flask de manera segura.
+    Encola una notificación para el servidor Flask (no bloquea: la envía
+    el hilo del notificador, por lotes y con reintentos).
     - tipo: str   → 'seguridad', 'reinicio', 'info', etc.
     - mensaje: str → texto que aparecerá en notificaciones
     """
-    try:
-        requests.post(
-            "http://127.0.0.1:5000/api/notificacion_sistema",
-            json={"tipo": tipo, "mensaje": mensaje},
-            timeout=0.5
-        )
-    except Exception as e:
-        print("[WARN] No se pudo notificar a Flask:", e)
+    if notificador is None:
+        print(f"[WARN] Notificación sin enviar (notificador no iniciado): {tipo}: {mensaje}")
+        return
+    notificador.enviar(tipo, mensaje)
 
 
 # ==============================
 # RECEPCIÓN DE COMANDOS TCP [EXTENDIDA]
 # ==============================
-def escuchar_confirmacion_tcp():
+# Los comandos llegan al hilo de servidor_comandos.py, que valida la
+# sintaxis con interpretar_comando(); el bucle los ejecuta con
+# ejecutar_comando() en escuchar_confirmacion_tcp() y cada cliente recibe
+# {"ok", "comando", "motivo"}. "2:8 1" es el comando "8 1" para el
+# estanque 2; sin prefijo va al ESTANQUE_POR_DEFECTO.
+COMANDOS_CON_VALOR = {"7": float, "8": int, "9": int}   # código → tipo del valor obligatorio
+COMANDOS_VALIDOS = {str(c) for c in range(1, 11)}
+
+def interpretar_comando(texto):
     """
-    Escucha comandos externos por TCP para reanudar o pausar PIDs,
-    y ejecutar acciones manuales seguras mediante códigos numéricos.
-      - 1 = reanudar PID pH
-      - 2 = reanudar PID O2
-      - 3 = reanudar ambos
-      - 4 = desactivar PID pH
-      - 5 = desactivar PID O2
-      - 6 = detener todos los actuadores manuales
-      - 7 <tiempo> = activar aireadores (O2) por <tiempo> segundos
-      - 8 <preset> = dosificar pH↑ (según volumen predefinido)
-      - 9 <preset> = dosificar pH↓ (según volumen predefinido)
+    "[estanque:]codigo [valor]" → (estanque, codigo, valor). Lanza
+    ValueError con el motivo si el estanque o el comando no existen o el
+    valor no tiene el formato esperado.
     """
-    global pid_paused_ph, pid_paused_o2                       # estados de pausa de PIDs
-    global ultimo_ph_up, ultimo_ph_down, bloqueo_seguridad_ph # cooldown y bloqueo seguridad
-    global prev_ph_down, prev_ph_up                     # estados previos para 555
-
-    try:
-        conn = None
+    estanque = ESTANQUE_POR_DEFECTO
+    if ":" in texto:
+        prefijo, texto = texto.split(":", 1)
         try:
-            conn, addr = tcp_socket.accept()   # Acepta conexión entrante (no bloqueante)
-            conn.settimeout(1.0)               # Recv con timeout para evitar bloqueos
-            data = conn.recv(1024)             # Recibe el comando enviado por el cliente
-            if not data:                       # Si no hay datos, cerrar conexión
-                conn.close()
-                return
-            comando = data.decode().strip()    # Convierte los bytes a texto
-            conn.close()                       # Cierra la conexión TCP luego de recibir el comando
-        except BlockingIOError:
-            return
-
-        partes = comando.split()               # Divide el comando en partes (separado por espacios)
-        codigo = partes[0]                     # Toma el codigo de comando 
-        valor = partes[1] if len(partes) > 1 else None # Toma el valor adicional si existe
-        ahora = time.time()                    # tiempo actual
-
-        # --- Reanudar PIDs ---
-        if codigo == "1":
-              if bloqueo_seguridad_ph:
-                  print("[TCP] Ignorado '1' → bloqueo de seguridad pH activo")
-                  return
-              pid_paused_ph = False
-              print("[TCP] Reanudado PID pH (sin bloqueo)")
-
-
-        elif codigo == "2":
-            pid_paused_o2 = False
-            print("[TCP] Reanudado PID O2")
-
-        elif codigo == "3":
-            if bloqueo_seguridad_ph:
-                print("[TCP] Ignorado '3' → bloqueo seguridad pH activo")
-                pid_paused_o2 = False  # pero sí permitimos reactivar O2
-                return
-            pid_paused_ph = False
-            pid_paused_o2 = False
-            print("[TCP] Reanudados ambos PID")
-
-
-        # 4 = Desactivar PID de pH
-        elif codigo == "4":
-            pid_ph_up.auto_mode = False
-            pid_ph_down.auto_mode = False
-            pid_paused_ph = True
-            print("[TCP] PID de pH desactivado manualmente.")
-
-        # 5 = Desactivar PID de O2
-        elif codigo == "5":
-            pid_o2.auto_mode = False
-            pid_paused_o2 = True
-            print("[TCP] PID de O2 desactivado manualmente.")
-
-        # 6 = STOP (parcial o total)
-        elif codigo == "6":
-
-			# Si viene con un parámetro, decidir acción
-            modo = str(valor) if valor is not None else "0"
-
-			# ----------------------------
-			# 6 1 → Detener SOLO aireador
-			# ----------------------------
-            if modo == "1":
-                GPIO.output(RELAY_PIN_O2, GPIO.LOW)
-            # eliminar tareas O2 activas
-                tareas_manual[:] = [t for t in tareas_manual if t["tipo"] != "O2"]
-                print("[MANUAL] Aireadores detenidos (6 1).")
-                return
-
-			# ----------------------------
-			# 6 2 → PARADA DE EMERGENCIA
-			# ----------------------------
-            if modo == "2":
-                GPIO.output(RELAY_PIN_O2, GPIO.LOW)
-                GPIO.output(RELAY_PIN_PH_UP, GPIO.LOW)
-                GPIO.output(RELAY_PIN_PH_DOWN, GPIO.LOW)
-                GPIO.output(GPIO_TRIGGER, GPIO.HIGH)
-                pulso_reset()
-                prev_ph_up = False
-                prev_ph_down = False
-
-                tareas_manual.clear()
-
-                # Mantener PIDs en manual pero quietos
-                pid_o2.auto_mode = False
-                pid_ph_up.auto_mode = False
-                pid_ph_down.auto_mode = False
-
-                pid_paused_o2 = True
-                pid_paused_ph = True
-                
-                notificar_flask("seguridad", "🛑 PARADA DE EMERGENCIA ACTIVADA")
-
-                print("[EMERGENCIA] Parada TOTAL — todos los actuadores apagados (6 2).")
-                return
-
-            # Si el usuario manda solo "6" → tratar como parada total
-            GPIO.output(RELAY_PIN_O2, GPIO.LOW)
-            GPIO.output(RELAY_PIN_PH_UP, GPIO.LOW)
-            GPIO.output(RELAY_PIN_PH_DOWN, GPIO.LOW)
-            GPIO.output(GPIO_TRIGGER, GPIO.HIGH)
-            pulso_reset()
-            
-            prev_ph_up = False
-            prev_ph_down = False
-
-            tareas_manual.clear()
-            pid_o2.auto_mode = False
-            pid_ph_up.auto_mode = False
-            pid_ph_down.auto_mode = False
-
-            pid_paused_o2 = True
-            pid_paused_ph = True
-
-            print("[MANUAL] '6' recibido sin parámetro → parada total por seguridad.")
-
-
-        # 7 = Activar O2 manualmente por <tiempo> segundos
-        elif codigo == "7" and valor:                # Formato de recepción "7 30" para 30 segundos
-            try:
-                tiempo = float(valor)                # Convierte valor a float
-            except:
-                print("[MANUAL] Valor de tiempo inválido para O2.")
-                return
-            tiempo = min(max(tiempo, 0.0), TIEMPO_MAX_O2) # limitar al máximo
-            pid_o2.auto_mode = False                      # desactivar PID O2
-            pid_paused_o2 = True                          # pausar PID O2
-            if any(t["pin"] == RELAY_PIN_O2 for t in tareas_manual): # Verificar si ya hay una tarea activa
-                print("[MANUAL] O2 ya tiene una tarea activa. Comando ignorado.")
-                return
-            tareas_manual.append({
-                "tipo": "O2",                             # tipo de tarea
-                "pin": RELAY_PIN_O2,                      # pin a activar
-                "t_fin": ahora + tiempo                   # tiempo de finalización (tiempo actual + duración)
-            })
-            print(f"[MANUAL] Aireador activado durante {tiempo:.1f} segundos.")
-
-        # 8 = Dosificación pH↑ (preset)
-        elif codigo == "8" and valor: # formato de recepción "8 1" para preset 1
-            if bloqueo_seguridad_ph:  # Verificar si el sistema está bloqueado por seguridad
-                print("[MANUAL] Bloqueo de seguridad pH activo. Comando rechazado.")
-                return
-            try:
-                preset = int(valor)   # convertir a entero
-            except:
-                print("[MANUAL] Preset no válido para pH↑.")
-                return
-            if not (0 <= preset < len(DOSIFICACIONES_PH_UP)):   # Verificar que el numero de preset esté en rango
-                print("[MANUAL] Preset fuera de rango para pH↑.")
-                return
-            if ahora - ultimo_ph_up < COOLDOWN_PH_SEG:          # Verificar cooldown
-                espera = COOLDOWN_PH_SEG - (ahora - ultimo_ph_up)
-                print(f"[MANUAL] pH↑ en enfriamiento ({espera/60:.1f} min restantes).")
-                return
-                
-            # 🔒 Cooldown cruzado – si pH↓ está en cooldown también bloquear
-            if ahora - ultimo_ph_down < COOLDOWN_PH_SEG:
-                espera = COOLDOWN_PH_SEG - (ahora - ultimo_ph_down)
-                print(f"[MANUAL] pH↑ bloqueado por cooldown de pH↓ ({espera/60:.1f} min restantes).")
-                return
-
-            ml = DOSIFICACIONES_PH_UP[preset]          # volumen a dosificar (ml)
-            duracion = ml_a_segundos(ml)               # Convertir ml a segundos
-            pid_ph_up.auto_mode = False                # Desactivar PID de pH↑
-            pid_ph_down.auto_mode = False              # Desactivar PID de pH↓
-            pid_paused_ph = True                       # Pausar PID de pH
-            if any(t["pin"] == RELAY_PIN_PH_UP for t in tareas_manual): # Verificar si ya hay una tarea activa
-                print("[MANUAL] pH↑ ya tiene una tarea activa. Comando ignorado.")
-                return
-            tareas_manual.append({
-                "tipo": "pH↑",                         # Tipo de tarea
-                "pin": RELAY_PIN_PH_UP,                # Pin a activar
-                "t_fin": ahora + duracion              # Tiempo de finalización
-            })
-            ultimo_ph_up = ahora                       # Actualizar tiempo de última dosificación
-            print(f"[MANUAL] pH↑ preset {preset} → {ml:.1f} ml ({duracion:.1f}s).")
-
-        # 9 = Dosificación pH↓ (analogo al anterior) 
-        elif codigo == "9" and valor: 
-            if bloqueo_seguridad_ph:
-                print("[MANUAL] Bloqueo de seguridad pH activo. Comando rechazado.")
-                return
-            try:
-                preset = int(valor)
-            except:
-                print("[MANUAL] Preset no válido para pH↓.")
-                return
-            if not (0 <= preset < len(DOSIFICACIONES_PH_DOWN)):
-                print("[MANUAL] Preset fuera de rango para pH↓.")
-                return
-            if ahora - ultimo_ph_down < COOLDOWN_PH_SEG:
-                espera = COOLDOWN_PH_SEG - (ahora - ultimo_ph_down)
-                print(f"[MANUAL] pH↓ en enfriamiento ({espera/60:.1f} min restantes).")
-                return
-                
-            # Bloqueo cruzado: si pH↑ está en cooldown, bloquear pH↓ también
-            if ahora - ultimo_ph_up < COOLDOWN_PH_SEG:
-                espera = COOLDOWN_PH_SEG - (ahora - ultimo_ph_up)
-                print(f"[MANUAL] pH↓ bloqueado por cooldown de pH↑ ({espera/60:.1f} min restantes).")
-                return
-
-
-            ml = DOSIFICACIONES_PH_DOWN[preset]
-            duracion = ml_a_segundos(ml)
-            pid_ph_up.auto_mode = False
-            pid_ph_down.auto_mode = False
-            pid_paused_ph = True
-            if any(t["pin"] == RELAY_PIN_PH_DOWN for t in tareas_manual):
-                print("[MANUAL] pH↓ ya tiene una tarea activa. Comando ignorado.")
-                return
-            tareas_manual.append({
-                "tipo": "pH↓",
-                "pin": RELAY_PIN_PH_DOWN,
-                "t_fin": ahora + duracion
-            })
-            ultimo_ph_down = ahora
-            print(f"[MANUAL] pH↓ preset {preset} → {ml:.1f} ml ({duracion:.1f}s).")
-            
-        # 10 = Reiniciar sistema de seguridad pH
-        elif codigo == "10":
-            print("[TCP] Reinicio manual del bloqueo de seguridad pH")
-
-            bloqueo_seguridad_ph = False
-            pid_paused_ph = False
-            bloqueo_ph_hasta = 0
-            bloqueo_ph_tipo = ""
-
-            # Reset diario y base
-            monitorear_seguridad_ph.variacion_acumulada = 0.0
-            monitorear_seguridad_ph.ph_base = None  # se recalculará en la próxima lectura
-            monitorear_seguridad_ph.fecha_actual = datetime.now().strftime("%Y-%m-%d")
-            
-            ultimo_ph_down = 0
-            ultimo_ph_up = 0 
+            estanque = int(prefijo)
+        except ValueError:
+            raise ValueError(f"estanque inválido: {prefijo!r}")
+        if estanque not in controladores:
+            raise ValueError(f"estanque desconocido: {estanque}")
+    partes = texto.split()
+    if not partes or partes[0] not in COMANDOS_VALIDOS:
+        raise ValueError(f"comando desconocido: {texto!r}")
+    codigo = partes[0]
+    valor = partes[1] if len(partes) > 1 else None
+    if codigo in COMANDOS_CON_VALOR:
+        if valor is None:
+            raise ValueError(f"el comando {codigo} necesita un valor")
+        try:
+            COMANDOS_CON_VALOR[codigo](valor)
+        except ValueError:
+            raise ValueError(f"valor inválido para el comando {codigo}: {valor!r}")
+    return estanque, codigo, valor
 
-            # También resetear tareas o reset
-            pulso_reset()  # importante para sincronizar relés/555
-            
-            # Notificación a Flask
-            notificar_flask("seguridad", "🟢 PID pH reiniciado manualmente por el usuario")
+def escuchar_confirmacion_tcp():
+    """Ejecuta los comandos TCP que dejó el servidor de comandos (no bloquea)."""
+    if servidor_comandos is not None:
+        servidor_comandos.atender(ejecutar_comando)
 
-    except Exception as e:
-        print(f"[WARN TCP] {e}")
-
-# ==============================
-# ACTUALIZAR ACTUADORES
-# ==============================
-def actualizar_actuadores(control_ph_up, control_ph_down, control_o2,
-                          inicio_ciclo_ph_up, inicio_ciclo_ph_down, inicio_ciclo_o2):
-    """
-    Actualiza los relés de pH↑, pH↓ y O2 según:
-      - Salidas PID (modo automático)
-      - Tareas manuales (si las hay, tienen prioridad y el PID NO toca ese pin)
-    Además, actualiza la lógica del temporizador 555 en base al estado real
-    de los relés de pH.
-    """
-
-    # ---- pH UP ----
-    if not pin_en_tarea_manual(RELAY_PIN_PH_UP):
-        # Solo si NO hay tarea manual para este pin, aplica el PWM del PID
-        inicio_ciclo_ph_up, tiempo_on_up = control_por_tiempo(
-            control_ph_up,
-            inicio_ciclo_ph_up,
-            CICLO_PH_UP,
-            RELAY_PIN_PH_UP,
-            MIN_ACTUACION_PH_UP
-        )
-    else:
-        # Hay una tarea manual activa → NO tocar el pin desde el PID
-        tiempo_on_up = 0.0
-
-    # ---- pH DOWN ----
-    if not pin_en_tarea_manual(RELAY_PIN_PH_DOWN):
-        inicio_ciclo_ph_down, tiempo_on_down = control_por_tiempo(
-            control_ph_down,
-            inicio_ciclo_ph_down,
-            CICLO_PH_DOWN,
-            RELAY_PIN_PH_DOWN,
-            MIN_ACTUACION_PH_DOWN
-        )
-    else:
-        tiempo_on_down = 0.0
-
-    # ---- O2 ----
-    if not pin_en_tarea_manual(RELAY_PIN_O2):
-        inicio_ciclo_o2, tiempo_on_o2 = control_por_tiempo(
-            control_o2,
-            inicio_ciclo_o2,
-            CICLO_O2,
-            RELAY_PIN_O2,
-            MIN_ACTUACION_O2
-        )
-    else:
-        tiempo_on_o2 = 0.0
-
-    # ---------------------------------------------
-    #  LÓGICA DEL 555 (se ejecuta SIEMPRE)
-    #  - Lee el estado real actual de los relés, ya
-    #    sea por manual o por automático.
-    # ---------------------------------------------
-    ph_up_on = GPIO.input(RELAY_PIN_PH_UP) == GPIO.HIGH
-    ph_down_on = GPIO.input(RELAY_PIN_PH_DOWN) == GPIO.HIGH
-
-    logica_temporizador_555(ph_up_on, ph_down_on)
-
-    # Retornar tiempos (como antes)
-    return (
-        inicio_ciclo_ph_up,
-        inicio_ciclo_ph_down,
-        inicio_ciclo_o2,
-        tiempo_on_up,
-        tiempo_on_down,
-        tiempo_on_o2,
-    )
+def ejecutar_comando(estanque, codigo, valor):
+    """Ejecuta el comando en el controlador del estanque (ver ControladorEstanque.ejecutar_comando)."""
+    controlador = controladores.get(estanque)
+    if controlador is None:
+        return False, f"estanque desconocido: {estanque}"
+    return controlador.ejecutar_comando(codigo, valor)
 
 # ==============================
 # FUNCIONES AUXILIARES DEL CONTROL MANUAL Y SEGURIDAD DE pH [NUEVO]
@@ -964,207 +451,18 @@ def ml_a_segundos(ml):
     """
     return (ml / CAUDAL_BOMBA_ML_MIN) * 60.0
 
-def monitorear_seguridad_ph(ph_actual):
-    """
-    Sistema de seguridad continuo:
-      - Detecta variaciones bruscas respecto a un pH_base.
-      - Cada variación >= DELTA_PH_MAX_HORA → bloqueo 1h.
-      - Suma variaciones al acumulado diario.
-      - Si acumulado diario >= DELTA_PH_MAX_DIA → bloqueo 24h.
-      - Reset diario EXACTAMENTE a medianoche.
-    """
-
-    global bloqueo_seguridad_ph, bloqueo_ph_hasta, bloqueo_ph_tipo
-    global pid_paused_ph
-
-    ahora = time.time()
-    fecha_hoy = datetime.now().strftime("%Y-%m-%d")
-
-    # ---------------------------------------------------------
-    # Inicialización persistente (solo primera llamada)
-    # ---------------------------------------------------------
-    if not hasattr(monitorear_seguridad_ph, "ph_base"):
-        monitorear_seguridad_ph.ph_base = ph_actual
-        monitorear_seguridad_ph.fecha_actual = fecha_hoy
-        monitorear_seguridad_ph.variacion_acumulada = 0.0
-        return
-        
-    # Si ph_base fue reiniciado manualmente → recalcular base
-    if monitorear_seguridad_ph.ph_base is None:
-        monitorear_seguridad_ph.ph_base = ph_actual
-        return
-
-    # ---------------------------------------------------------
-    # Calcular variación respecto a pH_base
-    # ---------------------------------------------------------
-    delta = abs(ph_actual - monitorear_seguridad_ph.ph_base)
-    print("delta:", delta, "ph_base:", monitorear_seguridad_ph.ph_base)
-
-    # ---------------------------------------------------------
-    # RESET DIARIO A MEDIANOCHE 
-    # ---------------------------------------------------------
-    if monitorear_seguridad_ph.fecha_actual != fecha_hoy:
-        print("Reset diario automático del acumulado pH")
-        monitorear_seguridad_ph.fecha_actual = fecha_hoy
-        monitorear_seguridad_ph.variacion_acumulada = 0.0
-        notificar_flask("seguridad", "🌙 PID pH reanudado automáticamente por reinicio diario")
-
-    # ---------------------------------------------------------
-    # Si está bloqueado → verificar si ya terminó el bloqueo
-    # ---------------------------------------------------------
-    if bloqueo_seguridad_ph:
-        if ahora >= bloqueo_ph_hasta:
-            print("Bloqueo pH finalizado → reactivando PID")
-            bloqueo_seguridad_ph = False
-            pid_paused_ph = False
-            
-            notificar_flask("seguridad", "🟢 PID pH reanudado automáticamente al finalizar el bloqueo")
-
-            # El pH actual pasa a ser el nuevo pH base
-            monitorear_seguridad_ph.ph_base = ph_actual
-
-        return
-
-    # ---------------------------------------------------------
-    # 1) Variación brusca → bloqueo 1 hora
-    # ---------------------------------------------------------
-    if delta >= DELTA_PH_MAX_HORA:
-        print(f"Variación brusca: ΔpH={delta:.2f} → bloqueo 1h")
-
-        bloqueo_seguridad_ph = True
-        bloqueo_ph_hasta = ahora + 3600  # 1 hora
-        bloqueo_ph_tipo = "hora"
-        pid_paused_ph = True
-        
-        notificar_flask("seguridad", "⚠️ PID pH bloqueado 1 hora por variación brusca del pH")
-
-        # Sumar variación al acumulado diario
-        monitorear_seguridad_ph.variacion_acumulada += delta
-
-        return
-
-    # ---------------------------------------------------------
-    # 2) Variación acumulada diaria → bloqueo 24h
-    # ---------------------------------------------------------
-    if monitorear_seguridad_ph.variacion_acumulada >= DELTA_PH_MAX_DIA:
-        print(f"Límite diario superado: Δacum={monitorear_seguridad_ph.variacion_acumulada:.2f} → bloqueo 24h")
-
-        bloqueo_seguridad_ph = True
-        bloqueo_ph_hasta = ahora + 86400  # 24 horas
-        bloqueo_ph_tipo = "dia"
-        pid_paused_ph = True
-        
-        notificar_flask("seguridad", "⛔ PID pH bloqueado 24 horas por exceso de variación diaria")
-
-
-        return
-
-
-# ==============================
-# PROCESADOR DE TAREAS MANUALES (NO BLOQUEANTE) [NUEVO]
-# ==============================
-def procesar_tareas_manuales(tiempo_actual):
-    """
-    Supervisa las tareas manuales activas.
-    Si el tiempo de activación ha finalizado, apaga el relé correspondiente.
-    Mientras una tarea esté activa, el PID asociado permanece desactivado.
-    """
-    global tareas_manual
-
-    tareas_activas = []          # Lista temporal para mantener solo las tareas en curso
-
-    for tarea in tareas_manual:  # Recorre las tareas activas
-        tipo = tarea["tipo"]     # 'pH_UP', 'pH_DOWN' o 'O2'
-        pin = tarea["pin"]       # Pin GPIO asociado
-        fin = tarea["t_fin"]     # Tiempo de finalización
-
-        # Si el relé aún no está encendido
-        ''' 
-        Solo se ejecuta una vez por tarea en el primer ciclo despues de 
-        crearla, en los siguientes ciclos el rele ya esta activado, asi 
-        que esta linea se salta automaticamente
-        '''
-        if GPIO.input(pin) == GPIO.LOW: 
-            GPIO.output(pin, GPIO.HIGH)
-            print(f"[MANUAL] {tipo} activado.")
-
-        # Verifica si ya transcurrió el tiempo asignado
-        '''
-        Si ya paso el tiempo, se apaga el rele y se imprime finalizado 
-        '''
-        if tiempo_actual >= fin:
-            GPIO.output(pin, GPIO.LOW)
-            print(f"[MANUAL] {tipo} finalizado.")
-        else:
-            tareas_activas.append(tarea) # si todavia no terminó se vuelve a guardar en tareas_activas
-
-    tareas_manual = tareas_activas  # Actualiza la lista con las tareas que siguen en ejecución
-
-# ==============================
-# GESTIONAR PIDS SEGUN ERRORES
-# ==============================
-def gestionar_pids_por_error(errores_activos):
-    global pid_paused_ph, pid_paused_o2
-    global prev_ph_up, prev_ph_down
-    errores_ph = {1, 4, 7, 11} 
-    errores_o2 = {2, 5, 8, 12}
-    errores_temp = {3, 6, 9, 10}
-
-    # --- pH ---
-    if errores_activos & errores_ph:
-        pid_ph_up.auto_mode = False
-        pid_ph_down.auto_mode = False
-        GPIO.output(RELAY_PIN_PH_UP, GPIO.LOW)
-        GPIO.output(RELAY_PIN_PH_DOWN, GPIO.LOW)
-        GPIO.output(GPIO_TRIGGER, GPIO.HIGH)
-        pulso_reset()
-        prev_ph_up = False
-        prev_ph_down = False
-        pid_paused_ph = True
-    elif not pid_paused_ph:
-        pid_ph_up.auto_mode = True
-        pid_ph_down.auto_mode = True
-
-    # --- O2 ---
-    if errores_activos & errores_o2:
-        pid_o2.auto_mode = False
-        GPIO.output(RELAY_PIN_O2, GPIO.LOW)
-        GPIO.output(GPIO_TRIGGER, GPIO.HIGH)
-        pulso_reset()
-        prev_ph_down = False
-        prev_ph_up = False
-        pid_paused_o2 = True
-    elif not pid_paused_o2:
-        pid_o2.auto_mode = True
-
-    # --- Temperatura ---
-    if errores_activos & errores_temp:
-        pid_ph_up.auto_mode = False
-        pid_ph_down.auto_mode = False
-        pid_o2.auto_mode = False
-        GPIO.output(RELAY_PIN_PH_UP, GPIO.LOW)
-        GPIO.output(RELAY_PIN_PH_DOWN, GPIO.LOW)
-        GPIO.output(RELAY_PIN_O2, GPIO.LOW)
-        GPIO.output(GPIO_TRIGGER, GPIO.HIGH)
-        pulso_reset()
-        prev_ph_up = False
-        prev_ph_down = False
-        pid_paused_ph = True
-        pid_paused_o2 = True
-
 # ==============================
-# DETECCIÓN DE FALLOS EN SENSORES 
+# DETECCIÓN DE FALLOS EN SENSORES
 # (inválidos → rango → congelado → fluctuación → coherencia)
 # ==============================
-codigo_error_actual = 0                                  # 0 = sin error
-
 def _es_num(x):                                          # verifica si x es un número válido (no None, no NaN)
     return isinstance(x, (int, float)) and not (x != x)  # descarta NaN
 
-def verificar_sensores(pH, OD, T):
+def verificar_sensores(pH, OD, T, st):
     """
     Retorna un conjunto de códigos de error activos (pudiendo coexistir varios).
     Ejemplo: {4, 5} si fallan simultáneamente los sensores de pH y O2.
+    st: dict del estanque donde se guarda el estado entre llamadas.
     Mecanismos:
       1) Rango físico válido
       2) Lecturas inválidas consecutivas (None/NaN)
@@ -1174,7 +472,6 @@ def verificar_sensores(pH, OD, T):
       6) Fluctuación anómala (sensor desconectado)
     """
     errores = set()                    # conjunto de errores activos
-    st = verificar_sensores.__dict__   # almacena estado entre llamadas
 
     # --- Límites físicos ---
     PH_MIN, PH_MAX = 0.0, 14.0  # rango pH válido
@@ -1192,11 +489,15 @@ def verificar_sensores(pH, OD, T):
 
     # --- Estado persistente (historial y contadores) ---
     if "hist" not in st:                            # inicialización única
-        st["hist"] = {"pH": [], "O2": [], "T": []}  # historial de lecturas
+        st["hist"] = {                              # historial de lecturas (buffers circulares)
+            "pH": VentanaMovil(N_HIST),
+            "O2": VentanaMovil(N_HIST),
+            "T":  VentanaMovil(N_HIST_T),
+        }
         st["bad"]  = {"pH": 0,  "O2": 0,  "T": 0}   # contadores de inválidos consecutivos
 
     # --- Mecanismo 5 + 2: None/NaN e inválidos consecutivos ---
-    for name, val in (("pH", pH), ("O2", OD), ("T", T)): 
+    for name, val in (("pH", pH), ("O2", OD), ("T", T)):
         if not _es_num(val):             # None o NaN -> suma contador
             st["bad"][name] += 1         # contador de inválidos consecutivos
         else:
@@ -1225,44 +526,40 @@ def verificar_sensores(pH, OD, T):
         errores.add(3)  # T fuera de rango
 
     # --- Mecanismo 3: Valor "congelado" (solo pH y O2; T excluida) ---
-    st["hist"]["pH"].append(pH)
-    st["hist"]["O2"].append(OD)
-    st["hist"]["T"].append(T)
-    if len(st["hist"]["pH"]) > N_HIST: st["hist"]["pH"].pop(0) 
-    if len(st["hist"]["O2"]) > N_HIST: st["hist"]["O2"].pop(0)
-    if len(st["hist"]["T"])  > N_HIST_T: st["hist"]["T"].pop(0)
-
-    if len(st["hist"]["pH"]) == N_HIST:
-        if (max(st["hist"]["pH"]) - min(st["hist"]["pH"])) < VAR_MIN_PH: # se calcula la diferencia max-min
+    h_ph, h_o2, h_t = st["hist"]["pH"], st["hist"]["O2"], st["hist"]["T"]
+    h_ph.agregar(pH)                    # O(1): descarta la muestra más antigua si está lleno
+    h_o2.agregar(OD)
+    h_t.agregar(T)
+
+    if h_ph.lleno():
+        if (h_ph.maximo() - h_ph.minimo()) < VAR_MIN_PH:   # diferencia max-min rodante
             errores.add(7)  # pH "congelado"
 
-    if len(st["hist"]["O2"]) == N_HIST:
-        if (max(st["hist"]["O2"]) - min(st["hist"]["O2"])) < VAR_MIN_O2: # se calcula la diferencia max-min
+    if h_o2.lleno():
+        if (h_o2.maximo() - h_o2.minimo()) < VAR_MIN_O2:   # diferencia max-min rodante
             errores.add(8)  # O2 "congelado"
 
-    if len(st["hist"]["T"]) == N_HIST_T:
-        if (max(st["hist"]["T"]) - min(st["hist"]["T"])) < VAR_MIN_T:    # se calcula la diferencia max-min
+    if h_t.lleno():
+        if (h_t.maximo() - h_t.minimo()) < VAR_MIN_T:      # diferencia max-min rodante
             errores.add(9)  # T "congelada"
 
     # --- Mecanismo 6: Fluctuación anómala (sensor desconectado) ---
     # Si la desviación estándar en la ventana supera un umbral, se asume entrada flotante
     try:
-        if len(st["hist"]["pH"]) >= 10:
-            std_ph = statistics.pstdev(st["hist"]["pH"])
-            if std_ph > FLUC_UMBRAL_PH:     # Umbral de fluctuación anómala (ajustable)
-                errores.add(11)             # Fluctuación anómala pH
-
-        if len(st["hist"]["O2"]) >= 10:
-            std_o2 = statistics.pstdev(st["hist"]["O2"])
-            if std_o2 > FLUC_UMBRAL_O2:     # Umbral de fluctuación anómala (ajustable)
-                errores.add(12)             # Fluctuación anómala O2
+        if len(h_ph) >= 10:
+            if h_ph.desviacion_supera(FLUC_UMBRAL_PH):  # Umbral de fluctuación anómala (ajustable)
+                errores.add(11)                         # Fluctuación anómala pH
+
+        if len(h_o2) >= 10:
+            if h_o2.desviacion_supera(FLUC_UMBRAL_O2):  # Umbral de fluctuación anómala (ajustable)
+                errores.add(12)                         # Fluctuación anómala O2
     except statistics.StatisticsError:
         pass
 
     # --- Mecanismo 4: Coherencia física básica ---
     # Regla simple: si T sube y O2 sube más de 10% respecto a la lectura previa -> inconsistente
-    if len(st["hist"]["T"]) >= 2 and len(st["hist"]["O2"]) >= 2:
-        if T > st["hist"]["T"][-2] and OD > (st["hist"]["O2"][-2] * 1.10):
+    if len(h_t) >= 2 and len(h_o2) >= 2:
+        if T > h_t[-2] and OD > (h_o2[-2] * 1.10):
             errores.add(10)  # incoherencia T/OD
 
     # --- Sin error ---
@@ -1286,7 +583,7 @@ def filtrar_errores_prioritarios(errores):
 
     # --- Si hay error DS18B20, mantiene solo ese y los de comunicación ---
     '''
-        -Si hay un error de DS18B20 mientras que hay errores secundarios se conserva 
+        -Si hay un error de DS18B20 mientras que hay errores secundarios se conserva
         con ellos en el conjunto de errores activos.
     '''
     if 17 in errores:
@@ -1294,7 +591,7 @@ def filtrar_errores_prioritarios(errores):
 
     # --- Si hay errores de sensores (pH, O₂, T), se mantienen simultáneos ---
     '''
-        -Si existen errores simultáneos de sensores, se mantienen, 
+        -Si existen errores simultáneos de sensores, se mantienen,
         excepto en los casos de redundancia (1 y 11) o (2 y 12).
     '''
     sensores = {1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12} & errores # Solo devuelve los errores de sensores
@@ -1316,175 +613,1016 @@ def filtrar_errores_prioritarios(errores):
 
     # --- Mantener errores de comunicación secundarios ---
     '''
-        -Si hay errores secundarios de forma simultanea se mantienen en 
+        -Si hay errores secundarios de forma simultanea se mantienen en
         el conjunto de errores activos.
     '''
     secundarios = {18, 19, 20} & errores  # Si hay simultáneamente errores de comunicación se mantienen
 
-    return sensores | secundarios 
+    return sensores | secundarios
 
 # ==============================
-# BUCLE PRINCIPAL 
+# CONTROLADOR DE UN ESTANQUE
 # ==============================
-acumulador = {canal: 0 for canal in CANALES}
-contador = 0
-voltaje_suavizado = {canal: None for canal in CANALES}
-ultima_actividad = time.time()       # Inicializar watchdog interno
-try:
-    while True:
-        t0 = time.time()             # marca temporal inicio de ciclo
-        escuchar_confirmacion_tcp()  # Revisa si llegó alguna orden externa de reanudación
-        # --- Reconexión preventiva si 'ser' está caído ---
-        if ser is None:
-            print("[WARN] Serial no disponible. Intentando reconectar...")
-            ser = conectar_serial()
-            if ser is None:
-                time.sleep(2)
-                continue  # reintentar sin caer
-            else:
-                errores_activos.clear()  # puerto reconectado, limpiar errores
+class ControladorEstanque:
+    """
+    Todo el estado de control de un estanque: PIDs, pausas, errores,
+    tareas manuales, bloqueo de seguridad de pH, lectores de serial y
+    temperatura, y su publicador de estado. bucle_principal() llama a
+    paso() de cada estanque en cada pasada.
+    """
 
-        # --- Acceso seguro a in_waiting ---
-        try:
-            if ser.in_waiting > 150:
-                print(f"[WARN] Buffer saturado ({ser.in_waiting} bytes). Reiniciando buffer...")
-                ser.reset_input_buffer()
-        except (AttributeError, serial.SerialException, OSError) as e:
-            # Algo pasó con el puerto; marcamos error y forzamos reconexión
-            errores_activos.add(15)
-            print(f"[ERROR] Acceso a puerto serial: {e}. Forzando reconexión...")
-            # --- Desactivar PIDs ante error crítico de comunicación ---
+    def __init__(self, config):
+        self.numero = config["numero"]
+        self.puerto_serial = config["serial"]
+        self.pin_ph_up = config["pin_ph_up"]
+        self.pin_ph_down = config["pin_ph_down"]
+        self.pin_o2 = config["pin_o2"]
+        self.pin_trigger = config["pin_trigger"]
+        self.pin_reset = config["pin_reset"]
+        self.id_sensor_temperatura = config.get("sensor_temperatura")   # None = el único DS18B20 del bus
+        self.setpoint_ph = config.get("setpoint_ph", SETPOINT_pH)
+        self.setpoint_o2 = config.get("setpoint_o2", setpoint_o2)
+        self.pid_o2, self.pid_ph_up, self.pid_ph_down = crear_pids(self.setpoint_ph, self.setpoint_o2)
+
+        self.errores_activos = set(errores_sistema)  # conjunto de códigos de error activos
+        self.codigo_error_actual = 0                 # último código de error enviado o registrado
+
+        # --- Estados de pausa manual de PIDs ---
+        self.pid_paused_ph = False      # True = PID pH detenido hasta confirmacion externa
+        self.pid_paused_o2 = False      # True = PID O2 detenido hasta confirmacion externa
+
+        # Estados previos de los relés de pH para detectar flancos del 555 (inicialmente LOW)
+        self.prev_ph_up = False
+        self.prev_ph_down = False
+
+        # --- Control manual y seguridad de pH ---
+        self.tareas_manual = []                 # Lista de acciones manuales pendientes o en curso
+        self.ultimo_ph_up = 0.0                 # Hora (timestamp) de la última dosificación pH↑
+        self.ultimo_ph_down = 0.0               # Hora (timestamp) de la última dosificación pH↓
+        self.bloqueo_seguridad_ph = False       # True = Bloqueo por exceso de variación de pH
+        self.bloqueo_ph_hasta = 0               # timestamp futuro para desbloquear
+        self.bloqueo_ph_tipo = ""               # puede tomar valores como hora o dia
+        self.ph_base = None                     # pH de referencia de monitorear_seguridad_ph()
+        self.fecha_actual = None                # None hasta la primera lectura
+        self.variacion_acumulada = 0.0
+        self.estado_sensores = {}               # historial y contadores de verificar_sensores()
+
+        self.inicio_ciclo_ph_up = 0.0           # se fijan con el reloj del hardware en iniciar()
+        self.inicio_ciclo_ph_down = 0.0
+        self.inicio_ciclo_o2 = 0.0
+
+        self.secuencia_telemetria = 0           # número de datagrama de telemetría (detecta pérdidas)
+        self.lector_serial = None               # hilo lector: adquisición, marca de tiempo y reconexión
+        self.lector_temperatura = None          # hilo que muestrea el DS18B20
+        self.publicador_estado = None           # estado a Flask solo con cambios
+        self.procesador = None
+        self.ultima_actividad = 0.0             # watchdog interno
+        self.serial_disponible = False          # para actuar solo en el cambio conectado ↔ caído
+        self.ultimo_aviso_serial = None
+        self.pausa_hasta = 0.0                  # tras una excepción el estanque espera 0.5 s
+
+    # ------------------------------
+    # ARRANQUE Y PARADA
+    # ------------------------------
+    def iniciar(self):
+        """Abre sensores, relés y puerto serial del estanque (después de configurar hw)."""
+        for pid in (self.pid_o2, self.pid_ph_up, self.pid_ph_down):
+            pid.time_fn = reloj.monotonic        # simple_pid mide dt con el reloj del hardware
+        self.publicador_estado = PublicadorEstado(enviar_estado_udp_flask, reloj, estanque=self.numero)
+
+        self.lector_temperatura = LectorTemperatura(hw.sensor_temperatura(self.id_sensor_temperatura), reloj,
+                                                    TEMP_READ_INTERVAL, sincronico=hw.tiempo_virtual)
+        self.lector_temperatura.iniciar()
+
+        self.configurar_gpio()
+        self.pulso_reset()                       # Resetea al iniciar
+
+        # Con reloj virtual no hay hilo: el bucle lee el puerto en cada drenar()
+        self.lector_serial = LectorSerial(self.abrir_puerto_serial, reloj, PROTOCOLO_SERIAL,
+                                          sincronico=hw.tiempo_virtual)
+        self.lector_serial.iniciar()
+
+        self.inicio_ciclo_ph_up = self.inicio_ciclo_ph_down = self.inicio_ciclo_o2 = reloj.time()
+
+    def preparar(self):
+        """Estado del bucle que se reinicia en cada llamada a bucle_principal()."""
+        self.procesador = ProcesadorADC(self.muestras_por_promedio(),
+                                        [CONVERSION_FACTOR[canal] for canal in CANALES],
+                                        ALPHA_SUAVIZADO)
+        self.ultima_actividad = reloj.time()     # Inicializar watchdog interno
+        self.serial_disponible = self.lector_serial.conectado()
+        self.ultimo_aviso_serial = None
+
+    def detener(self):
+        if self.lector_serial:
+            self.lector_serial.detener()
+        if self.lector_temperatura:
+            self.lector_temperatura.detener()
+
+    def notificar(self, tipo, mensaje):
+        """notificar_flask() con el número de estanque si hay más de uno."""
+        if len(controladores) > 1:
+            mensaje = f"Estanque {self.numero}: {mensaje}"
+        notificar_flask(tipo, mensaje)
+
+    # ------------------------------
+    # FUNCIONES SERIAL
+    # ------------------------------
+    def abrir_puerto_serial(self):
+        """Abre el puerto del Arduino (lo llama el hilo lector; lanza excepción si falla)."""
+        conexion = hw.abrir_serial(self.puerto_serial, BAUD_RATE, timeout=0.1)
+        print(f"[OK] Puerto serial abierto: {self.puerto_serial} a {BAUD_RATE} bps")
+        return conexion
+
+    def muestras_por_promedio(self):
+        """Muestras a promediar según el formato detectado."""
+        return N_MUESTRAS_BINARIO if self.lector_serial.parser.modo == "binario" else N_MUESTRAS
+
+    # ------------------------------
+    # FUNCIONES DE TEMPERATURA
+    # ------------------------------
+    def leer_temperatura_cached(self):
+        """Última temperatura publicada por el hilo lector (no bloquea el bucle)."""
+        valor, _ = self.lector_temperatura.ultima()
+        return TEMP_POR_DEFECTO if valor is None else valor
+
+    def temperatura_vencida(self):
+        """True si no hay lectura del DS18B20 o la última es más vieja que TEMP_MAX_EDAD."""
+        valor, edad = self.lector_temperatura.ultima()
+        return valor is None or edad > TEMP_MAX_EDAD
+
+    # ------------------------------
+    # ACTUALIZAR PID (PID Y CONTROL)
+    # ------------------------------
+    def actualizar_pid(self, pH_compensado, OD_compensado):
+        pid_ph_up, pid_ph_down, pid_o2 = self.pid_ph_up, self.pid_ph_down, self.pid_o2
+
+        # --- pH subida ---
+        error_up = self.setpoint_ph - pH_compensado
+        if self.pid_paused_ph:
             pid_ph_up.auto_mode = False
+            control_ph_up = 0
+        else:
+            if abs(error_up) <= DEADBAND_PH:
+                pid_ph_up.auto_mode = False
+                control_ph_up = 0
+            elif error_up > 0:
+                pid_ph_up.auto_mode = True
+                pid_ph_down.auto_mode = False
+                control_ph_up = pid_ph_up(pH_compensado)
+            else:
+                pid_ph_up.auto_mode = False
+                control_ph_up = 0
+
+        # --- pH bajada ---
+        error_down = pH_compensado - self.setpoint_ph
+        if self.pid_paused_ph:
             pid_ph_down.auto_mode = False
+            control_ph_down = 0
+        else:
+            if abs(error_down) <= DEADBAND_PH:
+                pid_ph_down.auto_mode = False
+                control_ph_down = 0
+            elif error_down > 0:
+                pid_ph_down.auto_mode = True
+                pid_ph_up.auto_mode = False
+                control_ph_down = pid_ph_down(pH_compensado)
+            else:
+                pid_ph_down.auto_mode = False
+                control_ph_down = 0
+
+        # --- O2 ---
+        if self.pid_paused_o2:
             pid_o2.auto_mode = False
-            GPIO.output(RELAY_PIN_PH_UP, GPIO.LOW)
-            GPIO.output(RELAY_PIN_PH_DOWN, GPIO.LOW)
-            GPIO.output(RELAY_PIN_O2, GPIO.LOW)
-            GPIO.output(GPIO_TRIGGER, GPIO.HIGH)
-            pulso_reset()
-            prev_ph_up = False
-            prev_ph_down = False
-            try:
-                ser.close()
-            except:
-                pass
-            ser = None
-
-            errores_filtrados = filtrar_errores_prioritarios(errores_activos)
-            errores_udp_str = "|".join(str(e) for e in sorted(errores_filtrados))
-            try:
-                enviar_datos_udp(
-                    0, 0, 0, 0,    # voltajes y lecturas nulas
-                    0, 0, 0,       # controles
-                    pid_ph_up, pid_ph_down, pid_o2,
-                    25.0,          # temperatura dummy
-                    0, 0, 0,       # tiempos de actuación
-                    errores_udp_str
-                )
-            except:
-                pass
-            time.sleep(2)
-            continue  # seguir vivo, reintentar
-
-        # --- Resto de la iteración protegido ---
+            control_o2 = 0
+        else:
+            if abs(OD_compensado - self.setpoint_o2) <= DEADBAND_O2:
+                pid_o2.auto_mode = False
+                control_o2 = 0
+            else:
+                pid_o2.auto_mode = True
+                control_o2 = pid_o2(OD_compensado)
+
+        return control_ph_down, control_ph_up, control_o2
+
+    # ------------------------------
+    # PINS RELES Y LÓGICA 555 – FLANCOS PARA TRIGGER Y RESET
+    # ------------------------------
+    def configurar_gpio(self):
+        GPIO.setmode(GPIO.BCM)
+        GPIO.setup(self.pin_ph_up, GPIO.OUT)
+        GPIO.setup(self.pin_ph_down, GPIO.OUT)
+        GPIO.setup(self.pin_o2, GPIO.OUT)
+
+        GPIO.setup(self.pin_trigger, GPIO.OUT)
+        GPIO.setup(self.pin_reset, GPIO.OUT)
+
+        # Estado inicial seguro (todo apagado / sin disparar)
+        GPIO.output(self.pin_ph_up, GPIO.LOW)
+        GPIO.output(self.pin_ph_down, GPIO.LOW)
+        GPIO.output(self.pin_o2, GPIO.LOW)
+
+        # El 555 está en reposo con TRIGGER y RESET en HIGH
+        GPIO.output(self.pin_trigger, GPIO.HIGH)
+        GPIO.output(self.pin_reset, GPIO.HIGH)
+
+    def pulso_trigger(self):
+        """Envía un pulso corto al TRIGGER (flanco descendente)."""
+        GPIO.output(self.pin_trigger, GPIO.LOW)
+        reloj.sleep(0.03)
+        GPIO.output(self.pin_trigger, GPIO.HIGH)
+
+    def pulso_reset(self):
+        """Envía un pulso corto al RESET (flanco descendente)."""
+        GPIO.output(self.pin_reset, GPIO.LOW)
+        reloj.sleep(0.03)
+        GPIO.output(self.pin_reset, GPIO.HIGH)
+
+    def logica_temporizador_555(self, ph_up_on, ph_down_on):
+        """
+        Detecta flancos ascendentes y descendentes en pH Up y pH Down.
+        Maneja TRIGGER y RESET del 555 según la lógica real del circuito.
+        """
+        # --- Señales actuales ---
+        current_up = ph_up_on     # True o False
+        current_down = ph_down_on
+
+        # ========================================
+        #   1) FLANCO ASCENDENTE → RESET
+        # ========================================
+        if current_up and not self.prev_ph_up:
+            self.pulso_reset()
+
+        if current_down and not self.prev_ph_down:
+            self.pulso_reset()
+
+        # ========================================
+        #   2) FLANCO DESCENDENTE → TRIGGER
+        # ========================================
+        if self.prev_ph_up and not current_up:
+            self.pulso_trigger()
+
+        if self.prev_ph_down and not current_down:
+            self.pulso_trigger()
+
+        # Actualizar estados previos
+        self.prev_ph_up = current_up
+        self.prev_ph_down = current_down
+
+    def apagar_actuadores(self, ph=True, o2=True):
+        """Relés en LOW, 555 a reposo y flancos olvidados (errores, serial caído, parada)."""
+        if ph:
+            GPIO.output(self.pin_ph_up, GPIO.LOW)
+            GPIO.output(self.pin_ph_down, GPIO.LOW)
+        if o2:
+            GPIO.output(self.pin_o2, GPIO.LOW)
+        GPIO.output(self.pin_trigger, GPIO.HIGH)
+        self.pulso_reset()
+        self.prev_ph_up = False
+        self.prev_ph_down = False
+
+    # ------------------------------
+    # CICLOS Y UMBRALES DE ACTUACION
+    # ------------------------------
+    def pin_en_tarea_manual(self, pin):
+        """
+        Devuelve True si el pin está siendo usado por alguna tarea manual
+        (pH↑, pH↓ u O2).
+        """
+        return any(t["pin"] == pin for t in self.tareas_manual)
+
+    def control_por_tiempo(self, salida_pid, inicio_ciclo, ciclo, pin, min_actuacion=0.0):
+        """
+        Controla el relé por tiempo proporcional a la salida PID.
+        Devuelve el nuevo inicio de ciclo y el tiempo de activación (s).
+        """
         try:
-            lectura = leer_linea_ultima()
-            if lectura is None:
-                time.sleep(DELAY_MUESTREO)
-                continue
+            tiempo_on = (salida_pid / 100.0) * ciclo
+            if tiempo_on < min_actuacion:
+                tiempo_on = 0
+            tiempo_transcurrido = reloj.time() - inicio_ciclo
+            if tiempo_transcurrido >= ciclo:
+                inicio_ciclo += ciclo
+                tiempo_transcurrido -= ciclo
+            if tiempo_transcurrido < tiempo_on:
+                GPIO.output(pin, GPIO.HIGH)
+            else:
+                GPIO.output(pin, GPIO.LOW)
+            return inicio_ciclo, tiempo_on
+        except Exception as e:
+            self.errores_activos.add(19)
+            print(f"[ERROR GPIO] {e}")
+            return inicio_ciclo, 0
+
+    # ------------------------------
+    # COMANDOS
+    # ------------------------------
+    def ejecutar_comando(self, codigo, valor):
+        """
+        Ejecuta un comando externo para reanudar o pausar PIDs, o una acción
+        manual segura. Devuelve (ok, motivo) para responder al cliente.
+          - 1 = reanudar PID pH
+          - 2 = reanudar PID O2
+          - 3 = reanudar ambos
+          - 4 = desactivar PID pH
+          - 5 = desactivar PID O2
+          - 6 = detener todos los actuadores manuales
+          - 7 <tiempo> = activar aireadores (O2) por <tiempo> segundos
+          - 8 <preset> = dosificar pH↑ (según volumen predefinido)
+          - 9 <preset> = dosificar pH↓ (según volumen predefinido)
+          - 10 = reiniciar sistema de seguridad pH
+        """
+        ahora = reloj.time()                    # tiempo actual
+
+        # --- Reanudar PIDs ---
+        if codigo == "1":
+            if self.bloqueo_seguridad_ph:
+                print("[TCP] Ignorado '1' → bloqueo de seguridad pH activo")
+                return False, "bloqueo de seguridad pH activo"
+            self.pid_paused_ph = False
+            print("[TCP] Reanudado PID pH (sin bloqueo)")
+            return True, "PID pH reanudado"
+
+        elif codigo == "2":
+            self.pid_paused_o2 = False
+            print("[TCP] Reanudado PID O2")
+            return True, "PID O2 reanudado"
+
+        elif codigo == "3":
+            if self.bloqueo_seguridad_ph:
+                print("[TCP] Ignorado '3' → bloqueo seguridad pH activo")
+                self.pid_paused_o2 = False  # pero sí permitimos reactivar O2
+                return True, "PID O2 reanudado; pH sigue con bloqueo de seguridad"
+            self.pid_paused_ph = False
+            self.pid_paused_o2 = False
+            print("[TCP] Reanudados ambos PID")
+            return True, "PID pH y O2 reanudados"
+
+        # 4 = Desactivar PID de pH
+        elif codigo == "4":
+            self.pid_ph_up.auto_mode = False
+            self.pid_ph_down.auto_mode = False
+            self.pid_paused_ph = True
+            print("[TCP] PID de pH desactivado manualmente.")
+            return True, "PID pH desactivado"
+
+        # 5 = Desactivar PID de O2
+        elif codigo == "5":
+            self.pid_o2.auto_mode = False
+            self.pid_paused_o2 = True
+            print("[TCP] PID de O2 desactivado manualmente.")
+            return True, "PID O2 desactivado"
+
+        # 6 = STOP (parcial o total)
+        elif codigo == "6":
+
+            # Si viene con un parámetro, decidir acción
+            modo = str(valor) if valor is not None else "0"
+
+            # ----------------------------
+            # 6 1 → Detener SOLO aireador
+            # ----------------------------
+            if modo == "1":
+                GPIO.output(self.pin_o2, GPIO.LOW)
+                # eliminar tareas O2 activas
+                self.tareas_manual[:] = [t for t in self.tareas_manual if t["tipo"] != "O2"]
+                print("[MANUAL] Aireadores detenidos (6 1).")
+                return True, "aireadores detenidos"
+
+            # ----------------------------
+            # 6 2 → PARADA DE EMERGENCIA
+            # ----------------------------
+            if modo == "2":
+                self.apagar_actuadores()
+                self.tareas_manual.clear()
+
+                # Mantener PIDs en manual pero quietos
+                self.pid_o2.auto_mode = False
+                self.pid_ph_up.auto_mode = False
+                self.pid_ph_down.auto_mode = False
+
+                self.pid_paused_o2 = True
+                self.pid_paused_ph = True
+
+                self.notificar("seguridad", "🛑 PARADA DE EMERGENCIA ACTIVADA")
+
+                print("[EMERGENCIA] Parada TOTAL — todos los actuadores apagados (6 2).")
+                return True, "parada de emergencia: todos los actuadores apagados"
+
+            # Si el usuario manda solo "6" → tratar como parada total
+            self.apagar_actuadores()
+
+            self.tareas_manual.clear()
+            self.pid_o2.auto_mode = False
+            self.pid_ph_up.auto_mode = False
+            self.pid_ph_down.auto_mode = False
+
+            self.pid_paused_o2 = True
+            self.pid_paused_ph = True
+
+            print("[MANUAL] '6' recibido sin parámetro → parada total por seguridad.")
+            return True, "parada total"
+
+        # 7 = Activar O2 manualmente por <tiempo> segundos
+        elif codigo == "7":                          # Formato de recepción "7 30" para 30 segundos
+            tiempo = float(valor)                    # ya validado en interpretar_comando
+            tiempo = min(max(tiempo, 0.0), TIEMPO_MAX_O2) # limitar al máximo
+            self.pid_o2.auto_mode = False                 # desactivar PID O2
+            self.pid_paused_o2 = True                     # pausar PID O2
+            if self.pin_en_tarea_manual(self.pin_o2):     # Verificar si ya hay una tarea activa
+                print("[MANUAL] O2 ya tiene una tarea activa. Comando ignorado.")
+                return False, "el aireador ya tiene una tarea activa"
+            self.tareas_manual.append({
+                "tipo": "O2",                             # tipo de tarea
+                "pin": self.pin_o2,                       # pin a activar
+                "t_fin": ahora + tiempo                   # tiempo de finalización (tiempo actual + duración)
+            })
+            print(f"[MANUAL] Aireador activado durante {tiempo:.1f} segundos.")
+            return True, f"aireador activado {tiempo:.1f} s"
+
+        # 8 = Dosificación pH↑ (preset)
+        elif codigo == "8": # formato de recepción "8 1" para preset 1
+            if self.bloqueo_seguridad_ph:  # Verificar si el sistema está bloqueado por seguridad
+                print("[MANUAL] Bloqueo de seguridad pH activo. Comando rechazado.")
+                return False, "bloqueo de seguridad pH activo"
+            preset = int(valor)   # ya validado en interpretar_comando
+            if not (0 <= preset < len(DOSIFICACIONES_PH_UP)):   # Verificar que el numero de preset esté en rango
+                print("[MANUAL] Preset fuera de rango para pH↑.")
+                return False, "preset fuera de rango para pH↑"
+            if ahora - self.ultimo_ph_up < COOLDOWN_PH_SEG:     # Verificar cooldown
+                espera = COOLDOWN_PH_SEG - (ahora - self.ultimo_ph_up)
+                print(f"[MANUAL] pH↑ en enfriamiento ({espera/60:.1f} min restantes).")
+                return False, f"pH↑ en enfriamiento ({espera/60:.1f} min restantes)"
 
-            promedio, listo, acumulador, contador = procesar_lectura(lectura, acumulador, contador)
-            if not listo:
-                time.sleep(DELAY_MUESTREO)
-                continue
+            # 🔒 Cooldown cruzado – si pH↓ está en cooldown también bloquear
+            if ahora - self.ultimo_ph_down < COOLDOWN_PH_SEG:
+                espera = COOLDOWN_PH_SEG - (ahora - self.ultimo_ph_down)
+                print(f"[MANUAL] pH↑ bloqueado por cooldown de pH↓ ({espera/60:.1f} min restantes).")
+                return False, f"pH↑ bloqueado por enfriamiento de pH↓ ({espera/60:.1f} min restantes)"
 
-            voltaje_a0, voltaje_a1, pH_compensado, OD_compensado, temperatura_float, voltaje_suavizado = convertir_y_compensar(promedio, voltaje_suavizado)
+            ml = DOSIFICACIONES_PH_UP[preset]          # volumen a dosificar (ml)
+            duracion = ml_a_segundos(ml)               # Convertir ml a segundos
+            self.pid_ph_up.auto_mode = False           # Desactivar PID de pH↑
+            self.pid_ph_down.auto_mode = False         # Desactivar PID de pH↓
+            self.pid_paused_ph = True                  # Pausar PID de pH
+            if self.pin_en_tarea_manual(self.pin_ph_up):   # Verificar si ya hay una tarea activa
+                print("[MANUAL] pH↑ ya tiene una tarea activa. Comando ignorado.")
+                return False, "pH↑ ya tiene una tarea activa"
+            self.tareas_manual.append({
+                "tipo": "pH↑",                         # Tipo de tarea
+                "pin": self.pin_ph_up,                 # Pin a activar
+                "t_fin": ahora + duracion              # Tiempo de finalización
+            })
+            self.ultimo_ph_up = ahora                  # Actualizar tiempo de última dosificación
+            print(f"[MANUAL] pH↑ preset {preset} → {ml:.1f} ml ({duracion:.1f}s).")
+            return True, f"pH↑ {ml:.1f} ml ({duracion:.1f} s)"
+
+        # 9 = Dosificación pH↓ (analogo al anterior)
+        elif codigo == "9":
+            if self.bloqueo_seguridad_ph:
+                print("[MANUAL] Bloqueo de seguridad pH activo. Comando rechazado.")
+                return False, "bloqueo de seguridad pH activo"
+            preset = int(valor)
+            if not (0 <= preset < len(DOSIFICACIONES_PH_DOWN)):
+                print("[MANUAL] Preset fuera de rango para pH↓.")
+                return False, "preset fuera de rango para pH↓"
+            if ahora - self.ultimo_ph_down < COOLDOWN_PH_SEG:
+                espera = COOLDOWN_PH_SEG - (ahora - self.ultimo_ph_down)
+                print(f"[MANUAL] pH↓ en enfriamiento ({espera/60:.1f} min restantes).")
+                return False, f"pH↓ en enfriamiento ({espera/60:.1f} min restantes)"
+
+            # Bloqueo cruzado: si pH↑ está en cooldown, bloquear pH↓ también
+            if ahora - self.ultimo_ph_up < COOLDOWN_PH_SEG:
+                espera = COOLDOWN_PH_SEG - (ahora - self.ultimo_ph_up)
+                print(f"[MANUAL] pH↓ bloqueado por cooldown de pH↑ ({espera/60:.1f} min restantes).")
+                return False, f"pH↓ bloqueado por enfriamiento de pH↑ ({espera/60:.1f} min restantes)"
+
+            ml = DOSIFICACIONES_PH_DOWN[preset]
+            duracion = ml_a_segundos(ml)
+            self.pid_ph_up.auto_mode = False
+            self.pid_ph_down.auto_mode = False
+            self.pid_paused_ph = True
+            if self.pin_en_tarea_manual(self.pin_ph_down):
+                print("[MANUAL] pH↓ ya tiene una tarea activa. Comando ignorado.")
+                return False, "pH↓ ya tiene una tarea activa"
+            self.tareas_manual.append({
+                "tipo": "pH↓",
+                "pin": self.pin_ph_down,
+                "t_fin": ahora + duracion
+            })
+            self.ultimo_ph_down = ahora
+            print(f"[MANUAL] pH↓ preset {preset} → {ml:.1f} ml ({duracion:.1f}s).")
+            return True, f"pH↓ {ml:.1f} ml ({duracion:.1f} s)"
 
-            monitorear_seguridad_ph(pH_compensado)
+        # 10 = Reiniciar sistema de seguridad pH
+        elif codigo == "10":
+            print("[TCP] Reinicio manual del bloqueo de seguridad pH")
 
-            errores_activos = verificar_sensores(pH_compensado, OD_compensado, temperatura_float)
-            gestionar_pids_por_error(errores_activos)
+            self.bloqueo_seguridad_ph = False
+            self.pid_paused_ph = False
+            self.bloqueo_ph_hasta = 0
+            self.bloqueo_ph_tipo = ""
 
-            errores_filtrados = filtrar_errores_prioritarios(errores_activos)
-            errores_udp_str = "|".join(str(e) for e in sorted(errores_filtrados)) if errores_filtrados else "0"
-            codigo_error_actual = min(errores_filtrados) if errores_filtrados else 0
+            # Reset diario y base
+            self.variacion_acumulada = 0.0
+            self.ph_base = None  # se recalculará en la próxima lectura
+            self.fecha_actual = datetime.fromtimestamp(reloj.time()).strftime("%Y-%m-%d")
 
-            control_ph_down, control_ph_up, control_o2 = actualizar_pid(pH_compensado, OD_compensado)
+            self.ultimo_ph_down = 0
+            self.ultimo_ph_up = 0
 
-            mostrar_datos_consola(voltaje_a0, voltaje_a1, pH_compensado, OD_compensado,
-                                  control_ph_down, control_ph_up, control_o2,
-                                  pid_ph_up, pid_ph_down, pid_o2, temperatura_float,
-                                  ser, errores_udp_str)
-            
-            procesar_tareas_manuales(time.time())
+            # También resetear tareas o reset
+            self.pulso_reset()  # importante para sincronizar relés/555
 
-            (inicio_ciclo_ph_up, inicio_ciclo_ph_down, inicio_ciclo_o2,
-             tiempo_on_up, tiempo_on_down, tiempo_on_o2) = actualizar_actuadores(
-                control_ph_up, control_ph_down, control_o2,
-                inicio_ciclo_ph_up, inicio_ciclo_ph_down, inicio_ciclo_o2
+            # Notificación a Flask
+            self.notificar("seguridad", "🟢 PID pH reiniciado manualmente por el usuario")
+            return True, "bloqueo de seguridad pH reiniciado"
+
+        return False, f"comando desconocido: {codigo}"
+
+    # ------------------------------
+    # ACTUALIZAR ACTUADORES
+    # ------------------------------
+    def actualizar_actuadores(self, control_ph_up, control_ph_down, control_o2):
+        """
+        Actualiza los relés de pH↑, pH↓ y O2 según:
+          - Salidas PID (modo automático)
+          - Tareas manuales (si las hay, tienen prioridad y el PID NO toca ese pin)
+        Además, actualiza la lógica del temporizador 555 en base al estado real
+        de los relés de pH. Devuelve los tiempos de activación (s).
+        """
+
+        # ---- pH UP ----
+        if not self.pin_en_tarea_manual(self.pin_ph_up):
+            # Solo si NO hay tarea manual para este pin, aplica el PWM del PID
+            self.inicio_ciclo_ph_up, tiempo_on_up = self.control_por_tiempo(
+                control_ph_up,
+                self.inicio_ciclo_ph_up,
+                CICLO_PH_UP,
+                self.pin_ph_up,
+                MIN_ACTUACION_PH_UP
+            )
+        else:
+            # Hay una tarea manual activa → NO tocar el pin desde el PID
+            tiempo_on_up = 0.0
+
+        # ---- pH DOWN ----
+        if not self.pin_en_tarea_manual(self.pin_ph_down):
+            self.inicio_ciclo_ph_down, tiempo_on_down = self.control_por_tiempo(
+                control_ph_down,
+                self.inicio_ciclo_ph_down,
+                CICLO_PH_DOWN,
+                self.pin_ph_down,
+                MIN_ACTUACION_PH_DOWN
             )
+        else:
+            tiempo_on_down = 0.0
+
+        # ---- O2 ----
+        if not self.pin_en_tarea_manual(self.pin_o2):
+            self.inicio_ciclo_o2, tiempo_on_o2 = self.control_por_tiempo(
+                control_o2,
+                self.inicio_ciclo_o2,
+                CICLO_O2,
+                self.pin_o2,
+                MIN_ACTUACION_O2
+            )
+        else:
+            tiempo_on_o2 = 0.0
+
+        # ---------------------------------------------
+        #  LÓGICA DEL 555 (se ejecuta SIEMPRE)
+        #  - Lee el estado real actual de los relés, ya
+        #    sea por manual o por automático.
+        # ---------------------------------------------
+        ph_up_on = GPIO.input(self.pin_ph_up) == GPIO.HIGH
+        ph_down_on = GPIO.input(self.pin_ph_down) == GPIO.HIGH
+
+        self.logica_temporizador_555(ph_up_on, ph_down_on)
+
+        return tiempo_on_up, tiempo_on_down, tiempo_on_o2
+
+    # ------------------------------
+    # SEGURIDAD DE pH
+    # ------------------------------
+    def monitorear_seguridad_ph(self, ph_actual):
+        """
+        Sistema de seguridad continuo:
+          - Detecta variaciones bruscas respecto a un pH_base.
+          - Cada variación >= DELTA_PH_MAX_HORA → bloqueo 1h.
+          - Suma variaciones al acumulado diario.
+          - Si acumulado diario >= DELTA_PH_MAX_DIA → bloqueo 24h.
+          - Reset diario EXACTAMENTE a medianoche.
+        """
+        ahora = reloj.time()
+        fecha_hoy = datetime.fromtimestamp(reloj.time()).strftime("%Y-%m-%d")
+
+        # ---------------------------------------------------------
+        # Inicialización (solo primera llamada)
+        # ---------------------------------------------------------
+        if self.fecha_actual is None:
+            self.ph_base = ph_actual
+            self.fecha_actual = fecha_hoy
+            self.variacion_acumulada = 0.0
+            return
+
+        # Si ph_base fue reiniciado manualmente → recalcular base
+        if self.ph_base is None:
+            self.ph_base = ph_actual
+            return
+
+        # ---------------------------------------------------------
+        # Calcular variación respecto a pH_base
+        # ---------------------------------------------------------
+        delta = abs(ph_actual - self.ph_base)
+        print("delta:", delta, "ph_base:", self.ph_base)
+
+        # ---------------------------------------------------------
+        # RESET DIARIO A MEDIANOCHE
+        # ---------------------------------------------------------
+        if self.fecha_actual != fecha_hoy:
+            print("Reset diario automático del acumulado pH")
+            self.fecha_actual = fecha_hoy
+            self.variacion_acumulada = 0.0
+            self.notificar("seguridad", "🌙 PID pH reanudado automáticamente por reinicio diario")
+
+        # ---------------------------------------------------------
+        # Si está bloqueado → verificar si ya terminó el bloqueo
+        # ---------------------------------------------------------
+        if self.bloqueo_seguridad_ph:
+            if ahora >= self.bloqueo_ph_hasta:
+                print("Bloqueo pH finalizado → reactivando PID")
+                self.bloqueo_seguridad_ph = False
+                self.pid_paused_ph = False
+
+                self.notificar("seguridad", "🟢 PID pH reanudado automáticamente al finalizar el bloqueo")
+
+                # El pH actual pasa a ser el nuevo pH base
+                self.ph_base = ph_actual
+
+            return
+
+        # ---------------------------------------------------------
+        # 1) Variación brusca → bloqueo 1 hora
+        # ---------------------------------------------------------
+        if delta >= DELTA_PH_MAX_HORA:
+            print(f"Variación brusca: ΔpH={delta:.2f} → bloqueo 1h")
+
+            self.bloqueo_seguridad_ph = True
+            self.bloqueo_ph_hasta = ahora + 3600  # 1 hora
+            self.bloqueo_ph_tipo = "hora"
+            self.pid_paused_ph = True
+
+            self.notificar("seguridad", "⚠️ PID pH bloqueado 1 hora por variación brusca del pH")
+
+            # Sumar variación al acumulado diario
+            self.variacion_acumulada += delta
 
-            enviar_datos_udp(voltaje_a0, voltaje_a1, pH_compensado, OD_compensado,
-                             control_ph_down, control_ph_up, control_o2,
-                             pid_ph_up, pid_ph_down, pid_o2, temperatura_float,
-                             tiempo_on_up, tiempo_on_down, tiempo_on_o2,
-                             errores_udp_str)
-            
-            
-            # ===== ENVIAR ESTADO COMPLETO AL FLASK =====
-            estado = {
-                "pid_paused_ph": pid_paused_ph,
-                "pid_paused_o2": pid_paused_o2,
-                "bloqueo_ph": bloqueo_seguridad_ph,
-                "bloqueo_ph_tipo": bloqueo_ph_tipo,
-                "bloqueo_ph_hasta": bloqueo_ph_hasta,
-                "ph_base": getattr(monitorear_seguridad_ph, "ph_base", None),
-                "variacion_acumulada": getattr(monitorear_seguridad_ph, "variacion_acumulada", 0.0),
-                "ultimo_ph_up": ultimo_ph_up,
-                "ultimo_ph_down": ultimo_ph_down,
-                "cooldown": COOLDOWN_PH_SEG,
-                "tareas": tareas_manual,
-               "timestamp": time.time()
-            }
-            estado_json = json.dumps(estado)
-            enviar_estado_udp_flask(estado_json)
-
-            
-            # --- Watchdog interno: reinicio automático si no hay actividad ---
-            # Si no se ha completado una iteración normal en más de 20 segundos,
-            # se asume que el programa está bloqueado y se reinicia automáticamente.
-            if (time.time() - ultima_actividad) > 20: 
-                print("[WATCHDOG] Sin actividad. Reiniciando programa...")
-                os.execv(sys.executable, ['python3'] + sys.argv)
-
-            # Actualizar marca de tiempo de última actividad (cada ciclo exitoso)
-            ultima_actividad = time.time()
-
-            # --- Mantener ciclo de muestreo constante ---
-            t0 += DELAY_MUESTREO    # siguiente marca temporal objetivo
-            dt = t0 - time.time()   # tiempo restante hasta la siguiente iteración
-            if dt > 0:              # dormir solo si queda tiempo
-                time.sleep(dt)
+            return
+
+        # ---------------------------------------------------------
+        # 2) Variación acumulada diaria → bloqueo 24h
+        # ---------------------------------------------------------
+        if self.variacion_acumulada >= DELTA_PH_MAX_DIA:
+            print(f"Límite diario superado: Δacum={self.variacion_acumulada:.2f} → bloqueo 24h")
+
+            self.bloqueo_seguridad_ph = True
+            self.bloqueo_ph_hasta = ahora + 86400  # 24 horas
+            self.bloqueo_ph_tipo = "dia"
+            self.pid_paused_ph = True
+
+            self.notificar("seguridad", "⛔ PID pH bloqueado 24 horas por exceso de variación diaria")
+
+            return
+
+    # ------------------------------
+    # PROCESADOR DE TAREAS MANUALES (NO BLOQUEANTE)
+    # ------------------------------
+    def procesar_tareas_manuales(self, tiempo_actual):
+        """
+        Supervisa las tareas manuales activas.
+        Si el tiempo de activación ha finalizado, apaga el relé correspondiente.
+        Mientras una tarea esté activa, el PID asociado permanece desactivado.
+        """
+        tareas_activas = []               # Lista temporal para mantener solo las tareas en curso
+
+        for tarea in self.tareas_manual:  # Recorre las tareas activas
+            tipo = tarea["tipo"]          # 'pH_UP', 'pH_DOWN' o 'O2'
+            pin = tarea["pin"]            # Pin GPIO asociado
+            fin = tarea["t_fin"]          # Tiempo de finalización
+
+            # Si el relé aún no está encendido
+            '''
+            Solo se ejecuta una vez por tarea en el primer ciclo despues de
+            crearla, en los siguientes ciclos el rele ya esta activado, asi
+            que esta linea se salta automaticamente
+            '''
+            if GPIO.input(pin) == GPIO.LOW:
+                GPIO.output(pin, GPIO.HIGH)
+                print(f"[MANUAL] {tipo} activado.")
+
+            # Verifica si ya transcurrió el tiempo asignado
+            '''
+            Si ya paso el tiempo, se apaga el rele y se imprime finalizado
+            '''
+            if tiempo_actual >= fin:
+                GPIO.output(pin, GPIO.LOW)
+                print(f"[MANUAL] {tipo} finalizado.")
+            else:
+                tareas_activas.append(tarea) # si todavia no terminó se vuelve a guardar en tareas_activas
+
+        self.tareas_manual = tareas_activas  # Actualiza la lista con las tareas que siguen en ejecución
+
+    # ------------------------------
+    # GESTIONAR PIDS SEGUN ERRORES
+    # ------------------------------
+    def gestionar_pids_por_error(self, errores_activos):
+        errores_ph = {1, 4, 7, 11}
+        errores_o2 = {2, 5, 8, 12}
+        errores_temp = {3, 6, 9, 10}
+
+        # --- pH ---
+        if errores_activos & errores_ph:
+            self.pid_ph_up.auto_mode = False
+            self.pid_ph_down.auto_mode = False
+            self.apagar_actuadores(o2=False)
+            self.pid_paused_ph = True
+        elif not self.pid_paused_ph:
+            self.pid_ph_up.auto_mode = True
+            self.pid_ph_down.auto_mode = True
+
+        # --- O2 ---
+        if errores_activos & errores_o2:
+            self.pid_o2.auto_mode = False
+            self.apagar_actuadores(ph=False)
+            self.pid_paused_o2 = True
+        elif not self.pid_paused_o2:
+            self.pid_o2.auto_mode = True
+
+        # --- Temperatura ---
+        if errores_activos & errores_temp:
+            self.pid_ph_up.auto_mode = False
+            self.pid_ph_down.auto_mode = False
+            self.pid_o2.auto_mode = False
+            self.apagar_actuadores()
+            self.pid_paused_ph = True
+            self.pid_paused_o2 = True
+
+    # ------------------------------
+    # ENVIAR DATOS VIA UDP
+    # ------------------------------
+    def enviar_datos_udp(self, voltaje_a0, voltaje_a1, pH_compensado, OD_compensado,
+                         control_ph_down, control_ph_up, control_o2, temperatura_float,
+                         tiempo_on_up, tiempo_on_down, tiempo_on_o2, errores):
+        """Envía la telemetría (datagrama binario de telemetria.py) mediante UDP, incluyendo tiempos de activación."""
+        p_up, i_up, d_up = self.pid_ph_up.components
+        p_down, i_down, d_down = self.pid_ph_down.components
+        p_o2, i_o2, d_o2 = self.pid_o2.components
+
+        # Mismo orden que telemetria.CAMPOS
+        valores = (voltaje_a0, pH_compensado, voltaje_a1, OD_compensado,
+                   control_ph_down, control_ph_up, control_o2,
+                   p_down, i_down, d_down,
+                   p_up, i_up, d_up,
+                   p_o2, i_o2, d_o2,
+                   temperatura_float,
+                   tiempo_on_down, tiempo_on_up, tiempo_on_o2)
+        self.secuencia_telemetria += 1
+        mensaje = telemetria.codificar(self.secuencia_telemetria, reloj.monotonic(), valores, errores,
+                                       estanque=self.numero)
 
+        try:
+            if self.numero == ESTANQUE_POR_DEFECTO:       # la GUI muestra un solo estanque
+                mensaje_gui = mensaje if UDP_FORMATO_GUI == "binario" else telemetria.codificar_csv(valores, errores)
+                udp_socket.sendto(mensaje_gui, (UDP_IP, UDP_PORT_GUI))  # Enviar a GUI
+            udp_socket.sendto(mensaje, (UDP_IP, UDP_PORT_LOGGER))   # Enviar al registrador
+            udp_socket.sendto(mensaje, (UDP_IP, UDP_PORT_FLASK_DATOS)) # Enviar a Flask (caché en memoria)
+            if CONCENTRADOR:
+                udp_socket.sendto(mensaje, CONCENTRADOR)                # Enviar al concentrador de la flota
+        except Exception as e:
+            self.errores_activos.add(18)
+            print(f"[WARN UDP] No se pudo enviar el paquete: {e}")
+
+    def estado(self):
+        """Estado de seguridad y control manual que se publica a Flask."""
+        return {
+            "pid_paused_ph": self.pid_paused_ph,
+            "pid_paused_o2": self.pid_paused_o2,
+            "bloqueo_ph": self.bloqueo_seguridad_ph,
+            "bloqueo_ph_tipo": self.bloqueo_ph_tipo,
+            "bloqueo_ph_hasta": self.bloqueo_ph_hasta,
+            "ph_base": self.ph_base,
+            "variacion_acumulada": self.variacion_acumulada,
+            "ultimo_ph_up": self.ultimo_ph_up,
+            "ultimo_ph_down": self.ultimo_ph_down,
+            "cooldown": COOLDOWN_PH_SEG,
+            "tareas": self.tareas_manual,
+        }
+
+    # ------------------------------
+    # UNA PASADA DEL CONTROL
+    # ------------------------------
+    def paso(self):
+        """Lee, controla y publica este estanque una vez (no duerme)."""
+        if reloj.time() < self.pausa_hasta:
+            return
+
+        # --- Sin puerto serial: el hilo lector reintenta; el bucle sigue vivo ---
+        if not self.lector_serial.conectado():
+            self.errores_activos.add(self.lector_serial.error or 14)
+            if self.serial_disponible:
+                # Algo pasó con el puerto; se desactivan PIDs y actuadores una sola vez
+                print(f"[WARN] Serial del estanque {self.numero} no disponible. El lector reintenta en segundo plano...")
+                self.pid_ph_up.auto_mode = False
+                self.pid_ph_down.auto_mode = False
+                self.pid_o2.auto_mode = False
+                self.apagar_actuadores()
+                self.serial_disponible = False
+                self.ultimo_aviso_serial = None
+
+            # Aviso de error a GUI/logger/Flask cada 2 s mientras no haya puerto
+            if self.ultimo_aviso_serial is None or reloj.time() - self.ultimo_aviso_serial >= 2:
+                errores_filtrados = filtrar_errores_prioritarios(self.errores_activos)
+                try:
+                    self.enviar_datos_udp(
+                        0, 0, 0, 0,    # voltajes y lecturas nulas
+                        0, 0, 0,       # controles
+                        25.0,          # temperatura dummy
+                        0, 0, 0,       # tiempos de actuación
+                        errores_filtrados
+                    )
+                except:
+                    pass
+                self.ultimo_aviso_serial = reloj.time()
+            self.ultima_actividad = reloj.time()  # esperar al puerto no es un bloqueo del programa
+            return
+        elif not self.serial_disponible:
+            self.errores_activos.clear()  # puerto reconectado, limpiar errores
+            self.serial_disponible = True
+            self.procesador.reiniciar()
+
+        # --- Resto de la pasada protegido ---
+        try:
+            self._controlar()
         except Exception as e:
             # Cualquier error de la iteración NO debe terminar el proceso
-            errores_activos.add(20)
-            print(f"[ERROR BUCLE - iteración] {e}")
-            time.sleep(0.5)
-            continue
-
-except KeyboardInterrupt:
-    print("\n[SALIDA] Usuario interrumpió ejecución.")
-finally:
+            self.errores_activos.add(20)
+            print(f"[ERROR BUCLE - estanque {self.numero}] {e}")
+            self.pausa_hasta = reloj.time() + 0.5
+
+    def _controlar(self):
+        tiempos, bloque = self.lector_serial.drenar()
+        if not len(bloque):
+            return
+
+        # Todo el bloque N×2 se promedia, convierte y compensa de una vez
+        # (mismo resultado que procesar_lectura + convertir_y_compensar);
+        # si se completa más de un promedio, el control usa el más reciente
+        self.procesador.n_muestras = self.muestras_por_promedio()   # "auto" decide el formato con los primeros datos
+        voltajes = self.procesador.procesar(bloque)
+        if not voltajes:
+            return
+
+        temperatura_float = self.leer_temperatura_cached()
+        pH_bloque, OD_bloque = compensar_bloque(voltajes, temperatura_float)
+        voltaje_a0, voltaje_a1 = voltajes[-1]
+        pH_compensado, OD_compensado = pH_bloque[-1], OD_bloque[-1]
+
+        self.monitorear_seguridad_ph(pH_compensado)
+
+        self.errores_activos = verificar_sensores(pH_compensado, OD_compensado, temperatura_float,
+                                                  self.estado_sensores)
+        if self.temperatura_vencida():
+            # DS18B20 sin lecturas nuevas: la compensación usa el último valor conocido
+            self.errores_activos.discard(0)
+            self.errores_activos.add(17)
+        self.gestionar_pids_por_error(self.errores_activos)
+
+        errores_filtrados = filtrar_errores_prioritarios(self.errores_activos)
+        errores_udp_str = "|".join(str(e) for e in sorted(errores_filtrados)) if errores_filtrados else "0"
+        self.codigo_error_actual = min(errores_filtrados) if errores_filtrados else 0
+
+        control_ph_down, control_ph_up, control_o2 = self.actualizar_pid(pH_compensado, OD_compensado)
+
+        mostrar_datos_consola(voltaje_a0, voltaje_a1, pH_compensado, OD_compensado,
+                              control_ph_down, control_ph_up, control_o2,
+                              self.pid_ph_up, self.pid_ph_down, self.pid_o2, temperatura_float,
+                              self.lector_serial.ser, errores_udp_str,
+                              self.numero if len(controladores) > 1 else None)
+
+        self.procesar_tareas_manuales(reloj.time())
+
+        tiempo_on_up, tiempo_on_down, tiempo_on_o2 = self.actualizar_actuadores(
+            control_ph_up, control_ph_down, control_o2)
+
+        self.enviar_datos_udp(voltaje_a0, voltaje_a1, pH_compensado, OD_compensado,
+                              control_ph_down, control_ph_up, control_o2, temperatura_float,
+                              tiempo_on_up, tiempo_on_down, tiempo_on_o2,
+                              errores_filtrados)
+
+        # ===== ENVIAR ESTADO AL FLASK (solo si cambió, ver publicador_estado.py) =====
+        self.publicador_estado.publicar(self.estado())
+
+        # --- Watchdog interno: reinicio automático si no hay actividad ---
+        # Si no se ha completado una pasada normal en más de 20 segundos,
+        # se asume que el programa está bloqueado y se reinicia automáticamente.
+        if (reloj.time() - self.ultima_actividad) > 20:
+            print(f"[WATCHDOG] Estanque {self.numero} sin actividad. Reiniciando programa...")
+            os.execv(sys.executable, ['python3'] + sys.argv)
+
+        # Actualizar marca de tiempo de última actividad (cada pasada exitosa)
+        self.ultima_actividad = reloj.time()
+
+# ==============================
+# INICIALIZACIÓN
+# ==============================
+def inicializar(hardware=None, lanzar_logger=None, estanques=None):
+    """
+    Abre el hardware (TILAPIA_HAL=pi|sim), el servidor TCP de comandos y
+    un controlador por estanque (estanques = lista de configuraciones, por
+    defecto cargar_estanques(RUTA_ESTANQUES)) con sus actuadores en
+    estado seguro. Por defecto el logger solo se lanza con hardware real.
+    """
+    global hw, reloj, GPIO, servidor_comandos, notificador
+
+    configuraciones = estanques if estanques is not None else cargar_estanques(RUTA_ESTANQUES)
+
+    hw = hardware or hal.crear_hardware()
+    reloj = hw.reloj
+    GPIO = hw.gpio
+
+    errores_sistema.clear()
+    if lanzar_logger is None:
+        lanzar_logger = hw.nombre == "pi"
+    if lanzar_logger:
+        iniciar_logger_csv()                 # Ejecutar el logger automáticamente al iniciar el sistema principal
+        reloj.sleep(1.0)                     # breve espera para que el logger se inicialice
+
+    notificador = NotificadorFlask(URL_NOTIFICACIONES_FLASK, reloj)
+    notificador.iniciar()
+
+    controladores.clear()
+    for config in configuraciones:
+        controladores[config["numero"]] = ControladorEstanque(config)
+    for controlador in controladores.values():
+        controlador.iniciar()
+
+    servidor_comandos = ServidorComandos(UDP_IP, TCP_PORT, interpretar_comando)
+    servidor_comandos.iniciar()
+
+# ==============================
+# BUCLE PRINCIPAL
+# ==============================
+def bucle_principal(max_iteraciones=None):
+    """
+    Planificador: en cada pasada atiende calibración y comandos y llama a
+    paso() de cada estanque, con un período fijo de DELAY_MUESTREO. La
+    lectura de los puertos y sensores ya ocurre en los hilos lectores, así
+    que un estanque lento no frena a los demás. Con max_iteraciones
+    (benchmarks / simulación) retorna después de ese número de pasadas.
+    """
+    for controlador in controladores.values():
+        controlador.preparar()
+    iteraciones = 0
+    while max_iteraciones is None or iteraciones < max_iteraciones:
+        iteraciones += 1
+        t0 = reloj.time()            # marca temporal inicio de ciclo
+        calibracion.revisar(reloj.monotonic())   # recarga calibracion.json si cambió
+        escuchar_confirmacion_tcp()  # Revisa si llegó alguna orden externa de reanudación
+
+        for controlador in controladores.values():
+            controlador.paso()
+
+        # --- Mantener ciclo de muestreo constante ---
+        t0 += DELAY_MUESTREO    # siguiente marca temporal objetivo
+        dt = t0 - reloj.time()  # tiempo restante hasta la siguiente iteración
+        if dt > 0:              # dormir solo si queda tiempo
+            reloj.sleep(dt)
+
+
+def liberar_recursos():
     try:
-        tcp_socket.close()
-        if ser:
-            ser.close()
+        if servidor_comandos:
+            servidor_comandos.detener()
+        for controlador in controladores.values():
+            controlador.detener()
+        if notificador:
+            notificador.detener()            # último intento de entregar lo pendiente
     except:
         pass
     try:
         udp_socket.close()
     except:
         pass
-    GPIO.cleanup()
+    if GPIO:
+        GPIO.cleanup()
     print("[INFO] Recursos liberados correctamente.")
+
+if __name__ == "__main__":
+    inicializar()
+    try:
+        bucle_principal()
+    except KeyboardInterrupt:
+        print("\n[SALIDA] Usuario interrumpió ejecución.")
+    finally:
+        liberar_recursos()
@@ -0,0 +1,127 @@
+# ===============================================================
+# 🐟 VENTANAS MÓVILES — historial de tamaño fijo para verificar_sensores
+# ===============================================================
+# Reemplaza las listas con pop(0) + max()/min()/pstdev() recalculados en
+# cada muestra:
+#   - buffer circular (deque con maxlen) → agregar en O(1)
+#   - mínimo / máximo con deques monótonas → O(1) amortizado
+#   - varianza poblacional por Welford (alta y baja de muestras)
+#
+# Los resultados deben coincidir bit a bit con el cálculo anterior
+# (códigos 7/8/9/11/12):
+#   - max/min devuelven exactamente los mismos elementos de la ventana
+#   - la desviación rodante solo decide lejos del umbral; cerca de él se
+#     recalcula con statistics.pstdev sobre la ventana, como antes
+
+import math
+import statistics
+from collections import deque
+
+# Tolerancia relativa (sobre el cuadrado del mayor |valor| de la ventana)
+# dentro de la cual se usa statistics.pstdev en lugar del valor rodante
+TOLERANCIA_VARIANZA = 1e-9
+
+class VentanaMovil:
+    """Últimas `tamano` muestras con min/max y varianza rodantes."""
+
+    def __init__(self, tamano):
+        self.tamano = tamano
+        self._datos = deque(maxlen=tamano)
+        self._maximos = deque()    # (indice, valor) decreciente
+        self._minimos = deque()    # (indice, valor) creciente
+        self._indice = 0           # índice absoluto de la próxima muestra
+        self._n = 0
+        self._media = 0.0
+        self._m2 = 0.0
+        self._desde_recalculo = 0
+
+    def __len__(self):
+        return len(self._datos)
+
+    def __getitem__(self, i):
+        return self._datos[i]      # usado con -1 / -2: O(1) en los extremos
+
+    def __iter__(self):
+        return iter(self._datos)
+
+    def lleno(self):
+        return len(self._datos) == self.tamano
+
+    # ------------------------------
+    # ALTA DE MUESTRAS
+    # ------------------------------
+    def agregar(self, x):
+        if len(self._datos) == self.tamano:
+            self._quitar_welford(self._datos[0])
+        self._datos.append(x)
+        self._agregar_welford(x)
+
+        # Deques monótonas: se descartan los que ya no pueden ser extremo
+        i = self._indice
+        while self._maximos and self._maximos[-1][1] <= x:
+            self._maximos.pop()
+        self._maximos.append((i, x))
+        while self._minimos and self._minimos[-1][1] >= x:
+            self._minimos.pop()
+        self._minimos.append((i, x))
+
+        limite = i - self.tamano   # índices <= limite ya salieron de la ventana
+        if self._maximos[0][0] <= limite:
+            self._maximos.popleft()
+        if self._minimos[0][0] <= limite:
+            self._minimos.popleft()
+        self._indice += 1
+
+        # Recalcular cada `tamano` muestras acota el error acumulado
+        self._desde_recalculo += 1
+        if self._desde_recalculo >= self.tamano:
+            self._recalcular()
+
+    def _agregar_welford(self, x):
+        self._n += 1
+        delta = x - self._media
+        self._media += delta / self._n
+        self._m2 += delta * (x - self._media)
+
+    def _quitar_welford(self, x):
+        self._n -= 1
+        if self._n == 0:
+            self._media = 0.0
+            self._m2 = 0.0
+            return
+        delta = x - self._media
+        self._media -= delta / self._n
+        self._m2 -= delta * (x - self._media)
+
+    def _recalcular(self):
+        n = len(self._datos)
+        media = math.fsum(self._datos) / n
+        self._n = n
+        self._media = media
+        self._m2 = math.fsum((x - media) ** 2 for x in self._datos)
+        self._desde_recalculo = 0
+
+    # ------------------------------
+    # CONSULTAS
+    # ------------------------------
+    def maximo(self):
+        return self._maximos[0][1]
+
+    def minimo(self):
+        return self._minimos[0][1]
+
+    def varianza(self):
+        """Varianza poblacional rodante (aproximada)."""
+        return max(self._m2, 0.0) / self._n
+
+    def desviacion_supera(self, umbral):
+        """
+        Equivale a statistics.pstdev(ventana) > umbral.
+        Solo recurre a pstdev cuando la varianza rodante queda cerca de umbral².
+        """
+        var = self.varianza()
+        escala = max(abs(self.maximo()), abs(self.minimo()))
+        margen = TOLERANCIA_VARIANZA * escala * escala
+        if math.isfinite(var) and math.isfinite(margen) and abs(var - umbral * umbral) > margen:
+            return var > umbral * umbral
+        return statistics.pstdev(self._datos) > umbral
@@ -0,0 +1,99 @@
+# ===============================================================
+# 🐟 BENCH — procesamiento de muestras ADC: escalar vs bloque N×2
+# ===============================================================
+# Simula el bucle de control (una pasada cada DELAY_MUESTREO = 50 ms)
+# recibiendo tramas binarias del Arduino a 10, 100 y 1000 Hz, con un
+# promedio cada 0.5 s (n = frecuencia / 2). Mide el costo de CPU por
+# segundo de datos de:
+#   - escalar: parser.alimentar() + procesar_lectura() muestra a muestra
+#              + suavizado y compensar() por promedio (ruta original)
+#   - bloque:  parser.alimentar_bloque() + ProcesadorADC + compensar_bloque()
+# y verifica que ambas rutas den exactamente los mismos valores.
+#
+# Uso: python3 bench_bloques.py [--segundos 60]
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../PID"))
+os.environ.setdefault("TILAPIA_HAL", "sim")
+import v25
+from procesamiento import ProcesadorADC
+from protocolo_serial import ParserSerial, codificar_trama
+
+TEMPERATURA = 26.4
+
+def generar(frecuencia, segundos, semilla=0):
+    """Bytes que llegan en cada pasada del bucle de control."""
+    azar = random.Random(semilla)
+    pasadas = int(segundos / v25.DELAY_MUESTREO)
+    trozos, secuencia, debe = [], 0, 0.0
+    for _ in range(pasadas):
+        debe += frecuencia * v25.DELAY_MUESTREO
+        trozo = bytearray()
+        while debe >= 1:
+            trozo += codificar_trama(secuencia, 12949 + azar.randint(-40, 40), 7758 + azar.randint(-40, 40))
+            secuencia += 1
+            debe -= 1
+        trozos.append(bytes(trozo))
+    return trozos
+
+def ruta_escalar(trozos, n):
+    parser = ParserSerial("binario")
+    acumulador = {canal: 0 for canal in v25.CANALES}
+    contador = 0
+    suavizado = {canal: None for canal in v25.CANALES}
+    salida = []
+    for trozo in trozos:
+        for a0, a1 in parser.alimentar(trozo):
+            promedio, listo, acumulador, contador = v25.procesar_lectura(
+                {'A0': a0, 'A1': a1}, acumulador, contador, n)
+            if listo:
+                voltaje = v25.voltaje_acumulador(promedio)
+                for canal in v25.CANALES:
+                    suavizado[canal] = v25.suavizado_exponencial(voltaje[canal], suavizado[canal])
+                pH, OD = v25.compensar(suavizado['A0'], suavizado['A1'], TEMPERATURA)
+                salida.append((suavizado['A0'], suavizado['A1'], pH, OD))
+    return salida
+
+def ruta_bloque(trozos, n):
+    parser = ParserSerial("binario")
+    procesador = ProcesadorADC(n, [v25.CONVERSION_FACTOR[canal] for canal in v25.CANALES],
+                               v25.ALPHA_SUAVIZADO)
+    salida = []
+    for trozo in trozos:
+        voltajes = procesador.procesar(parser.alimentar_bloque(trozo))
+        if voltajes:
+            pH, OD = v25.compensar_bloque(voltajes, TEMPERATURA)
+            salida += [(v0, v1, p, o) for (v0, v1), p, o in zip(voltajes, pH, OD)]
+    return salida
+
+def medir(ruta, trozos, n, repeticiones=3):
+    mejor = None
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        salida = ruta(trozos, n)
+        dt = time.perf_counter() - t0
+        mejor = dt if mejor is None else min(mejor, dt)
+    return mejor, salida
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--segundos", type=float, default=60)
+    args = ap.parse_args()
+
+    print(f"{'Hz':>6}{'n':>6}{'promedios':>11}{'escalar ms/s':>14}{'bloque ms/s':>13}{'x':>7}  iguales")
+    for frecuencia in (10, 100, 1000):
+        n = max(1, frecuencia // 2)
+        trozos = generar(frecuencia, args.segundos)
+        t_esc, salida_esc = medir(ruta_escalar, trozos, n)
+        t_blq, salida_blq = medir(ruta_bloque, trozos, n)
+        print(f"{frecuencia:>6}{n:>6}{len(salida_blq):>11}"
+              f"{t_esc / args.segundos * 1e3:>14.3f}{t_blq / args.segundos * 1e3:>13.3f}"
+              f"{t_esc / t_blq:>7.1f}  {salida_esc == salida_blq}")
+
+if __name__ == "__main__":
+    main()
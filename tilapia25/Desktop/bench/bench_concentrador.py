@@ -0,0 +1,130 @@
+# ===============================================================
+# 🐟 BENCH — concentrador.py con N nodos simulados a 20 Hz
+# ===============================================================
+# Levanta el concentrador en un proceso aparte (BD temporal, puertos
+# libres) y le manda telemetría por UDP local como lo harían N Raspberry
+# Pi: un socket por nodo, estanque = número de nodo, secuencia propia y
+# un error que aparece y se resuelve en algunos nodos. Los envíos se
+# reparten a lo largo de cada período (no en ráfaga).
+#
+# Mientras tanto consulta /api/flota una vez por segundo. Al final informa
+# datagramas enviados / recibidos, CPU del concentrador (fracción de un
+# núcleo, por getrusage del proceso hijo), filas escritas, latencia de
+# commit y de la API, y verifica el historial y los errores de un nodo.
+#
+# Uso: python3 bench_concentrador.py [--nodos 50] [--hz 20] [--segundos 30]
+
+import argparse
+import json
+import os
+import resource
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.request import urlopen
+
+PID_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../PID")
+sys.path.insert(0, PID_DIR)
+import telemetria
+
+def arrancar_concentrador(db):
+    """Proceso del concentrador con puertos elegidos por el sistema → (proceso, puerto_udp, url_api)."""
+    proceso = subprocess.Popen(
+        [sys.executable, "-u", os.path.join(PID_DIR, "concentrador.py"), "--udp", "0", "--http", "0", "--db", db],
+        stdout=subprocess.PIPE, text=True)
+    linea = proceso.stdout.readline()          # "[CONCENTRADOR] UDP 40123, API http://0.0.0.0:40124/api/flota"
+    puerto_udp = int(linea.split("UDP ")[1].split(",")[0])
+    puerto_http = int(linea.rsplit(":", 1)[1].split("/")[0])
+    return proceso, puerto_udp, f"http://127.0.0.1:{puerto_http}"
+
+def pedir(url):
+    t0 = time.perf_counter()
+    with urlopen(url, timeout=5) as r:
+        datos = json.load(r)
+    return datos, time.perf_counter() - t0
+
+def valores(nodo, i):
+    """Muestra plausible: pH y O2 oscilando alrededor del setpoint."""
+    ph = 7.0 + 0.05 * ((i + nodo) % 20) / 20
+    o2 = 5.0 + 0.2 * ((i + 3 * nodo) % 40) / 40
+    return (1500.0, ph, 900.0, o2, 10.0, 0.0, 30.0,
+            0.1, 0.2, 0.0, 0.0, 0.0, 0.0, 1.0, 2.0, 0.0,
+            26.0 + nodo / 100, 0.0, 0.0, 0.5)
+
+def generar(destino, nodos, hz, segundos, url, consultas):
+    """Envía nodos×hz datagramas/s durante segundos; consulta la API una vez por segundo."""
+    sockets = [socket.socket(socket.AF_INET, socket.SOCK_DGRAM) for _ in range(nodos)]
+    total = nodos * hz * segundos
+    periodo = 1.0 / (nodos * hz)
+    enviados = 0
+    t0 = time.perf_counter()
+    proxima_consulta = t0 + 1.0
+    while enviados < total:
+        ahora = time.perf_counter()
+        debidos = min(total, int((ahora - t0) / periodo) + 1)
+        while enviados < debidos:
+            i, nodo = divmod(enviados, nodos)
+            t = i / hz
+            errores = {3} if nodo % 10 == 0 and 2 <= t < 4 else {0}
+            sockets[nodo].sendto(telemetria.codificar(i, t, valores(nodo, i), errores, estanque=nodo + 1), destino)
+            enviados += 1
+        if ahora >= proxima_consulta:
+            flota, latencia = pedir(url + "/api/flota")
+            consultas.append((len(flota), latencia))
+            proxima_consulta += 1.0
+        time.sleep(0.001)
+    duracion = time.perf_counter() - t0
+    for s in sockets:
+        s.close()
+    return enviados, duracion
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--nodos", type=int, default=50)
+    ap.add_argument("--hz", type=int, default=20)
+    ap.add_argument("--segundos", type=int, default=30)
+    args = ap.parse_args()
+
+    db = os.path.join(tempfile.mkdtemp(), "concentrador.db")
+    proceso, puerto_udp, url = arrancar_concentrador(db)
+    consultas = []
+    try:
+        enviados, duracion = generar(("127.0.0.1", puerto_udp), args.nodos, args.hz, args.segundos, url, consultas)
+        time.sleep(2.5)                         # último volcado
+        metricas, _ = pedir(url + "/api/metricas")
+        historial, _ = pedir(url + f"/api/estanques/1/historial?desde={time.time() - duracion - 10}")
+        errores, _ = pedir(url + "/api/errores?estanque=1")
+    finally:
+        proceso.send_signal(signal.SIGTERM)
+        proceso.wait()
+    uso = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = (uso.ru_utime + uso.ru_stime) / (duracion + 2.5)
+
+    conn = sqlite3.connect(db)
+    filas = sum(conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+                for (t,) in conn.execute("SELECT tabla FROM particiones"))
+    conn.close()
+
+    latencias = sorted(l for _, l in consultas)
+    recibidos = metricas["datagramas"]
+    print(f"{args.nodos} nodos × {args.hz} Hz durante {duracion:.1f} s "
+          f"({enviados / duracion:.0f} datagramas/s enviados)")
+    print(f"enviados {enviados}, recibidos {recibidos} ({(enviados - recibidos) / enviados:.2%} perdidos), "
+          f"inválidos {metricas['invalidos']}, huecos de secuencia {metricas['perdidos']}")
+    print(f"CPU del concentrador: {cpu:.1%} de un núcleo (proceso completo, con arranque y API)")
+    print(f"filas en BD: {filas} ({metricas['commits']} commits, "
+          f"{metricas['commit_ms_prom']} ms prom, {metricas['commit_ms_max']} ms máx)")
+    if latencias:
+        print(f"/api/flota: {len(latencias)} consultas, {latencias[len(latencias) // 2] * 1000:.1f} ms p50, "
+              f"{latencias[-1] * 1000:.1f} ms máx, {consultas[-1][0]} estanques")
+    print(f"estanque 1: {len(historial)} filas de historial, "
+          f"{sum(f['n'] for f in historial)} muestras promediadas, errores {[(e['codigo'], e['fin'] is not None) for e in errores]}")
+    sostenido = recibidos >= 0.999 * enviados and cpu < 1.0
+    print("sostenido en un núcleo:", sostenido)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# ===============================================================
+# 🐟 BENCH — consultas del historial antes/después de la columna ts
+# ===============================================================
+# Genera un año sintético de lecturas cada 5 s en una BD temporal y mide
+# los filtros de /api/historial_filtros:
+#   - antes:   fecha = ? / fecha LIKE ? / fecha BETWEEN / substr(hora, ...)
+#   - después: rangos semiabiertos sobre ts (lecturas) y hora (notificaciones)
+#
+# Uso: python3 bench_consultas.py [--dias 365] [--intervalo 5]
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../PID"))
+from esquema_bd import TABLAS, inicializar_esquema
+
+def generar(conn, dias, intervalo):
+    """Inserta dias*86400/intervalo lecturas y una notificación por hora."""
+    for ddl in TABLAS:
+        conn.execute(ddl)
+
+    inicio = datetime(2025, 1, 1)
+    por_dia = int(86400 / intervalo)
+    for d in range(dias):
+        dia = inicio + timedelta(days=d)
+        fecha = dia.strftime("%Y-%m-%d")
+        filas = []
+        for i in range(por_dia):
+            s = int(i * intervalo)
+            hora = f"{s // 3600:02d}:{s % 3600 // 60:02d}:{s % 60:02d}"
+            filas.append((fecha, hora, 7.5, 5.0, 25.0, 0.0, 0.0, 0.0, "0"))
+        conn.executemany("""
+            INSERT INTO lecturas (fecha, hora, ph, o2, temp, pid_ph_down, pid_ph_up, pid_o2, codigo_error)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, filas)
+        conn.executemany("""
+            INSERT INTO notificaciones (tipo, mensaje, hora) VALUES ('info', 'bench', ?)
+        """, [(f"{fecha} {h:02d}:00:00",) for h in range(24)])
+    conn.commit()
+
+def medir(conn, q, params, repeticiones=3):
+    """Mejor tiempo (ms) de ejecutar la consulta y traer todas las filas."""
+    mejor = None
+    n = 0
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        n = len(conn.execute(q, params).fetchall())
+        dt = (time.perf_counter() - t0) * 1000.0
+        mejor = dt if mejor is None else min(mejor, dt)
+    return mejor, n
+
+def epoch(fecha):
+    return int(datetime.strptime(fecha, "%Y-%m-%d").timestamp())
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--dias", type=int, default=365)
+    ap.add_argument("--intervalo", type=float, default=5.0)
+    args = ap.parse_args()
+
+    ruta = os.path.join(tempfile.mkdtemp(), "bench.db")
+    conn = sqlite3.connect(ruta)
+    conn.execute("PRAGMA journal_mode=WAL;")
+
+    t0 = time.perf_counter()
+    generar(conn, args.dias, args.intervalo)
+    total = conn.execute("SELECT COUNT(*) FROM lecturas").fetchone()[0]
+    print(f"BD sintética: {total} lecturas en {time.perf_counter() - t0:.1f} s ({ruta})")
+
+    sel = "SELECT fecha, hora, ph, o2, temp FROM lecturas WHERE "
+    sel_n = "SELECT hora, mensaje FROM notificaciones WHERE "
+    casos = [
+        ("lecturas día",   sel + "fecha = ?",              ["2025-06-15"],
+                           sel + "ts >= ? AND ts < ?",     [epoch("2025-06-15"), epoch("2025-06-16")]),
+        ("lecturas mes",   sel + "fecha LIKE ?",           ["2025-06-%"],
+                           sel + "ts >= ? AND ts < ?",     [epoch("2025-06-01"), epoch("2025-07-01")]),
+        ("lecturas rango", sel + "fecha BETWEEN ? AND ?",  ["2025-06-10", "2025-06-12"],
+                           sel + "ts >= ? AND ts < ?",     [epoch("2025-06-10"), epoch("2025-06-13")]),
+        ("notif. día",     sel_n + "substr(hora, 1, 10) = ?", ["2025-06-15"],
+                           sel_n + "hora >= ? AND hora < ?",  ["2025-06-15", "2025-06-16"]),
+    ]
+
+    antes = [medir(conn, q, p) for _, q, p, _, _ in casos]
+
+    t0 = time.perf_counter()
+    inicializar_esquema(conn)
+    print(f"Migración (ts + backfill + índices): {time.perf_counter() - t0:.1f} s")
+
+    print(f"{'consulta':<16}{'filas':>9}{'antes ms':>12}{'después ms':>12}")
+    for (nombre, _, _, q, p), (t_antes, n) in zip(casos, antes):
+        t_despues, n2 = medir(conn, q, p)
+        print(f"{nombre:<16}{n:>9}{t_antes:>12.1f}{t_despues:>12.1f}" + ("" if n == n2 else "  ¡filas distintas!"))
+
+    conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# ===============================================================
+# 🐟 BENCH — estado de v25 a Flask (UDP 6000): cada iteración vs cambios
+# ===============================================================
+# Corre v25 sobre hardware simulado (reloj virtual), guarda el estado que
+# el bucle arma en cada iteración y lo vuelve a enviar por UDP local:
+#   - antes:   json.dumps(estado + timestamp) y sendto en cada iteración
+#   - después: PublicadorEstado (deltas, INTERVALO_MINIMO, latido)
+# Informa µs de CPU por iteración, datagramas y bytes por segundo
+# simulado, y verifica que aplicar los deltas reproduzca el estado.
+#
+# Uso: python3 bench_estado.py [--iteraciones 20000]
+
+import argparse
+import contextlib
+import copy
+import json
+import os
+import socket
+import sys
+import time
+
+os.environ.setdefault("TILAPIA_HAL", "sim")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../PID"))
+
+import hal
+import v25
+from publicador_estado import PublicadorEstado
+
+def capturar_estados(iteraciones):
+    """[(monotonic, time, estado)] de cada iteración del bucle sobre el simulador."""
+    capturados = []
+    v25.TCP_PORT = 0
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        v25.inicializar()
+        reloj = v25.reloj
+        v25.controladores[v25.ESTANQUE_POR_DEFECTO].publicador_estado.publicar = lambda estado: capturados.append(
+            (reloj.monotonic(), reloj.time(), copy.deepcopy(estado)))
+        v25.bucle_principal(max_iteraciones=iteraciones)
+        v25.liberar_recursos()
+    return capturados
+
+class RelojRepeticion(hal.RelojVirtual):
+    """Reloj que el bench pone en el instante de cada estado capturado."""
+    def poner(self, monotonic, tiempo):
+        self._t = monotonic
+        self._inicio = tiempo - monotonic
+
+def medir(capturados, sock, destino, publicar):
+    datagramas = [0, 0]                  # cantidad, bytes
+    def enviar(texto):
+        datos = texto.encode()
+        sock.sendto(datos, destino)
+        datagramas[0] += 1
+        datagramas[1] += len(datos)
+    t0 = time.process_time()
+    for m, t, estado in capturados:
+        publicar(enviar, m, t, estado)
+    cpu = time.process_time() - t0
+    return cpu / len(capturados) * 1e6, datagramas[0], datagramas[1]
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--iteraciones", type=int, default=20000)
+    args = ap.parse_args()
+
+    capturados = capturar_estados(args.iteraciones)
+    simulado = capturados[-1][0] - capturados[0][0]
+
+    receptor = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receptor.bind(("127.0.0.1", 0))
+    receptor.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+    receptor.setblocking(False)
+    destino = receptor.getsockname()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def drenar():
+        mensajes = []
+        while True:
+            try:
+                mensajes.append(json.loads(receptor.recv(65535)))
+            except BlockingIOError:
+                return mensajes
+
+    def antes(enviar, m, t, estado):
+        enviar(json.dumps(dict(estado, timestamp=t)))
+
+    reloj = RelojRepeticion()
+    publicador = PublicadorEstado(None, reloj)
+    def despues(enviar, m, t, estado):
+        publicador.enviar = enviar
+        reloj.poner(m, t)
+        publicador.publicar(estado)
+
+    resultados = {}
+    for nombre, fn in (("antes", antes), ("después", despues)):
+        drenar()
+        resultados[nombre] = medir(capturados, sock, destino, fn)
+
+    # El último estado reconstruido con los deltas debe ser el último capturado
+    reconstruido = {}
+    for mensaje in drenar():
+        if mensaje["completo"]:
+            reconstruido = dict(mensaje["estado"])
+        else:
+            reconstruido.update(mensaje["cambios"])
+    ultimo_enviado = publicador._enviado
+
+    print(f"{len(capturados)} iteraciones, {simulado:.0f} s simulados")
+    print(f"{'':>10}{'µs CPU/iteración':>18}{'datagramas/s':>14}{'bytes/s':>10}")
+    for nombre, (us, n, b) in resultados.items():
+        print(f"{nombre:>10}{us:>18.2f}{n / simulado:>14.2f}{b / simulado:>10.0f}")
+    print("estado reconstruido en Flask = último enviado:", reconstruido == json.loads(json.dumps(ultimo_enviado)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# ===============================================================
+# 🐟 BENCH — requests/s de la API Flask con y sin pool de conexiones
+# ===============================================================
+# Crea una BD temporal con lecturas y notificaciones, importa app.py
+# apuntando a ella (MONITOREO_DB) y mide con el cliente de pruebas de
+# Flask (sin red):
+#   - con pool:  get_db() actual (conexiones reutilizadas, pragmas una vez)
+#   - sin pool:  una conexión nueva por llamada, como antes
+#
+# Uso: python3 bench_flask.py [--requests 2000]
+# (app.py abre los puertos UDP 6000/5007: correr con la app detenida)
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BASE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE, "../PID"))
+sys.path.insert(0, os.path.join(BASE, "../myproject"))
+
+from esquema_bd import inicializar_esquema, sentencias_agregados, epoch_local
+
+def preparar_bd(ruta, dias=7, intervalo=5):
+    conn = sqlite3.connect(ruta)
+    conn.execute("PRAGMA journal_mode=WAL;")
+    inicializar_esquema(conn)
+    inicio = datetime.now() - timedelta(days=dias)
+    with conn:
+        for i in range(int(dias * 86400 / intervalo)):
+            t = inicio + timedelta(seconds=i * intervalo)
+            fecha, hora = t.strftime("%Y-%m-%d"), t.strftime("%H:%M:%S")
+            conn.execute("""
+                INSERT INTO lecturas (fecha, hora, ts, ph, o2, temp, pid_ph_down, pid_ph_up, pid_o2, codigo_error)
+                VALUES (?, ?, ?, 7.5, 5.0, 25.0, 0, 0, 0, '0')
+            """, (fecha, hora, epoch_local(fecha, hora)))
+            for sql, params in sentencias_agregados(fecha, hora, 7.5, 5.0, 25.0):
+                conn.execute(sql, params)
+        conn.executemany("INSERT INTO notificaciones (tipo, mensaje, hora) VALUES ('info', 'bench', ?)",
+                         [((inicio + timedelta(hours=h)).strftime("%Y-%m-%d %H:%M:%S"),) for h in range(dias * 24)])
+    conn.close()
+    return inicio.strftime("%Y-%m-%d")
+
+def conexion_sin_pool():
+    """get_db() anterior: conexión nueva en cada llamada."""
+    import app
+    conn = sqlite3.connect(app.DB_FILE, timeout=0.5)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def medir(cliente, url, n):
+    for _ in range(20):                 # calentamiento
+        cliente.get(url)
+    t0 = time.perf_counter()
+    for _ in range(n):
+        r = cliente.get(url)
+        assert r.status_code == 200, (url, r.status_code)
+    return n / (time.perf_counter() - t0)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=2000)
+    args = ap.parse_args()
+
+    ruta = os.path.join(tempfile.mkdtemp(), "bench.db")
+    dia = preparar_bd(ruta)
+    os.environ["MONITOREO_DB"] = ruta
+
+    import app
+    cliente = app.app.test_client()
+    urls = [
+        "/api/sensores",
+        "/api/historial",
+        "/api/notificaciones",
+        "/api/notificaciones_no_leidas",
+        f"/api/historial_filtros?tipo=lecturas&periodo=dia&fecha={dia}",
+    ]
+
+    get_db_pool = app.get_db
+    print(f"{'endpoint':<58}{'sin pool req/s':>16}{'con pool req/s':>16}")
+    for url in urls:
+        app.get_db = conexion_sin_pool
+        sin = medir(cliente, url, args.requests)
+        app.get_db = get_db_pool
+        con = medir(cliente, url, args.requests)
+        print(f"{url:<58}{sin:>16.0f}{con:>16.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# ===============================================================
+# 🐟 BENCH — lectura del puerto serial: readline()+decode vs bloque
+# ===============================================================
+# Simula un buffer serial con N muestras pendientes y mide:
+#   - antes:   readline() + decode('utf-8') por línea, se usa solo la última
+#   - ascii:   ser.read(in_waiting) + ParserSerial (todas las muestras)
+#   - binario: ídem con tramas de 9 bytes (secuencia + checksum)
+#
+# Uso: python3 bench_serial.py [--repeticiones 2000]
+
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../PID"))
+from protocolo_serial import ParserSerial, codificar_trama
+
+class SerialEnMemoria(io.BytesIO):
+    """Lo justo de serial.Serial para leer un buffer ya cargado."""
+    @property
+    def in_waiting(self):
+        return len(self.getbuffer()) - self.tell()
+
+def leer_antes(ser):
+    """leer_linea_ultima() original."""
+    last_line = None
+    reads = 0
+    while ser.in_waiting > 0 and reads < 200:
+        raw = ser.readline()
+        if not raw:
+            break
+        linea = raw.decode('utf-8', errors='ignore').strip()
+        if linea:
+            last_line = linea
+        reads += 1
+    partes = last_line.split(',')
+    return [{canal: int(val) for canal, val in zip(('A0', 'A1'), partes)}]
+
+def leer_bloque(parser):
+    def leer(ser):
+        muestras = parser.alimentar(ser.read(ser.in_waiting))
+        return [{'A0': a0, 'A1': a1} for a0, a1 in muestras]
+    return leer
+
+def medir(datos, leer, repeticiones):
+    t0 = time.perf_counter()
+    for _ in range(repeticiones):
+        n = len(leer(SerialEnMemoria(datos)))
+    return (time.perf_counter() - t0) / repeticiones * 1e6, n
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeticiones", type=int, default=2000)
+    args = ap.parse_args()
+
+    print(f"{'pendientes':>10}{'formato':>10}{'µs/lectura':>12}{'muestras':>10}{'µs/muestra':>12}")
+    for n in (5, 20, 200):
+        ascii_ = b"".join(f"{12900 + i % 7},{7750 - i % 5}\r\n".encode() for i in range(n))
+        binario = b"".join(codificar_trama(i, 12900 + i % 7, 7750 - i % 5) for i in range(n))
+        casos = [
+            ("antes", ascii_, leer_antes),
+            ("ascii", ascii_, leer_bloque(ParserSerial("ascii"))),
+            ("binario", binario, leer_bloque(ParserSerial("binario"))),
+        ]
+        for nombre, datos, leer in casos:
+            us, muestras = medir(datos, leer, args.repeticiones)
+            print(f"{n:>10}{nombre:>10}{us:>12.1f}{muestras:>10}{us / muestras:>12.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+# ===============================================================
+# 🐟 BENCH — spool del logger: throughput y recuperación ante caídas
+# ===============================================================
+# Con registros como los del logger (lectura + agregados, EscritorSpool):
+#   1. sostenido: registros/s agregados con fsync por registro vs por
+#      lotes (FSYNC_REGISTROS / FSYNC_INTERVALO), y registros/s que el
+#      drenador pasa a SQLite
+#   2. ráfaga con la BD bloqueada: se agregan N registros mientras otra
+#      conexión retiene un BEGIN EXCLUSIVE; al soltarlo se mide cuánto
+#      tarda el drenador en ponerse al día
+#   3. caídas: un proceso hijo agrega y drena registros numerados y se lo
+#      mata con SIGKILL en un momento al azar, varias veces, a veces
+#      dejando además un registro cortado al final del segmento. Al final
+#      cada ciclo debe estar en la BD completo hasta lo que alcanzó a
+#      escribir, sin huecos ni repetidos.
+#
+# Es también la prueba de recuperación del spool: si alguna verificación
+# falla (lecturas que faltan o sobran, huecos, repetidos) sale con código 1.
+#
+# Uso: python3 bench_spool.py [--registros 20000] [--ciclos 6]
+
+import argparse
+import os
+import random
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+SCRIPT = os.path.abspath(__file__)
+PID_DIR = os.path.join(os.path.dirname(SCRIPT), "../PID")
+sys.path.insert(0, PID_DIR)
+os.chdir(tempfile.mkdtemp())            # logger_3 crea registros_csv/ en el directorio actual
+
+import logger_3
+import spool as spool_mod
+import telemetria
+from logger_3 import DrenadorSpool, EscritorBD, EscritorSpool, inicializar_bd
+from spool import Spool
+
+TAMANO_SEGMENTO_CAIDAS = 64 << 10       # segmentos chicos: las caídas cruzan rotaciones y purgas
+EDAD_LOTE = 0.1                         # s: el último lote no espera BD_LOTE_MAX_EDAD para medir el drenado
+
+def muestra():
+    valores = [1500.0, 7.1, 900.0, 5.2] + [1.0] * 12 + [25.4, 0.1, 0.2, 0.3]
+    return telemetria.decodificar(telemetria.codificar(1, 0.0, valores, {0}))
+
+def preparar(directorio):
+    os.makedirs(directorio, exist_ok=True)
+    logger_3.DB_FILE = os.path.join(directorio, "monitoreo.db")
+    inicializar_bd()
+    return logger_3.DB_FILE
+
+def agregar_lecturas(escritor, n):
+    m = muestra()
+    for i in range(n):
+        logger_3.insertar_lectura(escritor, "2026-01-01", f"{i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}", m)
+        escritor.confirmar()
+        escritor.spool.sincronizar_si_corresponde()
+    escritor.spool.sincronizar()
+
+def esperar_drenado(drenador, timeout=120):
+    t0 = time.perf_counter()
+    while drenador.posicion != drenador.spool._sincronizado:
+        if time.perf_counter() - t0 > timeout:
+            raise RuntimeError("el drenador no terminó")
+        time.sleep(0.005)
+    return time.perf_counter() - t0
+
+def verificar(condicion, mensaje):
+    if not condicion:
+        sys.exit(f"[ERROR] {mensaje}")
+
+def contar_lecturas(db):
+    conn = sqlite3.connect(db)
+    n = conn.execute("SELECT COUNT(*) FROM lecturas").fetchone()[0]
+    conn.close()
+    return n
+
+# ------------------------------
+# 1. SOSTENIDO
+# ------------------------------
+def sostenido(n):
+    resultados = {}
+    for nombre, fsync_registros in (("fsync por registro", 1), ("fsync por lotes", spool_mod.FSYNC_REGISTROS)):
+        directorio = tempfile.mkdtemp()
+        s = Spool(os.path.join(directorio, "spool"), fsync_registros=fsync_registros)
+        t0 = time.perf_counter()
+        agregar_lecturas(EscritorSpool(s), n)
+        resultados[nombre] = (n / (time.perf_counter() - t0), s.fsyncs, directorio, s)
+
+    # Drenado de lo agregado con fsync por lotes
+    _, _, directorio, s = resultados["fsync por lotes"]
+    db = preparar(directorio)
+    drenador = DrenadorSpool(s, EscritorBD(db, max_edad=EDAD_LOTE))
+    t0 = time.perf_counter()
+    drenador.iniciar()
+    esperar_drenado(drenador)
+    drenado_s = n / (time.perf_counter() - t0)
+    drenador.detener()
+    s.cerrar()
+    verificar(contar_lecturas(db) == n, "sostenido: faltan o sobran lecturas")
+
+    print(f"1. sostenido ({n} registros de lectura + agregados)")
+    for nombre, (por_s, fsyncs, _, _) in resultados.items():
+        print(f"   {nombre:>20}: {por_s:>9.0f} registros/s agregados, {fsyncs} fsync")
+    print(f"   {'drenado a SQLite':>20}: {drenado_s:>9.0f} registros/s ({drenador.lotes} transacciones)")
+
+# ------------------------------
+# 2. RÁFAGA CON LA BD BLOQUEADA
+# ------------------------------
+def rafaga(n, bloqueo=3.0):
+    directorio = tempfile.mkdtemp()
+    db = preparar(directorio)
+    s = Spool(os.path.join(directorio, "spool"))
+    drenador = DrenadorSpool(s, EscritorBD(db, max_edad=EDAD_LOTE))
+    drenador.iniciar()
+
+    bloqueadora = sqlite3.connect(db, isolation_level=None, check_same_thread=False)
+    bloqueadora.execute("BEGIN EXCLUSIVE")
+    threading.Timer(bloqueo, bloqueadora.execute, ("COMMIT",)).start()
+    t0 = time.perf_counter()
+    agregar_lecturas(EscritorSpool(s), n)
+    t_agregado = time.perf_counter() - t0
+    pendientes = s.pendientes(drenador.posicion)
+    time.sleep(max(0.0, bloqueo - (time.perf_counter() - t0)))
+    t_drenado = esperar_drenado(drenador)
+    drenador.detener()
+    s.cerrar()
+    verificar(contar_lecturas(db) == n, "ráfaga: faltan o sobran lecturas")
+
+    print(f"2. ráfaga de {n} registros con la BD bloqueada {bloqueo:.0f} s")
+    print(f"   agregados en {t_agregado * 1000:.0f} ms sin esperar a la BD "
+          f"({pendientes / 1024:.0f} KiB en el spool, {pendientes / n:.0f} bytes por registro)")
+    print(f"   al liberar la BD, drenados en {t_drenado * 1000:.0f} ms; {n} lecturas en la BD, ninguna repetida")
+
+# ------------------------------
+# 3. CAÍDAS
+# ------------------------------
+def hijo(directorio, ciclo, cantidad):
+    """Agrega registros numerados (ph = i, estanque = ciclo) hasta cantidad o hasta que lo maten."""
+    db = preparar(directorio)
+    s = Spool(os.path.join(directorio, "spool"), tamano_segmento=TAMANO_SEGMENTO_CAIDAS, fsync_registros=16)
+    drenador = DrenadorSpool(s, EscritorBD(db), lote=50)
+    drenador.iniciar()
+    escritor = EscritorSpool(s)
+    m = dict(muestra(), estanque=ciclo)
+    i = 0
+    while cantidad is None or i < cantidad:
+        m["ph"] = i
+        logger_3.insertar_lectura(escritor, "2026-01-01", "00:00:00", m)
+        escritor.confirmar()
+        i += 1
+        print(i, flush=True)             # el padre sabe cuántos llegó a agregar
+        s.sincronizar_si_corresponde()
+        if i % 20 == 0:
+            time.sleep(0.001)
+    s.cerrar()
+    drenador.detener()
+
+def cortar_cola(directorio):
+    """Simula una escritura cortada: media cabecera de registro al final del último segmento."""
+    ruta = os.path.join(directorio, "spool")
+    ultimo = max(n for n in os.listdir(ruta) if n.endswith(".seg"))
+    with open(os.path.join(ruta, ultimo), "ab") as f:
+        f.write(b"\x40\x00\x00\x00\x12\x34")
+
+def caidas(ciclos):
+    directorio = tempfile.mkdtemp()
+    escritos = {}
+    random.seed(1)
+    for ciclo in range(1, ciclos + 1):
+        proceso = subprocess.Popen([sys.executable, SCRIPT, "--hijo", directorio, str(ciclo)],
+                                   stdout=subprocess.PIPE, text=True)
+        time.sleep(random.uniform(0.3, 1.0))
+        proceso.send_signal(signal.SIGKILL)
+        salida = proceso.communicate()[0].split()
+        escritos[ciclo] = int(salida[-1]) if salida else 0
+        if ciclo % 2 == 0:
+            cortar_cola(directorio)
+
+    # Arranque final sin caída: recupera, drena lo pendiente y sale
+    subprocess.run([sys.executable, SCRIPT, "--hijo", directorio, "0", "--cantidad", "0"],
+                   check=True, stdout=subprocess.DEVNULL)
+
+    conn = sqlite3.connect(os.path.join(directorio, "monitoreo.db"))
+    ok = True
+    print(f"3. caídas: {ciclos} procesos matados con SIGKILL (en los pares, además, cola cortada)")
+    for ciclo, n in escritos.items():
+        valores = [int(v) for (v,) in conn.execute("SELECT ph FROM lecturas WHERE estanque = ? ORDER BY ph", (ciclo,))]
+        correcto = valores == list(range(len(valores))) and len(valores) >= n
+        ok &= correcto
+        print(f"   ciclo {ciclo}: {n} agregados, {len(valores)} en la BD, "
+              f"{'sin huecos ni repetidos' if correcto else 'ERROR'}")
+    quedan = sorted(os.listdir(os.path.join(directorio, "spool")))
+    conn.close()
+    print(f"   segmentos que quedan en el spool: {quedan}")
+    print("   recuperación correcta:", ok)
+    verificar(ok, "caídas: la BD no coincide con lo agregado antes de cada SIGKILL")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--registros", type=int, default=20000)
+    ap.add_argument("--ciclos", type=int, default=6)
+    ap.add_argument("--hijo", nargs=2, metavar=("DIRECTORIO", "CICLO"))
+    ap.add_argument("--cantidad", type=int)
+    args = ap.parse_args()
+
+    if args.hijo:
+        return hijo(args.hijo[0], int(args.hijo[1]), args.cantidad)
+    sostenido(args.registros)
+    rafaga(args.registros)
+    caidas(args.ciclos)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# ===============================================================
+# 🐟 BENCH — telemetría de v25: CSV de 21 campos vs datagrama binario
+# ===============================================================
+# Mide por muestra, con valores como los del bucle de control:
+#   - antes:   f-string de 21 campos + decode/split/float() del logger
+#   - después: telemetria.codificar() + telemetria.decodificar()
+# e informa el tamaño de cada datagrama. Verifica además que el binario
+# decodifique los mismos valores (salvo la precisión de float32).
+#
+# Uso: python3 bench_telemetria.py [--muestras 50000]
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../PID"))
+import telemetria
+
+def muestras_aleatorias(n):
+    random.seed(0)
+    for _ in range(n):
+        valores = (random.uniform(1000, 2000), random.uniform(6, 8), random.uniform(500, 1500), random.uniform(2, 8),
+                   random.uniform(0, 100), random.uniform(0, 100), random.uniform(0, 100),
+                   *(random.uniform(-50, 50) for _ in range(9)),
+                   random.uniform(20, 30),
+                   random.uniform(0, 5), random.uniform(0, 5), random.uniform(0, 5))
+        errores = random.choice(({0}, {0}, {0}, {3}, {3, 17}))
+        yield valores, errores
+
+def codificar_antes(v, errores):
+    """enviar_datos_udp() original."""
+    errores_str = "|".join(str(e) for e in sorted(errores)) if errores else "0"
+    return (
+        f"{v[0]:.4f},{v[1]:.4f},{v[2]:.4f},{v[3]:.4f},"
+        f"{v[4]:.2f},{v[5]:.2f},{v[6]:.2f},"
+        f"{v[7]:.4f},{v[8]:.4f},{v[9]:.4f},"
+        f"{v[10]:.4f},{v[11]:.4f},{v[12]:.4f},"
+        f"{v[13]:.4f},{v[14]:.4f},{v[15]:.4f},"
+        f"{v[16]:.2f},"
+        f"{v[17]:.3f},{v[18]:.3f},{v[19]:.3f},"
+        f"{errores_str}"
+    ).encode("utf-8")
+
+def decodificar_antes(data):
+    """logger_3.py original: split + float() de los campos que usa."""
+    partes = data.decode().strip().split(",")
+    if len(partes) != 21:
+        return None
+    codigo = partes[-1]
+    errores = {int(x) for x in codigo.split("|") if x.isdigit()} if codigo != "0" else set()
+    return [float(p) for p in partes[:-1]], errores
+
+def medir(fn, argumentos):
+    """µs por llamada (sin retener resultados, como un receptor real)."""
+    t0 = time.perf_counter()
+    for a in argumentos:
+        fn(*a)
+    return (time.perf_counter() - t0) / len(argumentos) * 1e6
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--muestras", type=int, default=50000)
+    args = ap.parse_args()
+
+    muestras = list(muestras_aleatorias(args.muestras))
+    con_secuencia = [(i, i * 0.05, v, e) for i, (v, e) in enumerate(muestras)]
+
+    csv = [codificar_antes(*m) for m in muestras]
+    binarios = [telemetria.codificar(*m) for m in con_secuencia]
+
+    t_cod_antes = medir(codificar_antes, muestras)
+    t_dec_antes = medir(decodificar_antes, [(d,) for d in csv])
+    t_cod = medir(telemetria.codificar, con_secuencia)
+    t_dec = medir(telemetria.decodificar, [(d,) for d in binarios])
+    t_dec_csv = medir(telemetria.decodificar, [(d,) for d in csv])
+
+    # float32 guarda ~7 cifras significativas: error relativo ≤ 2**-24 ≈ 6e-8
+    error_maximo, errores_distintos = 0.0, 0
+    for (valores, errores), datos in zip(muestras, binarios):
+        muestra = telemetria.decodificar(datos)
+        for campo, valor in zip(telemetria.CAMPOS, valores):
+            error_maximo = max(error_maximo, abs(muestra[campo] - valor) / abs(valor))
+        errores_distintos += set(muestra["errores"]) != errores - {0}
+    largo_csv = sum(map(len, csv)) / len(csv)
+
+    print(f"{'':>14}{'codificar µs':>14}{'decodificar µs':>16}{'total µs':>10}{'bytes':>8}")
+    print(f"{'CSV (antes)':>14}{t_cod_antes:>14.2f}{t_dec_antes:>16.2f}{t_cod_antes + t_dec_antes:>10.2f}{largo_csv:>8.1f}")
+    print(f"{'binario':>14}{t_cod:>14.2f}{t_dec:>16.2f}{t_cod + t_dec:>10.2f}{telemetria.LARGO:>8}")
+    print(f"{'CSV → dict':>14}{'':>14}{t_dec_csv:>16.2f}")
+    print(f"x{(t_cod_antes + t_dec_antes) / (t_cod + t_dec):.1f} más rápido; "
+          f"error relativo máximo de float32 {error_maximo:.1e}; "
+          f"{errores_distintos} muestras con errores distintos")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+# ===============================================================
+# 🐟 BENCH — bucle principal de v25.py sobre hardware simulado
+# ===============================================================
+# Corre inicializar() + bucle_principal() con TILAPIA_HAL=sim y reloj
+# virtual (sin Raspberry, sin Arduino, sin DS18B20) y mide:
+#   - iteraciones del bucle por segundo real
+#   - segundos simulados por segundo real (factor sobre tiempo real)
+# La salida de consola de v25 se descarta durante la medición.
+#
+# Uso: python3 bench_v25_sim.py [--iteraciones 20000]
+
+import argparse
+import contextlib
+import os
+import sys
+import time
+
+os.environ.setdefault("TILAPIA_HAL", "sim")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../PID"))
+
+import v25
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--iteraciones", type=int, default=20000)
+    args = ap.parse_args()
+
+    v25.TCP_PORT = 0                     # puerto libre cualquiera: no choca con una instancia real
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        v25.inicializar()
+        inicio_sim = v25.reloj.monotonic()
+        t0 = time.perf_counter()
+        v25.bucle_principal(max_iteraciones=args.iteraciones)
+        real = time.perf_counter() - t0
+        simulado = v25.reloj.monotonic() - inicio_sim
+        v25.liberar_recursos()
+
+    print(f"backend: {v25.hw.nombre}  iteraciones: {args.iteraciones}")
+    print(f"tiempo real:     {real:.2f} s  ({args.iteraciones / real:.0f} iteraciones/s)")
+    print(f"tiempo simulado: {simulado:.0f} s  (x{simulado / real:.0f} tiempo real)")
+    print(f"errores activos al final: {sorted(v25.controladores[v25.ESTANQUE_POR_DEFECTO].errores_activos)}")
+
+if __name__ == "__main__":
+    main()
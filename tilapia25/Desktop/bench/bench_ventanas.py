@@ -0,0 +1,64 @@
+# ===============================================================
+# 🐟 BENCH — costo por muestra del historial de verificar_sensores
+# ===============================================================
+# Compara, para una sola variable y distintos tamaños de ventana:
+#   - antes:   lista + pop(0) + max()/min() + statistics.pstdev() por muestra
+#   - después: VentanaMovil (buffer circular, deques monótonas, Welford)
+# y verifica que ambos den las mismas decisiones (congelado / fluctuación).
+#
+# Uso: python3 bench_ventanas.py [--muestras 20000]
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../PID"))
+from ventanas import VentanaMovil
+
+VAR_MIN = 0.001
+UMBRAL = 1.2
+
+def antes(valores, tamano):
+    hist, decisiones = [], []
+    for x in valores:
+        hist.append(x)
+        if len(hist) > tamano: hist.pop(0)
+        congelado = len(hist) == tamano and (max(hist) - min(hist)) < VAR_MIN
+        fluctua = len(hist) >= 10 and statistics.pstdev(hist) > UMBRAL
+        decisiones.append((congelado, fluctua))
+    return decisiones
+
+def despues(valores, tamano):
+    hist, decisiones = VentanaMovil(tamano), []
+    for x in valores:
+        hist.agregar(x)
+        congelado = hist.lleno() and (hist.maximo() - hist.minimo()) < VAR_MIN
+        fluctua = len(hist) >= 10 and hist.desviacion_supera(UMBRAL)
+        decisiones.append((congelado, fluctua))
+    return decisiones
+
+def medir(fn, valores, tamano):
+    t0 = time.perf_counter()
+    r = fn(valores, tamano)
+    return (time.perf_counter() - t0) / len(valores) * 1e6, r
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--muestras", type=int, default=20000)
+    args = ap.parse_args()
+
+    random.seed(0)
+    valores = [7.0 + random.gauss(0, 1.2) for _ in range(args.muestras)]
+
+    print(f"{'ventana':>8}{'antes µs/muestra':>20}{'después µs/muestra':>22}{'x':>8}")
+    for tamano in (50, 200, 10000):
+        t_antes, r_antes = medir(antes, valores, tamano)
+        t_despues, r_despues = medir(despues, valores, tamano)
+        aviso = "" if r_antes == r_despues else "  ¡decisiones distintas!"
+        print(f"{tamano:>8}{t_antes:>20.2f}{t_despues:>22.2f}{t_antes / t_despues:>8.1f}" + aviso)
+
+if __name__ == "__main__":
+    main()
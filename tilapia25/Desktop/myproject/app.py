@@ -1,9 +1,12 @@
-from flask import Flask, jsonify, render_template, request
+from flask import Flask, jsonify, render_template, request, Response, stream_with_context, g, has_app_context
 import sqlite3
 import os
+import sys
 import socket
 import threading
+import queue
 import json
+from collections import deque
 from datetime import datetime, timedelta
 import time
 import requests 
@@ -14,7 +17,13 @@ import requests
 app = Flask(__name__, template_folder="templates", static_folder="static")
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_FILE = os.path.join(BASE_DIR, "../PID/monitoreo.db")
+PID_DIR = os.path.join(BASE_DIR, "../PID")
+DB_FILE = os.environ.get("MONITOREO_DB", os.path.join(PID_DIR, "monitoreo.db"))
+
+# Módulos compartidos con el logger (esquema de la BD, telemetría)
+sys.path.insert(0, PID_DIR)
+from esquema_bd import inicializar_esquema
+import telemetria
 
 # ===============================
 # CLIMA DE OPEN WEATHER KEY
@@ -28,46 +37,151 @@ _clima_cache = {
 	"expira": datetime.min,
 }
 simul_api_calls = 0
-estado_v24 = {} #variable global en flask
+estado_v24 = {} #variable global en flask (estado del ESTANQUE_POR_DEFECTO)
 
 # ===============================
-# HELPERS BD
+# ESTANQUES
 # ===============================
-def get_db():
-    conn = sqlite3.connect(DB_FILE, timeout=0.5)
+# v25 controla uno o más estanques; la telemetría, el estado y las tablas
+# traen el número. Las rutas aceptan ?estanque=n (o "estanque" en el JSON
+# de los POST); sin él se usa el estanque por defecto.
+ESTANQUE_POR_DEFECTO = telemetria.ESTANQUE_POR_DEFECTO
+
+# ===============================
+# STREAM EN VIVO (SSE)
+# ===============================
+INTERVALO_DIFUSION = 1.0      # s entre lecturas de BD del productor del stream
+SSE_KEEPALIVE = 15.0          # s sin eventos → comentario para mantener la conexión
+SSE_MAX_COLA = 100            # eventos retenidos por cliente lento (descarta los más viejos)
+
+# ===============================
+# TELEMETRÍA EN MEMORIA (UDP desde v25)
+# ===============================
+UDP_PORT_TELEMETRIA = 5007    # v25 envía aquí cada muestra (mismo datagrama que al logger, ver telemetria.py)
+HISTORIAL_MAX = 200           # muestras que devuelve /api/historial
+HISTORIAL_INTERVALO = 5.0     # s entre muestras del historial (igual que el logger)
+
+# ===============================
+# NOTIFICACIONES DE ERRORES
+# ===============================
+INTERVALO_NOTIFICADOR = 2.0   # s entre revisiones de errores_log por el hilo notificador
+ERRORES_CACHE_TTL = 1.0       # s que se reutiliza la respuesta de /api/errores_pendientes
+
+# ===============================
+# COMANDOS TCP A v25 (conexión persistente)
+# ===============================
+V25_HOST = "127.0.0.1"
+V25_PUERTO_COMANDOS = 5010
+TCP_TIMEOUT_RESPUESTA = 2.0   # s que un request espera la respuesta de v25
+TCP_ESPERA_RECONEXION = 1.0   # s mínimos entre intentos de conexión fallidos
+TCP_MUESTRAS_RTT = 500        # latencias recientes para /api/tcp_metricas
+
+# ===============================
+# HELPERS BD (pool de conexiones)
+# ===============================
+DB_POOL_MAX = 8               # conexiones libres que se conservan para reutilizar
+
+# Se aplican UNA vez por conexión, no en cada request
+DB_PRAGMAS = (
+    "PRAGMA journal_mode=WAL;",
+    "PRAGMA synchronous=NORMAL;",
+    "PRAGMA cache_size=-8000;",         # ~8 MB de caché de páginas
+    "PRAGMA mmap_size=67108864;",       # 64 MB mapeados en memoria
+    "PRAGMA busy_timeout=500;",         # igual al timeout=0.5 de antes
+)
+
+def _abrir_conexion():
+    conn = sqlite3.connect(DB_FILE, timeout=0.5, check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    for pragma in DB_PRAGMAS:
+        conn.execute(pragma)
     return conn
 
-def init_wal():
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        conn.execute("PRAGMA journal_mode=WAL;")
-        conn.commit()
-        conn.close()
-    except:
-        pass
+class PoolConexiones:
+    """
+    Conexiones SQLite ya configuradas que se reutilizan entre requests.
+    El servidor de Flask crea un hilo por request, así que la reutilización
+    se hace devolviendo la conexión al pool al terminar el contexto.
+    """
+
+    def __init__(self, max_libres=DB_POOL_MAX):
+        self.max_libres = max_libres
+        self.libres = queue.LifoQueue()     # LIFO: la más usada queda "caliente"
+
+    def obtener(self):
+        try:
+            return self.libres.get_nowait()
+        except queue.Empty:
+            return _abrir_conexion()
+
+    def devolver(self, conn, error=None):
+        # Tras un error de SQLite la conexión no se reutiliza
+        reutilizable = not isinstance(error, sqlite3.Error)
+        try:
+            if conn.in_transaction:
+                conn.rollback()             # nunca devolver una transacción abierta
+        except sqlite3.Error:
+            reutilizable = False
 
-init_wal()
+        if reutilizable and self.libres.qsize() < self.max_libres:
+            self.libres.put(conn)
+        else:
+            conn.close()
+
+pool_bd = PoolConexiones()
+_db_local = threading.local()
+
+def get_db():
+    """
+    Dentro de un request: conexión del pool, devuelta en liberar_db().
+    En hilos de fondo (notificador, stream, arranque): una conexión
+    propia del hilo que vive lo mismo que él.
+    """
+    if has_app_context():
+        if "db" not in g:
+            g.db = pool_bd.obtener()
+        return g.db
+
+    conn = getattr(_db_local, "conn", None)
+    if conn is None:
+        conn = _db_local.conn = _abrir_conexion()
+    return conn
+
+@app.teardown_appcontext
+def liberar_db(exc):
+    conn = g.pop("db", None)
+    if conn is not None:
+        pool_bd.devolver(conn, exc)
 
 # -------------------------------
 # GUARDAR NOTIFICACIONES (seguro)
 # -------------------------------
-def push_notificacion(tipo, mensaje):
+def push_notificacion(tipo, mensaje, hora=None):
     """Inserta una notificación sin bloquear si la BD está ocupada."""
-    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return push_notificaciones([(tipo, mensaje, hora)])
+
+
+def push_notificaciones(avisos):
+    """
+    Inserta varias notificaciones [(tipo, mensaje, hora|None), ...] en una
+    sola transacción, con reintentos si la BD está ocupada.
+    """
+    ahora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    filas = [(tipo, mensaje, hora or ahora) for tipo, mensaje, hora in avisos]
 
+    conn = get_db()
     for _ in range(8):  # hasta 8 reintentos
         try:
-            conn = sqlite3.connect(DB_FILE, timeout=0.3)  # timeout corto
             cur = conn.cursor()
-            cur.execute("""
+            cur.executemany("""
                 INSERT INTO notificaciones (tipo, mensaje, hora, leida)
                 VALUES (?, ?, ?, 0)
-            """, (tipo, mensaje, ts))
+            """, filas)
             conn.commit()
-            conn.close()
             return True
         except sqlite3.OperationalError as e:
+            if conn.in_transaction:
+                conn.rollback()
             if "locked" in str(e).lower():
                 time.sleep(0.12)
                 continue
@@ -96,25 +210,349 @@ def safe_update(conn, query, params=()):
     return False
 
 
+# ===============================
+# DIFUSOR EN PROCESO (fan-out a clientes SSE)
+# ===============================
+class Difusor:
+    """
+    Un productor publica cada evento UNA vez (se serializa una sola vez) y
+    se copia a la cola de cada cliente conectado. N teléfonos abiertos
+    cuestan una lectura de BD por actualización, no N.
+    """
+
+    def __init__(self, max_cola=SSE_MAX_COLA):
+        self.lock = threading.Lock()
+        self.max_cola = max_cola
+        self.clientes = set()
+        self.retenidos = {}         # último mensaje por evento, para quien recién se conecta
+
+    def suscribir(self):
+        q = queue.Queue(maxsize=self.max_cola)
+        with self.lock:
+            self.clientes.add(q)
+            for msg in self.retenidos.values():
+                q.put_nowait(msg)
+        return q
+
+    def desuscribir(self, q):
+        with self.lock:
+            self.clientes.discard(q)
+
+    def hay_clientes(self):
+        return bool(self.clientes)
+
+    def publicar(self, evento, datos, retener=False):
+        msg = f"event: {evento}\ndata: {json.dumps(datos)}\n\n"
+        with self.lock:
+            if retener:
+                self.retenidos[evento] = msg
+            for q in self.clientes:
+                try:
+                    q.put_nowait(msg)
+                except queue.Full:
+                    # Cliente lento: se descarta el evento más viejo
+                    try: q.get_nowait()
+                    except queue.Empty: pass
+                    try: q.put_nowait(msg)
+                    except queue.Full: pass
+
+difusor = Difusor()
+
+# ===============================
+# CACHÉ DE TELEMETRÍA (última muestra + historial corto)
+# ===============================
+class CacheTelemetria:
+    """
+    Última muestra recibida de v25 y un anillo con las más recientes
+    (una cada HISTORIAL_INTERVALO s, la más nueva primero). Protegido con
+    lock: lo escribe el hilo UDP y lo leen los workers de Flask.
+    """
+
+    def __init__(self, max_historial=HISTORIAL_MAX, intervalo=HISTORIAL_INTERVALO):
+        self.lock = threading.Lock()
+        self.intervalo = intervalo
+        self._ultima = None
+        self._historial = deque(maxlen=max_historial)
+        self._t_historial = 0.0
+
+    def actualizar(self, muestra):
+        ahora = time.time()
+        with self.lock:
+            self._ultima = muestra
+            if ahora - self._t_historial >= self.intervalo:
+                self._historial.appendleft(muestra)
+                self._t_historial = ahora
+
+    def precargar(self, muestras):
+        """Rellena el historial desde la BD al arrancar (lista, más nueva primero)."""
+        with self.lock:
+            if self._historial:
+                return
+            self._historial.extend(muestras)
+            if self._ultima is None and muestras:
+                self._ultima = muestras[0]
+
+    def ultima(self):
+        with self.lock:
+            return self._ultima
+
+    def historial(self):
+        with self.lock:
+            return list(self._historial)
+
+caches_telemetria = {ESTANQUE_POR_DEFECTO: CacheTelemetria()}   # estanque → caché
+_caches_lock = threading.Lock()
+
+def cache_telemetria(estanque=ESTANQUE_POR_DEFECTO):
+    """Caché del estanque (la crea el hilo UDP con la primera muestra)."""
+    with _caches_lock:
+        cache = caches_telemetria.get(estanque)
+        if cache is None:
+            cache = caches_telemetria[estanque] = CacheTelemetria()
+        return cache
+
+def estanque_pedido(por_defecto=ESTANQUE_POR_DEFECTO):
+    """?estanque=n del request; ValueError si no es un entero."""
+    valor = request.args.get("estanque")
+    if valor in (None, ""):
+        return por_defecto
+    return int(valor)
+
 # ===============================
 # TCP → V24
 # ===============================
-def enviar_tcp(comando):
-    HOST = "127.0.0.1"
-    PORT = 5010  
+class ClienteComandos:
+    """
+    Conexión TCP persistente con v25. Cada comando es una línea y v25
+    responde una línea JSON {"ok", "comando", "motivo"} en el mismo orden,
+    así que varios requests pueden mandar comandos a la vez (pipelining):
+    cada uno deja un casillero en la cola de pendientes y el hilo lector
+    los completa en orden. Si la conexión se cae, el próximo comando
+    reconecta.
+    """
 
-    try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(1.0)
-        sock.connect((HOST, PORT))
-        sock.sendall(comando.encode())
-        sock.close()
-        print(f"[FLASK → V24] TCP enviado: {comando}")
+    def __init__(self, host, puerto):
+        self.host = host
+        self.puerto = puerto
+        self.lock = threading.Lock()         # envío + orden de pendientes
+        self.sock = None
+        self.pendientes = deque()            # casilleros en orden de envío
+        self.ultimo_fallo = 0.0
+        self.rtt = deque(maxlen=TCP_MUESTRAS_RTT)
+        self.contadores = {"enviados": 0, "aceptados": 0, "rechazados": 0,
+                           "sin_respuesta": 0, "errores": 0, "conexiones": 0}
+
+    def enviar(self, comando):
+        """
+        Devuelve (ok, motivo, respondio) con la respuesta real de v25.
+        respondio=False: no hubo respuesta (sin conexión, timeout o comando
+        que ni se envió); ok=False con respondio=True: v25 lo rechazó.
+        """
+        comando = comando.strip()
+        if not comando or "\n" in comando or len(comando) > 200:
+            return False, "comando inválido", False
+
+        casillero = {"comando": comando, "listo": threading.Event(), "respuesta": None}
+        with self.lock:
+            try:
+                sock = self._conectar()
+                casillero["t0"] = time.perf_counter()
+                self.pendientes.append(casillero)
+                sock.sendall(comando.encode() + b"\n")
+                self.contadores["enviados"] += 1
+            except OSError as e:
+                if self.pendientes and self.pendientes[-1] is casillero:
+                    self.pendientes.pop()
+                self._cerrar()
+                self.contadores["errores"] += 1
+                print(f"⚠️ Error TCP desde Flask: {e}")
+                return False, f"sin conexión con v25: {e}", False
+
+        if not casillero["listo"].wait(TCP_TIMEOUT_RESPUESTA):
+            self._contar("sin_respuesta")
+            return False, "v25 no respondió a tiempo", False
+        respuesta = casillero["respuesta"]
+        if respuesta is None:
+            self._contar("errores")
+            return False, "se perdió la conexión con v25", False
+
+        ok = bool(respuesta.get("ok"))
+        self._contar("aceptados" if ok else "rechazados")
+        print(f"[FLASK → V24] {comando} → {'OK' if ok else 'RECHAZADO'}: {respuesta.get('motivo')}")
+        return ok, respuesta.get("motivo", ""), True
+
+    def _contar(self, contador):
+        with self.lock:
+            self.contadores[contador] += 1
+
+    def metricas(self):
+        with self.lock:
+            rtt = sorted(self.rtt)
+            conectado = self.sock is not None
+            pendientes = len(self.pendientes)
+            contadores = dict(self.contadores)
+        def percentil(p):
+            return round(rtt[min(len(rtt) - 1, int(p * len(rtt)))] * 1000, 2) if rtt else None
+        return {
+            "conectado": conectado,
+            "pendientes": pendientes,
+            **contadores,
+            "rtt_ms": {"muestras": len(rtt), "p50": percentil(0.50), "p95": percentil(0.95),
+                       "max": round(rtt[-1] * 1000, 2) if rtt else None},
+        }
+
+    # --- con self.lock tomado ---
+    def _conectar(self):
+        if self.sock is not None:
+            return self.sock
+        if time.monotonic() - self.ultimo_fallo < TCP_ESPERA_RECONEXION:
+            raise OSError("v25 no disponible (reintento en curso)")
+        try:
+            sock = socket.create_connection((self.host, self.puerto), timeout=1.0)
+        except OSError:
+            self.ultimo_fallo = time.monotonic()
+            raise
+        # sendall corre con self.lock tomado: si v25 deja de leer, falla en vez
+        # de trabar a todos los requests. El hilo lector ignora el timeout.
+        sock.settimeout(TCP_TIMEOUT_RESPUESTA)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock = sock
+        self.contadores["conexiones"] += 1
+        threading.Thread(target=self._leer, args=(sock,), daemon=True).start()
+        return sock
+
+    def _cerrar(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+        while self.pendientes:                # nadie va a responder a estos
+            self.pendientes.popleft()["listo"].set()
+
+    # --- hilo lector, uno por conexión ---
+    def _leer(self, sock):
+        buffer = b""
+        try:
+            while True:
+                try:
+                    datos = sock.recv(4096)
+                except socket.timeout:
+                    continue                 # sin respuestas por ahora: seguir esperando
+                if not datos:
+                    break
+                *lineas, buffer = (buffer + datos).split(b"\n")
+                for linea in lineas:
+                    if not self._entregar(sock, linea):
+                        return
+        except (OSError, ValueError):
+            pass
+        with self.lock:
+            if sock is self.sock:            # v25 cerró o se reinició
+                self._cerrar()
+
+    def _entregar(self, sock, linea):
+        """Completa el casillero más antiguo con una respuesta. False si hay que dejar de leer."""
+        ahora = time.perf_counter()
+        respuesta = json.loads(linea.decode())
+        with self.lock:
+            if sock is not self.sock:
+                return False
+            casillero = self.pendientes.popleft() if self.pendientes else None
+            if casillero is None or respuesta.get("comando") != casillero["comando"]:
+                print("⚠️ Respuesta TCP fuera de orden; se reinicia la conexión con v25")
+                if casillero is not None:
+                    casillero["listo"].set()
+                self._cerrar()
+                return False
+            self.rtt.append(ahora - casillero["t0"])
+        casillero["respuesta"] = respuesta
+        casillero["listo"].set()
         return True
-    except Exception as e:
-        print(f"⚠️ Error TCP desde Flask: {e}")
-        return False
-        
+
+cliente_comandos = ClienteComandos(V25_HOST, V25_PUERTO_COMANDOS)
+
+def enviar_tcp(comando):
+    """
+    Envía un comando a v25 por la conexión persistente y devuelve
+    (ok, motivo, respondio): ok=False si v25 lo rechazó (respondio=True),
+    no respondió o no hay conexión (respondio=False).
+    """
+    return cliente_comandos.enviar(comando)
+
+class ReceptorEstado:
+    """
+    Reconstruye el estado de v25 a partir de lo que manda su publicador
+    (PID/publicador_estado.py): estados completos (latido) y deltas con
+    número de secuencia. Si falta una secuencia, la copia queda marcada
+    como no sincronizada hasta el próximo estado completo.
+    """
+
+    def __init__(self):
+        self.estado = {}
+        self.seq = None
+        self.sincronizado = False
+        self.recibidos = 0
+        self.completos = 0
+        self.deltas = 0
+        self.perdidos = 0           # mensajes que faltaron según la secuencia
+        self.huecos = 0             # veces que se detectó un salto
+
+    def aplicar(self, mensaje):
+        """Aplica un mensaje y devuelve el estado resultante (un dict nuevo)."""
+        self.recibidos += 1
+        if "seq" not in mensaje:            # v25 anterior: siempre el estado completo
+            self.completos += 1
+            self.sincronizado = True
+            self.estado = mensaje
+            return mensaje
+
+        seq = mensaje["seq"]
+        completo = mensaje.get("completo", False)
+        hueco = False
+        if self.seq is not None and seq != self.seq + 1:
+            if seq > self.seq + 1:
+                self.perdidos += seq - self.seq - 1
+                hueco = True
+            elif not completo:
+                hueco = True                 # v25 se reinició y se perdió su primer estado completo
+        self.seq = seq
+        if hueco:
+            self.huecos += 1
+            print(f"[WARN] Estado de v25: salto de secuencia (llegó {seq}), esperando el próximo completo")
+
+        if completo:
+            self.completos += 1
+            nuevo = dict(mensaje["estado"])
+            self.sincronizado = True
+        else:
+            self.deltas += 1
+            nuevo = dict(self.estado)
+            nuevo.update(mensaje.get("cambios", {}))
+            for clave in mensaje.get("borrados", ()):
+                nuevo.pop(clave, None)
+            if hueco:
+                self.sincronizado = False
+        nuevo["timestamp"] = mensaje.get("timestamp")
+        self.estado = nuevo
+        return nuevo
+
+    def metricas(self):
+        return {
+            "sincronizado": self.sincronizado,
+            "seq": self.seq,
+            "recibidos": self.recibidos,
+            "completos": self.completos,
+            "deltas": self.deltas,
+            "perdidos": self.perdidos,
+            "huecos": self.huecos,
+        }
+
+# Cada estanque tiene su publicador y su secuencia en v25 → un receptor por estanque
+receptores_estado = {ESTANQUE_POR_DEFECTO: ReceptorEstado()}
+estados_v24 = {}
+
 def hilo_udp_estado_v24():
     global estado_v24
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -122,34 +560,62 @@ def hilo_udp_estado_v24():
     print("[FLASK] UDP estado escuchando en 6000...")
 
     while True:
-        data, addr = sock.recvfrom(4096)
+        data, addr = sock.recvfrom(65535)
         try:
-            estado_v24 = json.loads(data.decode())
-        except:
-            pass
+            mensaje = json.loads(data.decode())
+            estanque = int(mensaje.get("estanque", ESTANQUE_POR_DEFECTO))
+            receptor = receptores_estado.setdefault(estanque, ReceptorEstado())
+            estados_v24[estanque] = estado = receptor.aplicar(mensaje)
+        except Exception:
+            continue
+
+        # v25 ya solo envía cambios y un latido cada pocos segundos:
+        # cada mensaje es una actualización para el stream (la interfaz
+        # muestra el estanque por defecto; los demás se consultan por la API)
+        if estanque == ESTANQUE_POR_DEFECTO:
+            estado_v24 = estado
+            difusor.publicar("estado_v24", estado_v24, retener=True)
 
 # lanzar hilo
 threading.Thread(target=hilo_udp_estado_v24, daemon=True).start()
 
-#Registrar tabla acciones_manual si no existe
-def init_tabla_acciones_manual():
+def parsear_telemetria(data):
+    """Datagrama de telemetría de v25 → muestra con el formato de /api/historial."""
+    datos = telemetria.decodificar(data)      # ValueError si no sirve
+    ahora = datetime.now()
+    return {
+        "estanque": datos["estanque"],
+        "fecha": ahora.strftime("%Y-%m-%d"),
+        "hora": ahora.strftime("%H:%M:%S"),
+        "ph": round(datos["ph"], 4),
+        "o2": round(datos["o2"], 4),
+        "temp": round(datos["temp"], 2),
+        "error": telemetria.errores_a_texto(datos["errores"]),
+    }
+
+def hilo_udp_telemetria():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("0.0.0.0", UDP_PORT_TELEMETRIA))
+    print(f"[FLASK] UDP telemetría escuchando en {UDP_PORT_TELEMETRIA}...")
+
+    while True:
+        data, addr = sock.recvfrom(1024)
+        try:
+            muestra = parsear_telemetria(data)
+        except ValueError:
+            continue
+        if muestra:
+            cache_telemetria(muestra["estanque"]).actualizar(muestra)
+
+threading.Thread(target=hilo_udp_telemetria, daemon=True).start()
+
+#Registrar tablas (acciones_manual, lecturas, ...), migraciones e índices
+def init_esquema():
     conn = get_db()
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS acciones_manual (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            fecha TEXT NOT NULL,
-            hora TEXT NOT NULL,
-            accion TEXT NOT NULL,
-            descripcion TEXT NOT NULL,
-            valor TEXT,
-            estanque INTEGER DEFAULT 1
-        )
-    """)
-    conn.commit()
-    conn.close()
+    inicializar_esquema(conn)
 
 # Llamalo al iniciar la app
-init_tabla_acciones_manual()
+init_esquema()
 
 # Registrar acción manual
 def registrar_accion_manual(accion, descripcion, valor=None, estanque=1):
@@ -163,7 +629,6 @@ def registrar_accion_manual(accion, descripcion, valor=None, estanque=1):
         VALUES (?, ?, ?, ?, ?, ?)
     """, (fecha, hora, accion, descripcion, valor, estanque))
     conn.commit()
-    conn.close()
 
 
 def interpretar_cmd(cmd):
@@ -246,25 +711,42 @@ def index():
 # ===============================
 # API: Última lectura sensores
 # ===============================
-@app.route("/api/sensores")
-def api_sensores():
-    conn = get_db()
+def leer_ultima_lectura(conn, estanque=ESTANQUE_POR_DEFECTO):
     row = conn.execute("""
         SELECT ph, o2, temp, codigo_error
         FROM lecturas
-        ORDER BY id DESC LIMIT 1
-    """).fetchone()
-    conn.close()
+        WHERE estanque = ?
+        ORDER BY ts DESC, id DESC LIMIT 1
+    """, (estanque,)).fetchone()
 
     if not row:
-        return jsonify({"ph": None, "o2": None, "temp": None, "error": 0})
+        return {"ph": None, "o2": None, "temp": None, "error": 0}
 
-    return jsonify({
+    return {
         "ph": row["ph"],
         "o2": row["o2"],
         "temp": row["temp"],
         "error": row["codigo_error"]
-    })
+    }
+
+def ultima_lectura(estanque=ESTANQUE_POR_DEFECTO):
+    """Última muestra desde memoria; la BD solo si aún no llegó telemetría."""
+    cache = caches_telemetria.get(estanque)
+    m = cache.ultima() if cache else None
+    if m is not None:
+        return {"ph": m["ph"], "o2": m["o2"], "temp": m["temp"], "error": m["error"]}
+
+    conn = get_db()
+    datos = leer_ultima_lectura(conn, estanque)
+    return datos
+
+@app.route("/api/sensores")
+def api_sensores():
+    try:
+        estanque = estanque_pedido()
+    except ValueError:
+        return jsonify({"ok": False, "msg": "estanque inválido"}), 400
+    return jsonify(ultima_lectura(estanque))
     
 # ===============================
 # API: CLIMA REAL + CACHÉ OPENWEATHER
@@ -335,73 +817,120 @@ def api_clima():
         })
 
 
+# ===============================
+# NOTIFICADOR DE ERRORES (hilo de fondo)
+# ===============================
+def generar_notificaciones_de_errores(conn):
+    """
+    Convierte inicios/fines de error del logger en notificaciones.
+    Todo en UNA transacción: o se insertan las notificaciones y se marcan
+    los errores, o no pasa nada y se reintenta en la próxima vuelta.
+    Devuelve la cantidad de notificaciones creadas.
+    """
+    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    with conn:
+        # ====== 1. Comienzos de error ======
+        nuevos = conn.execute("""
+            SELECT id, codigo, descripcion, estanque
+            FROM errores_log
+            WHERE hora_inicio IS NOT NULL AND notificado_inicio = 0
+        """).fetchall()
+
+        # ====== 2. Errores resueltos ======
+        resueltos = conn.execute("""
+            SELECT id, codigo, descripcion, estanque
+            FROM errores_log
+            WHERE hora_fin IS NOT NULL AND notificado_fin = 0
+        """).fetchall()
+
+        def donde(r):
+            # Las notificaciones son de todo el sistema: se nombra el estanque si no es el por defecto
+            estanque = r["estanque"] or ESTANQUE_POR_DEFECTO
+            return "" if estanque == ESTANQUE_POR_DEFECTO else f"Estanque {estanque}: "
+
+        conn.executemany("""
+            INSERT INTO notificaciones (tipo, mensaje, hora, leida)
+            VALUES (?, ?, ?, 0)
+        """, [("error", f"⚠️ {donde(r)}Error [{r['codigo']}] {r['descripcion']} detectado", ts) for r in nuevos] +
+             [("resuelto", f"✔️ {donde(r)}Error [{r['codigo']}] {r['descripcion']} resuelto", ts) for r in resueltos])
+
+        conn.executemany("UPDATE errores_log SET notificado_inicio = 1 WHERE id = ?",
+                         [(r["id"],) for r in nuevos])
+        conn.executemany("UPDATE errores_log SET notificado_fin = 1 WHERE id = ?",
+                         [(r["id"],) for r in resueltos])
+
+    return len(nuevos) + len(resueltos)
+
+def hilo_notificador_errores():
+    """Único escritor de notificaciones de error; los GET ya no escriben."""
+    while True:
+        time.sleep(INTERVALO_NOTIFICADOR)
+        try:
+            if generar_notificaciones_de_errores(get_db()):
+                invalidar_errores_cache()
+        except sqlite3.Error as e:
+            print("⚠️ Notificador de errores (se reintenta):", e)
+
+_errores_cache = {}                 # estanque (None = todos) → (expira, respuesta)
+_errores_lock = threading.Lock()
+
+def invalidar_errores_cache():
+    with _errores_lock:
+        _errores_cache.clear()
+
+threading.Thread(target=hilo_notificador_errores, daemon=True).start()
+
 # ===============================
 # API: Errores pendientes (multiusuario)
 # ===============================
 @app.route("/api/errores_pendientes")
 def api_errores_pendientes():
-    conn = get_db()
-    cur = conn.cursor()
+    """
+    Solo lectura; la respuesta se comparte entre clientes por ERRORES_CACHE_TTL s.
+    ?estanque=n deja solo los errores de ese estanque (sin él, todos).
+    """
+    try:
+        estanque = estanque_pedido(por_defecto=None)
+    except ValueError:
+        return jsonify({"ok": False, "msg": "estanque inválido"}), 400
 
-    # ====== 1. Notificar comienzos de error ======
-    nuevos = cur.execute("""
-        SELECT id, codigo, descripcion
-        FROM errores_log
-        WHERE hora_inicio IS NOT NULL AND notificado_inicio = 0
-    """).fetchall()
+    ahora = time.time()
+    with _errores_lock:
+        expira, ultimo = _errores_cache.get(estanque, (0.0, None))
+        if ahora < expira:
+            return jsonify(ultimo)
 
-    for r in nuevos:
-        ok = push_notificacion(
-            "error",
-            f"⚠️ Error [{r['codigo']}] {r['descripcion']} detectado"
-        )
-        if ok:
-            cur.execute("""
-                UPDATE errores_log
-                SET notificado_inicio = 1
-                WHERE id = ?
-            """, (r["id"],))
-            conn.commit()
+    datos = leer_errores_pendientes(estanque)
 
-    # ====== 2. Notificar errores resueltos ======
-    resueltos = cur.execute("""
-        SELECT id, codigo, descripcion
-        FROM errores_log
-        WHERE hora_fin IS NOT NULL AND notificado_fin = 0
-    """).fetchall()
+    with _errores_lock:
+        _errores_cache[estanque] = (ahora + ERRORES_CACHE_TTL, datos)
 
-    for r in resueltos:
-        ok = push_notificacion(
-            "resuelto",
-            f"✔️ Error [{r['codigo']}] {r['descripcion']} resuelto"
-        )
-        if ok:
-            cur.execute("""
-                UPDATE errores_log
-                SET notificado_fin = 1
-                WHERE id = ?
-            """, (r["id"],))
-            conn.commit()
+    return jsonify(datos)
 
-    # ====== 3. Enviar errores pendientes para la UI ======
-    rows = cur.execute("""
-        SELECT id, codigo, descripcion, hora_inicio, hora_fin
+def leer_errores_pendientes(estanque=None):
+    conn = get_db()
+    q = """
+        SELECT id, codigo, descripcion, hora_inicio, hora_fin, estanque
         FROM errores_log
         WHERE resuelto = 0
-        ORDER BY hora_inicio ASC
-    """).fetchall()
+    """
+    params = []
+    if estanque is not None:
+        q += " AND estanque = ?"
+        params.append(estanque)
+    rows = conn.execute(q + " ORDER BY hora_inicio ASC", params).fetchall()
 
-    conn.close()
 
     if not rows:
-        return jsonify({
+        return {
             "hay_error": False,
             "errores": [],
             "hay_activos": False,
             "todos_resueltos": True,
             "reiniciar_ph": False,
             "reiniciar_o2": False
-        })
+        }
 
     errores = []
     hay_activos = False
@@ -419,7 +948,8 @@ def api_errores_pendientes():
             "codigo": codigo,
             "descripcion": r["descripcion"],
             "hora_inicio": r["hora_inicio"],
-            "hora_fin": r["hora_fin"]
+            "hora_fin": r["hora_fin"],
+            "estanque": r["estanque"]
         })
 
         if r["hora_fin"] is None:
@@ -433,14 +963,14 @@ def api_errores_pendientes():
             rein_ph = True
             rein_o2 = True
 
-    return jsonify({
+    return {
         "hay_error": True,
         "errores": errores,
         "hay_activos": hay_activos,
         "todos_resueltos": not hay_activos,
         "reiniciar_ph": rein_ph,
         "reiniciar_o2": rein_o2
-    })
+    }
 
 
 # ===============================
@@ -451,21 +981,27 @@ def api_reiniciar_pids():
     data = request.json
     rein_ph = bool(data.get("reiniciar_ph", False))
     rein_o2 = bool(data.get("reiniciar_o2", False))
+    try:
+        estanque = int(data.get("estanque", ESTANQUE_POR_DEFECTO))
+    except (TypeError, ValueError):
+        return jsonify({"ok": False, "msg": "estanque inválido"}), 400
 
-    ok_tcp = True
+    ok_tcp, motivo, respondio = True, "", True
 
     if rein_ph and rein_o2:
-        ok_tcp &= enviar_tcp("3")
+        ok_tcp, motivo, respondio = enviar_tcp(f"{estanque}:3")
     elif rein_ph:
-        ok_tcp &= enviar_tcp("1")
+        ok_tcp, motivo, respondio = enviar_tcp(f"{estanque}:1")
     elif rein_o2:
-        ok_tcp &= enviar_tcp("2")
+        ok_tcp, motivo, respondio = enviar_tcp(f"{estanque}:2")
 
     if not ok_tcp:
-        return jsonify({"ok": False, "msg": "tcp_fail"}), 500
+        if respondio:                   # v25 lo rechazó (bloqueo, cooldown...)
+            return jsonify({"ok": False, "msg": "rechazado", "motivo": motivo}), 409
+        return jsonify({"ok": False, "msg": "tcp_fail", "motivo": motivo}), 503
 
     # ====== Actualizar BD ======
-    conn = sqlite3.connect(DB_FILE, timeout=0.3)
+    conn = get_db()
     ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
     PID_PH = ('1', '4', '7', '11')
@@ -476,32 +1012,33 @@ def api_reiniciar_pids():
         safe_update(conn, """
             UPDATE errores_log
             SET hora_fin = ?, resuelto = 1
-            WHERE codigo IN (?, ?, ?, ?) AND resuelto = 0
-        """, (ts, *PID_PH))
+            WHERE codigo IN (?, ?, ?, ?) AND resuelto = 0 AND estanque = ?
+        """, (ts, *PID_PH, estanque))
 
     if rein_o2:
         safe_update(conn, """
             UPDATE errores_log
             SET hora_fin = ?, resuelto = 1
-            WHERE codigo IN (?, ?, ?, ?) AND resuelto = 0
-        """, (ts, *PID_O2))
+            WHERE codigo IN (?, ?, ?, ?) AND resuelto = 0 AND estanque = ?
+        """, (ts, *PID_O2, estanque))
 
     if rein_ph or rein_o2:
         safe_update(conn, """
             UPDATE errores_log
             SET hora_fin = ?, resuelto = 1
-            WHERE codigo IN (?, ?, ?, ?, ?, ?) AND resuelto = 0
-        """, (ts, *PID_TEMP))
+            WHERE codigo IN (?, ?, ?, ?, ?, ?) AND resuelto = 0 AND estanque = ?
+        """, (ts, *PID_TEMP, estanque))
 
-    conn.close()
+    invalidar_errores_cache()
 
     # ====== Notificación de reinicio ======
+    donde = "" if estanque == ESTANQUE_POR_DEFECTO else f" (estanque {estanque})"
     if rein_ph and rein_o2:
-        push_notificacion("reinicio", "🔄 Reinicio de PID pH y O₂ ejecutado")
+        push_notificacion("reinicio", f"🔄 Reinicio de PID pH y O₂ ejecutado{donde}")
     elif rein_ph:
-        push_notificacion("reinicio", "🔄 PID de pH reiniciado")
+        push_notificacion("reinicio", f"🔄 PID de pH reiniciado{donde}")
     elif rein_o2:
-        push_notificacion("reinicio", "🔄 PID de O₂ reiniciado")
+        push_notificacion("reinicio", f"🔄 PID de O₂ reiniciado{donde}")
 
     return jsonify({"ok": True})
 
@@ -516,56 +1053,152 @@ def api_tcp_send():
 
     if not cmd:
         return jsonify({"ok": False, "msg": "comando vacío"}), 400
+    try:
+        estanque = int(data.get("estanque", ESTANQUE_POR_DEFECTO))
+    except (TypeError, ValueError):
+        return jsonify({"ok": False, "msg": "estanque inválido"}), 400
 
     # =====================================================
-    #   1) INTERPRETAR COMANDO Y REGISTRAR ACCIÓN MANUAL
+    #   1) ENVIAR COMANDO REALMENTE POR TCP ("estanque:comando")
     # =====================================================
-    try:
-        accion_interna, descripcion, valor = interpretar_cmd(cmd)
-
-        registrar_accion_manual(
-            accion=accion_interna,
-            descripcion=descripcion,
-            valor=valor,
-            estanque=1   # fijo por ahora
-        )
-
-    except Exception as e:
-        print("❌ Error registrando acción manual:", e)
-        # pero dejamos continuar, no queremos romper el comando TCP
+    ok, motivo, respondio = enviar_tcp(f"{estanque}:{cmd}")
 
     # =====================================================
-    #   2) ENVIAR COMANDO REALMENTE POR TCP
+    #   2) REGISTRAR ACCIÓN MANUAL (solo si v25 la aceptó)
     # =====================================================
-    ok = enviar_tcp(cmd)
+    if ok:
+        try:
+            accion_interna, descripcion, valor = interpretar_cmd(cmd)
+
+            registrar_accion_manual(
+                accion=accion_interna,
+                descripcion=descripcion,
+                valor=valor,
+                estanque=estanque
+            )
+
+        except Exception as e:
+            print("❌ Error registrando acción manual:", e)
+            # el comando ya se ejecutó: no se informa como fallido
 
     # =====================================================
-    #   3) RESPUESTA AL FRONTEND
+    #   3) RESPUESTA AL FRONTEND (con el motivo si v25 lo rechazó)
     # =====================================================
-    return jsonify({"ok": ok})
+    if ok:
+        return jsonify({"ok": True, "motivo": motivo})
+    return jsonify({"ok": False, "motivo": motivo}), (409 if respondio else 503)
+
 
+# =======================================
+# API: MÉTRICAS DEL CANAL DE COMANDOS
+# =======================================
+@app.route("/api/tcp_metricas")
+def api_tcp_metricas():
+    return jsonify(cliente_comandos.metricas())
 
 # =======================================
 # API: RECIBIR ESTADO DE V24
 # =======================================
 @app.route("/api/estado_v24")
 def api_estado_v24():
-    return jsonify(estado_v24)
+    try:
+        estanque = estanque_pedido()
+    except ValueError:
+        return jsonify({"ok": False, "msg": "estanque inválido"}), 400
+    return jsonify(estados_v24.get(estanque, {}))
+
+@app.route("/api/estado_v24_metricas")
+def api_estado_v24_metricas():
+    try:
+        estanque = estanque_pedido()
+    except ValueError:
+        return jsonify({"ok": False, "msg": "estanque inválido"}), 400
+    receptor = receptores_estado.get(estanque)
+    return jsonify(receptor.metricas() if receptor else ReceptorEstado().metricas())
+
+# =======================================
+# API: STREAM EN VIVO (Server-Sent Events)
+# =======================================
+def hilo_difusion_en_vivo():
+    """
+    Productor único del stream: sensores (estanque por defecto) desde la caché de telemetría y
+    una consulta de notificaciones nuevas por intervalo, sin importar
+    cuántos clientes estén conectados.
+    """
+    ultimo_sensor = None
+    ultimo_id_notif = None
+
+    while True:
+        time.sleep(INTERVALO_DIFUSION)
+
+        if not difusor.hay_clientes():
+            ultimo_sensor = None
+            ultimo_id_notif = None          # al volver un cliente, se parte del último id
+            continue
+
+        try:
+            conn = get_db()
+            if ultimo_id_notif is None:
+                ultimo_id_notif = conn.execute(
+                    "SELECT COALESCE(MAX(id), 0) AS m FROM notificaciones"
+                ).fetchone()["m"]
+
+            nuevas = conn.execute("""
+                SELECT id, tipo, mensaje, hora, leida
+                FROM notificaciones
+                WHERE id > ?
+                ORDER BY id ASC
+                LIMIT 20
+            """, (ultimo_id_notif,)).fetchall()
+        except sqlite3.Error as e:
+            print("⚠️ Stream: error leyendo BD:", e)
+            continue
+
+        sensor = ultima_lectura()
+        if sensor != ultimo_sensor:
+            difusor.publicar("sensores", sensor, retener=True)
+            ultimo_sensor = sensor
+
+        for r in nuevas:
+            difusor.publicar("notificacion", dict(r))
+            ultimo_id_notif = r["id"]
+
+threading.Thread(target=hilo_difusion_en_vivo, daemon=True).start()
+
+@app.route("/api/stream")
+def api_stream():
+    q = difusor.suscribir()
+
+    def generar():
+        try:
+            while True:
+                try:
+                    yield q.get(timeout=SSE_KEEPALIVE)
+                except queue.Empty:
+                    yield ": keepalive\n\n"     # también detecta clientes caídos
+        finally:
+            difusor.desuscribir(q)
+
+    return Response(
+        stream_with_context(generar()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 # ===============================
 # API: Historial lecturas
 # ===============================
-@app.route("/api/historial")
-def api_historial():
+def leer_historial_bd(estanque=ESTANQUE_POR_DEFECTO, limite=HISTORIAL_MAX):
     conn = get_db()
     rows = conn.execute("""
         SELECT fecha, hora, ph, o2, temp, codigo_error
         FROM lecturas
-        ORDER BY id DESC LIMIT 200
-    """).fetchall()
-    conn.close()
+        WHERE estanque = ?
+        ORDER BY ts DESC, id DESC LIMIT ?
+    """, (estanque, limite)).fetchall()
 
-    data = [{
+    return [{
+        "estanque": estanque,
         "fecha": r["fecha"],
         "hora": r["hora"],
         "ph": r["ph"],
@@ -574,9 +1207,182 @@ def api_historial():
         "error": r["codigo_error"]
     } for r in rows]
 
-    return jsonify(data)
-    
+# El anillo en memoria arranca con lo último que guardó el logger
+cache_telemetria().precargar(leer_historial_bd())
+
+@app.route("/api/historial")
+def api_historial():
+    try:
+        estanque = estanque_pedido()
+    except ValueError:
+        return jsonify({"ok": False, "msg": "estanque inválido"}), 400
+    cache = caches_telemetria.get(estanque)
+    if cache is None:                   # estanque sin telemetría en vivo: lo que guardó el logger
+        return jsonify(leer_historial_bd(estanque))
+    return jsonify(cache.historial())
     
+
+
+# ===============================
+# FILTROS DE PERIODO (rangos indexables)
+# ===============================
+def rango_periodo(periodo, fecha=None, mes=None, año=None, desde=None, hasta=None):
+    """
+    Traduce los filtros del historial a un rango semiabierto [inicio, fin)
+    de datetimes a medianoche. None si no hay filtro. ValueError si el
+    formato de fecha es inválido.
+    """
+    if periodo == "dia" and fecha:
+        inicio = datetime.strptime(fecha, "%Y-%m-%d")
+        fin = inicio + timedelta(days=1)
+
+    elif periodo == "mes" and mes:
+        inicio = datetime.strptime(mes, "%Y-%m")
+        fin = (inicio.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+    elif periodo == "año" and año:
+        inicio = datetime.strptime(año, "%Y")
+        fin = inicio.replace(year=inicio.year + 1)
+
+    elif periodo == "rango" and desde and hasta:
+        inicio = datetime.strptime(desde, "%Y-%m-%d")
+        fin = datetime.strptime(hasta, "%Y-%m-%d") + timedelta(days=1)
+
+    else:
+        return None
+
+    return inicio, fin
+
+def filtro_ts(rango):
+    """Predicado sobre la columna entera ts (índice idx_lecturas_ts)."""
+    inicio, fin = rango
+    return "ts >= ? AND ts < ?", [int(inicio.timestamp()), int(fin.timestamp())]
+
+def filtro_texto(rango, columna="fecha"):
+    """
+    Predicado de rango sobre una columna de texto que empieza con
+    'YYYY-MM-DD' (fecha de acciones_manual u hora de notificaciones).
+    """
+    inicio, fin = rango
+    return (f"{columna} >= ? AND {columna} < ?",
+            [inicio.strftime("%Y-%m-%d"), fin.strftime("%Y-%m-%d")])
+
+def promedio(g, variable):
+    """Promedio de un agregado; None si en el periodo no hubo ningún valor válido."""
+    n = g[f"n_{variable}"]
+    return round(g[f"sum_{variable}"] / n, 2) if n else None
+
+def leer_agregados(cur, tabla, largo, rango, estanque=None):
+    """
+    Promedios (y mín/máx) desde las tablas de agregados del logger.
+    Un año por meses son 12 filas en lugar de millones de lecturas.
+    Sin estanque se combinan todos los estanques.
+    """
+    q = f"""
+        SELECT substr(clave, 1, {largo}) AS k,
+               SUM(n_ph) AS n_ph, SUM(n_o2) AS n_o2, SUM(n_temp) AS n_temp,
+               SUM(sum_ph) AS sum_ph, SUM(sum_o2) AS sum_o2, SUM(sum_temp) AS sum_temp,
+               MIN(min_ph) AS min_ph, MAX(max_ph) AS max_ph,
+               MIN(min_o2) AS min_o2, MAX(max_o2) AS max_o2,
+               MIN(min_temp) AS min_temp, MAX(max_temp) AS max_temp
+        FROM {tabla}
+    """
+    where, params = [], []
+    if estanque is not None:
+        where.append("estanque = ?")
+        params.append(estanque)
+    if rango:
+        inicio, fin = rango
+        formato = "%Y-%m" if tabla == "lecturas_mes" else "%Y-%m-%d"
+        where.append("clave >= ? AND clave < ?")
+        params += [inicio.strftime(formato), fin.strftime(formato)]
+    if where:
+        q += " WHERE " + " AND ".join(where)
+    q += " GROUP BY k ORDER BY k"
+
+    res = []
+    for g in cur.execute(q, params).fetchall():
+        key = g["k"]
+        res.append({
+            "categoria": "lectura",
+            "fecha": key.split(" ")[0],
+            "hora": key.split(" ")[1] if " " in key else "",
+            "ph": promedio(g, "ph"),
+            "o2": promedio(g, "o2"),
+            "temp": promedio(g, "temp"),
+            "ph_min": g["min_ph"], "ph_max": g["max_ph"],
+            "o2_min": g["min_o2"], "o2_max": g["max_o2"],
+            "temp_min": g["min_temp"], "temp_max": g["max_temp"],
+            "label": key,
+        })
+    return res
+
+def _donde(rango, columna, estanque):
+    """WHERE (o "") y parámetros para contar por periodo y, si se pide, estanque."""
+    where, params = [], []
+    if rango:
+        filtro, params = filtro_texto(rango, columna)
+        where.append(filtro)
+    if estanque is not None:
+        where.append("estanque = ?")
+        params.append(estanque)
+    return (" WHERE " + " AND ".join(where) if where else ""), params
+
+def contar_lecturas(cur, rango, estanque=None):
+    """Total exacto desde lecturas_dia (el logger la actualiza con cada INSERT)."""
+    donde, params = _donde(rango, "clave", estanque)
+    q = "SELECT COALESCE(SUM(n), 0) AS cnt FROM lecturas_dia" + donde
+    return cur.execute(q, params).fetchone()["cnt"]
+
+def _contar_tabla(tabla, columna, por_estanque=True):
+    def contar(cur, rango, estanque=None):
+        donde, params = _donde(rango, columna, estanque if por_estanque else None)
+        q = f"SELECT COUNT(*) AS cnt FROM {tabla}" + donde
+        return cur.execute(q, params).fetchone()["cnt"]
+    return contar
+
+# Configuración de la tabla de historial por tipo:
+#   select → columnas devueltas al frontend
+#   clave  → columnas de orden/cursor (prefijo de un índice + id)
+#   filtro → predicado de rango del periodo
+#   estanque → columna para ?estanque=n (None: la tabla es de todo el sistema)
+#   contar → total de filas del periodo
+TABLA_HISTORIAL = {
+    "lecturas": {
+        "tabla": "lecturas",
+        "select": """fecha, hora, 'lectura' AS categoria,
+                   ph, o2, temp, codigo_error, estanque""",
+        "clave": ("ts", "id"),
+        "filtro": filtro_ts,
+        "estanque": "estanque",
+        "contar": contar_lecturas,
+    },
+    "manuales": {
+        "tabla": "acciones_manual",
+        "select": """fecha, hora, 'manual' AS categoria,
+                   descripcion, valor, accion, estanque""",
+        "clave": ("acciones_manual.fecha", "acciones_manual.hora", "acciones_manual.id"),
+        "filtro": lambda rango: filtro_texto(rango, "acciones_manual.fecha"),
+        "estanque": "acciones_manual.estanque",
+        "contar": _contar_tabla("acciones_manual", "fecha"),
+    },
+    # NOTIFICACIONES: 'hora' guarda fecha y hora completas; se separan al devolver
+    "notificaciones": {
+        "tabla": "notificaciones",
+        "select": """substr(hora, 1, 10) AS fecha,
+                   substr(hora, 12) AS hora,
+                   'notificacion' AS categoria,
+                   mensaje,
+                   tipo,
+                   leida,
+                   1 AS estanque""",
+        "clave": ("notificaciones.hora", "notificaciones.id"),
+        "filtro": lambda rango: filtro_texto(rango, "notificaciones.hora"),
+        "estanque": None,
+        "contar": _contar_tabla("notificaciones", "hora", por_estanque=False),
+    },
+}
+
 @app.route("/api/historial_filtros")
 def api_historial_filtros():
     tipo = request.args.get("tipo", "lecturas")       # lecturas | manuales | notificaciones
@@ -589,31 +1395,21 @@ def api_historial_filtros():
     desde = request.args.get("desde")                 # YYYY-MM-DD
     hasta = request.args.get("hasta")                 # YYYY-MM-DD
 
-    conn = get_db()
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
+    try:
+        estanque = estanque_pedido(por_defecto=None)  # sin él, todos los estanques
+    except ValueError:
+        return jsonify({"ok": False, "msg": "estanque inválido"}), 400
 
     # =====================================================
-    #   CONSTRUCCIÓN DEL FILTRO BASE (para lecturas/manuales)
+    #   RANGO DEL PERIODO (semiabierto, usa índices)
     # =====================================================
-    date_filter = None
-    params = []
-
-    if periodo == "dia" and fecha:
-        date_filter = "fecha = ?"
-        params.append(fecha)
-
-    elif periodo == "mes" and mes:
-        date_filter = "fecha LIKE ?"
-        params.append(f"{mes}-%")
-
-    elif periodo == "año" and año:
-        date_filter = "fecha LIKE ?"
-        params.append(f"{año}-%")
+    try:
+        rango = rango_periodo(periodo, fecha, mes, año, desde, hasta)
+    except ValueError:
+        return jsonify({"ok": False, "msg": "fecha inválida"}), 400
 
-    elif periodo == "rango" and desde and hasta:
-        date_filter = "fecha BETWEEN ? AND ?"
-        params.extend([desde, hasta])
+    conn = get_db()
+    cur = conn.cursor()
 
     # =====================================================
     #   MODO: GRÁFICA → SOLO LECTURAS + AGRUPACIONES
@@ -622,216 +1418,116 @@ def api_historial_filtros():
 
         # No graficamos manuales ni notificaciones → vacío
         if tipo != "lecturas":
-            conn.close()
-            return jsonify([])
-
-        # -------------------------
-        # 1) Lecturas crudas
-        # -------------------------
-        q = """
-            SELECT fecha, hora, ph, o2, temp
-            FROM lecturas
-        """
-        if date_filter:
-            q += f" WHERE {date_filter}"
-        q += " ORDER BY fecha ASC, hora ASC"
-
-        rows = cur.execute(q, params).fetchall()
-
-        if not rows:
-            conn.close()
             return jsonify([])
 
-        lecturas = [
-            {
-                "fecha": r["fecha"],
-                "hora": r["hora"],
-                "ph": float(r["ph"]),
-                "o2": float(r["o2"]),
-                "temp": float(r["temp"]),
-            }
-            for r in rows
-        ]
-
-        # -------------------------
-        # 2) Helpers de agrupación
-        # -------------------------
-        from datetime import datetime as dt
-
-        def k_hora(f, h):
-            return f"{f} {h[:2]}:00"
-
-        def k_dia(f, h):
-            return f
-
-        def k_mes(f, h):
-            return f[:7]
-
-        def k_anio(f, h):
-            return f[:4]
-
-        def agrupar(fn):
-            grupos = {}
-
-            for r in lecturas:
-                key = fn(r["fecha"], r["hora"])
-                g = grupos.setdefault(key, {"sum_ph": 0, "sum_o2": 0, "sum_temp": 0, "n": 0})
-                g["sum_ph"] += r["ph"]
-                g["sum_o2"] += r["o2"]
-                g["sum_temp"] += r["temp"]
-                g["n"] += 1
-
-            res = []
-            for key in sorted(grupos.keys()):
-                g = grupos[key]
-                res.append({
-                    "categoria": "lectura",
-                    "fecha": key.split(" ")[0],
-                    "hora": key.split(" ")[1] if " " in key else "",
-                    "ph": round(g["sum_ph"] / g["n"], 2),
-                    "o2": round(g["sum_o2"] / g["n"], 2),
-                    "temp": round(g["sum_temp"] / g["n"], 2),
-                    "label": key,
-                })
-
-            return res
-
         # -------------------------
-        #     AGRUPACIONES
+        # Elegir tabla de agregados y longitud de la clave de agrupación
+        #   (clave 'YYYY-MM-DD HH:00' → 16, día → 10, mes → 7, año → 4)
         # -------------------------
         if periodo == "dia":
             # → promedio por hora
-            data = agrupar(k_hora)
+            tabla, largo = "lecturas_hora", 16
 
         elif periodo == "mes":
             # → promedio por día
-            data = agrupar(k_dia)
+            tabla, largo = "lecturas_dia", 10
 
         elif periodo == "año":
             # → promedio por mes
-            data = agrupar(k_mes)
+            tabla, largo = "lecturas_mes", 7
 
-        elif periodo == "rango" and desde and hasta:
-            # duración del rango
-            try:
-                d1 = dt.strptime(desde, "%Y-%m-%d")
-                d2 = dt.strptime(hasta, "%Y-%m-%d")
-                ndias = (d2 - d1).days + 1
-            except:
-                ndias = 9999
+        elif periodo == "rango" and rango:
+            # duración del rango (los bordes no caen en meses completos → se parte de días)
+            ndias = (rango[1] - rango[0]).days
 
             if ndias <= 31:
-                data = agrupar(k_dia)
+                tabla, largo = "lecturas_dia", 10
             elif ndias <= 365 * 3:
-                data = agrupar(k_mes)
+                tabla, largo = "lecturas_dia", 7
             else:
-                data = agrupar(k_anio)
+                tabla, largo = "lecturas_dia", 4
         else:
-            data = agrupar(k_dia)
+            tabla, largo = "lecturas_dia", 10
+
+        data = leer_agregados(cur, tabla, largo, rango, estanque)
 
-        conn.close()
         return jsonify(data)
 
     # =====================================================
-    #   MODO TABLA — CONSULTAS INDEPENDIENTES
+    #   MODO TABLA — PAGINACIÓN POR CLAVE (keyset) EN SQL
     # =====================================================
-    consultas = []  # cada elemento será: (query, params)
-
-    # ---------------------------
-    # LECTURAS
-    # ---------------------------
-    if tipo == "lecturas":
-        q = """
-            SELECT fecha, hora, 'lectura' AS categoria,
-                   ph, o2, temp, codigo_error, 1 AS estanque
-            FROM lecturas
-        """
-        if date_filter:
-            q += f" WHERE {date_filter}"
-            consultas.append((q, params.copy()))
-        else:
-            consultas.append((q + " ORDER BY fecha DESC, hora DESC LIMIT 500", []))
-
-    # ---------------------------
-    # ACCIONES MANUALES
-    # ---------------------------
-    if tipo == "manuales":
-        q = """
-            SELECT fecha, hora, 'manual' AS categoria,
-                   descripcion, valor, accion, estanque
-            FROM acciones_manual
-        """
-        if date_filter:
-            q += f" WHERE {date_filter}"
-            consultas.append((q, params.copy()))
-        else:
-            consultas.append((q + " ORDER BY fecha DESC, hora DESC LIMIT 500", []))
-
-    # ---------------------------
-    # NOTIFICACIONES (especial)
-    # ---------------------------
-    if tipo == "notificaciones":
-        # NOTIFICACIONES NECESITAN FILTRO PROPIO (hora tiene datetime completo)
-        q = """
-            SELECT 
-                substr(hora, 1, 10) AS fecha,
-                substr(hora, 12) AS hora,
-                'notificacion' AS categoria,
-                mensaje,
-                tipo,
-                leida,
-                1 AS estanque
-            FROM notificaciones
-        """
-
-        # FILTRO ESPECIAL PARA NOTIFICACIONES
-        if periodo == "dia" and fecha:
-            q += " WHERE substr(hora, 1, 10) = ?"
-            consultas.append((q, [fecha]))
+    # Cada tipo lee de UNA tabla, ordenada de forma descendente por columnas
+    # indexadas. El cursor es la clave de la última fila de la página previa,
+    # así cada página cuesta lo mismo sin importar el tamaño del periodo.
+    if tipo not in TABLA_HISTORIAL:
+        return jsonify({"ok": False, "msg": "tipo inválido"}), 400
 
-        elif periodo == "mes" and mes:
-            q += " WHERE substr(hora, 1, 7) = ?"
-            consultas.append((q, [mes]))
+    cfg = TABLA_HISTORIAL[tipo]
 
-        elif periodo == "año" and año:
-            q += " WHERE substr(hora, 1, 4) = ?"
-            consultas.append((q, [año]))
-
-        elif periodo == "rango" and desde and hasta:
-            q += " WHERE substr(hora, 1, 10) BETWEEN ? AND ?"
-            consultas.append((q, [desde, hasta]))
-
-        else:
-            consultas.append((q, []))
-
-    # =====================================================
-    #   PAGINACIÓN PARA TABLA
-    # =====================================================
-    page = int(request.args.get("page", 1))
-    limit = int(request.args.get("limit", 30))
-    offset = (page - 1) * limit
-
-    # Obtener datos completos en memoria
-    final_data = []
-    for q, p in consultas:
-        final_data.extend([dict(r) for r in cur.execute(q, p).fetchall()])
+    try:
+        page = max(1, int(request.args.get("page", 1)))
+        limit = min(max(1, int(request.args.get("limit", 30))), 500)
+    except ValueError:
+        return jsonify({"ok": False, "msg": "paginación inválida"}), 400
 
-    # Ordenar todo por fecha/hora descendente
-    def sort_key(x):
-        f = x.get("fecha", "")
-        h = x.get("hora", "")
-        return (f, h)
+    cursor = None
+    if request.args.get("cursor"):
+        try:
+            cursor = json.loads(request.args["cursor"])
+            if not isinstance(cursor, list) or len(cursor) != len(cfg["clave"]):
+                raise ValueError
+        except ValueError:
+            return jsonify({"ok": False, "msg": "cursor inválido"}), 400
 
-    final_data.sort(key=sort_key, reverse=True)
+    where = []
+    params = []
+    if rango:
+        filtro, p = cfg["filtro"](rango)
+        where.append(filtro)
+        params.extend(p)
+    if estanque is not None and cfg["estanque"]:
+        where.append(f"{cfg['estanque']} = ?")     # lecturas: índice (estanque, ts)
+        params.append(estanque)
+
+    columnas_clave = ", ".join(cfg["clave"])
+    if cursor is not None:
+        where.append(f"({columnas_clave}) < ({', '.join('?' for _ in cursor)})")
+        params.extend(cursor)
+
+    q = f"""
+        SELECT {cfg["select"]}, {", ".join(f"{c} AS _c{i}" for i, c in enumerate(cfg["clave"]))}
+        FROM {cfg["tabla"]}
+    """
+    if where:
+        q += " WHERE " + " AND ".join(where)
+    q += " ORDER BY " + ", ".join(f"{c} DESC" for c in cfg["clave"])
+    q += " LIMIT ?"
+    params.append(limit + 1)            # una fila extra → ¿hay página siguiente?
+
+    # Sin cursor pero con page > 1 (clientes antiguos): OFFSET, igual en SQL
+    if cursor is None and page > 1:
+        q += " OFFSET ?"
+        params.append((page - 1) * limit)
+
+    rows = cur.execute(q, params).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        ultima = rows[-1]
+        next_cursor = json.dumps([ultima[f"_c{i}"] for i in range(len(cfg["clave"]))])
+
+    page_data = []
+    for r in rows:
+        d = dict(r)
+        for i in range(len(cfg["clave"])):
+            del d[f"_c{i}"]
+        page_data.append(d)
 
-    # Total de filas y páginas
-    total_items = len(final_data)
+    # Total de filas y páginas (consulta aparte, barata)
+    total_items = cfg["contar"](cur, rango, estanque)
     total_pages = max(1, (total_items + limit - 1) // limit)
 
-    # Cortar solo la página actual
-    page_data = final_data[offset : offset + limit]
-
-    conn.close()
 
     # Devolver datos con información de paginación
     return jsonify({
@@ -839,6 +1535,7 @@ def api_historial_filtros():
         "pages": total_pages,
         "limit": limit,
         "total": total_items,
+        "next_cursor": next_cursor,
         "data": page_data
     })
 
@@ -856,7 +1553,6 @@ def api_notificaciones():
         ORDER BY id DESC
         LIMIT 20
     """).fetchall()
-    conn.close()
 
     return jsonify([
         {
@@ -878,7 +1574,6 @@ def api_notificaciones_no_leidas():
         FROM notificaciones
         WHERE leida = 0
     """).fetchone()
-    conn.close()
 
     return jsonify({"pendientes": row["cnt"]})
 
@@ -888,17 +1583,20 @@ def api_notificaciones_marcar_leidas():
     conn = get_db()
     conn.execute("UPDATE notificaciones SET leida = 1 WHERE leida = 0")
     conn.commit()
-    conn.close()
     return jsonify({"ok": True})
     
 @app.route("/api/notificacion_sistema", methods=["POST"])
 def api_notificacion_sistema():
-    data = request.json
-    tipo = data.get("tipo", "sistema")
-    mensaje = data.get("mensaje", "Evento del sistema")
-
-    push_notificacion(tipo, mensaje)
-    return jsonify({"ok": True})
+    """Una notificación {tipo, mensaje} o un lote {"notificaciones": [{tipo, mensaje, hora}, ...]}."""
+    data = request.get_json(silent=True) or {}
+    lote = data["notificaciones"] if isinstance(data.get("notificaciones"), list) else [data]
+    avisos = [
+        (n.get("tipo", "sistema"), n.get("mensaje", "Evento del sistema"), n.get("hora"))
+        for n in lote if isinstance(n, dict)
+    ]
+    if avisos and not push_notificaciones(avisos):
+        return jsonify({"ok": False, "error": "BD ocupada"}), 503   # v25 reintenta el lote
+    return jsonify({"ok": True, "insertadas": len(avisos)})
 
 
 
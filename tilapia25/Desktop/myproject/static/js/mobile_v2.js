@@ -42,6 +42,9 @@ function applyInteractiveButton(selector, options = {}) {
 // Texto seguro
 const txt = (x) => (x == null ? "" : String(x));
 
+// true mientras el stream /api/stream esté abierto → los sondeos periódicos se pausan
+let streamActivo = false;
+
 // ===== 🧭 MÓDULO: MENÚ / NAVEGACIÓN ===========================================
 
 const sideMenu = document.getElementById("sideMenu");
@@ -53,6 +56,8 @@ const menuOptions = document.querySelectorAll(".menu-option");
 let histPage = 1;
 let histTotalPages = 1;
 let histLimit = 30; // filas por página
+let histCursors = [null]; // cursor de cada página (índice = página - 1)
+let histNextCursor = null; // cursor devuelto para la página siguiente
 
 
 menuBtn.onclick = () => sideMenu.classList.replace("-translate-x-full", "show");
@@ -160,24 +165,28 @@ function setVal(key, value) {
   if (el) el.textContent = value;
 }
 
+function aplicarSensores(data) {
+  // Si hay datos válidos, actualizar valores en pantalla
+  if (data.ph != null) {
+    setVal("ph", Number(data.ph).toFixed(2));
+    setVal("o2", Number(data.o2).toFixed(2));
+    setVal("temp", Number(data.temp).toFixed(2));
+  }
+}
+
 async function loadLatestSensores() {
   try {
     const res = await fetch("/api/sensores");
-    const data = await res.json();
-
-    // Si hay datos válidos, actualizar valores en pantalla
-    if (data.ph != null) {
-      setVal("ph", Number(data.ph).toFixed(2));
-      setVal("o2", Number(data.o2).toFixed(2));
-      setVal("temp", Number(data.temp).toFixed(2));
-    }
+    aplicarSensores(await res.json());
   } catch (e) {
     console.error("❌ Error cargando sensores:", e);
   }
 }
 
-// Ejecutar cada 4 segundos
-setInterval(loadLatestSensores, 4000);
+// Ejecutar cada 4 segundos (solo si no hay stream)
+setInterval(() => {
+  if (!streamActivo) loadLatestSensores();
+}, 4000);
 loadLatestSensores();
 
 // ==============================================
@@ -408,7 +417,7 @@ function updateHistPaginationUI() {
   info.textContent = `Página ${histPage} de ${histTotalPages}`;
 
   prev.disabled = histPage <= 1;
-  next.disabled = histPage >= histTotalPages;
+  next.disabled = !histNextCursor;
 }
 
 
@@ -481,6 +490,7 @@ async function cargarHistorial() {
   params.append("modo", modoVista);  // tabla | grafica
   params.append("page", histPage);
   params.append("limit", histLimit);
+  if (histCursors[histPage - 1]) params.append("cursor", histCursors[histPage - 1]);
 
   // obtener inputs dinámicos
   const f_fecha = document.getElementById("f_fecha");
@@ -503,6 +513,7 @@ async function cargarHistorial() {
   // -----------------------------------------------------
   if (modoVista === "tabla") {
     histTotalPages = json.pages || 1;
+    histNextCursor = json.next_cursor || null;
     updateHistPaginationUI();
 
     window.historialData = json.data || [];
@@ -528,6 +539,7 @@ async function cargarHistorial() {
 // Reiniciar página cuando se aplican filtros
 btnAplicarFiltro.addEventListener("click", () => {
   histPage = 1;
+  histCursors = [null];
   cargarHistorial();
 });
 
@@ -708,7 +720,8 @@ document.getElementById("histPrev").addEventListener("click", () => {
 });
 
 document.getElementById("histNext").addEventListener("click", () => {
-  if (histPage < histTotalPages) {
+  if (histNextCursor) {
+    histCursors[histPage] = histNextCursor;
     histPage++;
     cargarHistorial();
   }
@@ -744,27 +757,31 @@ let ultimoEstadoJson = "";
 let cooldownInterval = null;
 
 // ------- Refrescar estado desde Flask -------
-async function loadEstadoV24() {
-  try {
-    const res = await fetch("/api/estado_v24");
-    const data = await res.json();
+function aplicarEstadoV24(data) {
+  const nuevoJSON = JSON.stringify(data);
 
-    const nuevoJSON = JSON.stringify(data);
+  // Determinar si realmente hay un cambio
+  const huboCambio = nuevoJSON !== ultimoEstadoJson;
+  ultimoEstadoJson = nuevoJSON;
 
-    // Determinar si realmente hay un cambio
-    const huboCambio = nuevoJSON !== ultimoEstadoJson;
-    ultimoEstadoJson = nuevoJSON;
+  estadoV24 = data;
+  estadoV24._last_update_ok = huboCambio;
 
-    estadoV24 = data;
-    estadoV24._last_update_ok = huboCambio;
+  actualizarUIControlManual();
+}
 
-    actualizarUIControlManual();
+async function loadEstadoV24() {
+  try {
+    const res = await fetch("/api/estado_v24");
+    aplicarEstadoV24(await res.json());
   } catch (e) {
     console.error("❌ Error cargando estado v24", e);
   }
 }
 
-setInterval(loadEstadoV24, 1000);
+setInterval(() => {
+  if (!streamActivo) loadEstadoV24();
+}, 1000);
 loadEstadoV24();
 
 // ===========================================================
@@ -994,6 +1011,12 @@ async function enviarComandoTCP(cmd) {
 
     const data = await res.json();
 
+    // v25 responde si aceptó el comando; si no, se muestra el motivo
+    // (409 = rechazado por v25; 5xx = sin comunicación con v25)
+    if (!data.ok && data.motivo) {
+      alert(res.status === 409 ? `Comando rechazado: ${data.motivo}` : `Sin comunicación con el control: ${data.motivo}`);
+    }
+
     // Recargar ESTADO REAL inmediatamente después del comando
     await refreshEstadoSeguro();
 
@@ -1203,9 +1226,10 @@ window.addEventListener("click", (e) => {
 });
 
 // ==============================================
-// Ejecutar cada 4–5 segundos
+// Ejecutar cada 4–5 segundos (solo si no hay stream)
 // ==============================================
 setInterval(() => {
+  if (streamActivo) return;
   loadUnreadCount();
   loadNotificaciones();
 }, 5000);
@@ -1214,6 +1238,39 @@ setInterval(() => {
 loadUnreadCount();
 loadNotificaciones();
 
+// Notificación nueva recibida por el stream
+function agregarNotificacion(n) {
+  NOTIFS = [n, ...NOTIFS].slice(0, 20);
+  if (!n.leida) unreadCount++;
+  renderNotifDropdown();
+  updateNotifBadge();
+}
+
+// ===== 📡 STREAM EN VIVO (/api/stream, Server-Sent Events) =====================
+// El servidor empuja sensores, estado v24 y notificaciones nuevas.
+// EventSource reconecta solo; mientras está caído vuelven los sondeos.
+function iniciarStream() {
+  if (!window.EventSource) return;
+
+  const es = new EventSource("/api/stream");
+
+  es.onopen = () => {
+    streamActivo = true;
+    // resincronizar lo que pudo perderse mientras estaba caído
+    loadUnreadCount();
+    loadNotificaciones();
+  };
+  es.onerror = () => {
+    streamActivo = false;
+  };
+
+  es.addEventListener("sensores", (e) => aplicarSensores(JSON.parse(e.data)));
+  es.addEventListener("estado_v24", (e) => aplicarEstadoV24(JSON.parse(e.data)));
+  es.addEventListener("notificacion", (e) => agregarNotificacion(JSON.parse(e.data)));
+}
+
+iniciarStream();
+
 // ===============================================================
 // SISTEMA DE ERRORES MULTIUSUARIO — MODAL + REINICIO DE PIDs
 // ===============================================================
@@ -1312,6 +1369,12 @@ btnReiniciar.addEventListener("click", async () => {
         btnReiniciar.textContent = "Reiniciar Control";
         btnReiniciar.disabled = false;
       }, 1500);
+    } else {
+      // 409: v25 rechazó el reinicio (bloqueo, cooldown...); 5xx: sin comunicación
+      const motivo = data.motivo || "error desconocido";
+      alert(res.status === 409 ? `Reinicio rechazado: ${motivo}` : `No se pudo reiniciar: ${motivo}`);
+      btnReiniciar.textContent = "Reiniciar Control";
+      btnReiniciar.disabled = false;
     }
   } catch (e) {
     alert("No se pudo comunicar con el servidor.");